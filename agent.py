@@ -2,15 +2,21 @@
 Bluesky Post Explainer Agent.
 Fetches post by URL, searches the web, explains in bullet points (origin, background, derivatives).
 """
+import functools
+import inspect
 import time
+from typing import AsyncIterator, Callable
 
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
-from agno.tools.websearch import WebSearchTools
+from agno.run.agent import RunEvent
+from agno.tools import tool
 
 import config
+from helpers.cassette import openai_http_client
 from helpers.cost import estimate_openai_cost
-from tools import fetch_bluesky_post
+from helpers.profiling import profiler, record_model_turns
+from tools import CachedWebSearchTools, SearchCompactor, afetch_bluesky_post, fetch_bluesky_post, new_compactor
 
 BLUESKY_EXPLAINER_INSTRUCTIONS = """You are an expert at explaining Bluesky posts to readers who may not have context.
 
@@ -25,23 +31,99 @@ When given a Bluesky post URL:
 Keep bullets concise and factual. Base explanations on the post content and your web search results. If the post is straightforward (e.g. general opinion or news), explain what it's about and any key entities or events; you don't need to force a "term + origin + derivatives" structure.
 """
 
-agent = Agent(
-    name="Bluesky Explainer",
-    model=OpenAIChat(id=config.OPENAI_MODEL),
-    tools=[fetch_bluesky_post, WebSearchTools()],
-    instructions=BLUESKY_EXPLAINER_INSTRUCTIONS,
-    markdown=True,
-)
 
+def _fetch_recording_post(fetch: Callable, compactor: SearchCompactor) -> Callable:
+    """fetch, also handing the post text to the run's compactor (its key terms guide snippet trimming)."""
+    if inspect.iscoroutinefunction(fetch):
 
-def _make_prompt(post_url: str) -> str:
-    return f"""Explain this Bluesky post. Fetch its content and search for relevant context, then write your explanation in bullet points as specified in your instructions.
+        @functools.wraps(fetch)
+        async def fetch_and_record(post_url: str) -> str:
+            text = await fetch(post_url)
+            if not text.startswith("["):
+                compactor.set_post(text)
+            return text
+
+    else:
+
+        @functools.wraps(fetch)
+        def fetch_and_record(post_url: str) -> str:
+            text = fetch(post_url)
+            if not text.startswith("["):
+                compactor.set_post(text)
+            return text
+
+    return fetch_and_record
+
+
+def build_agent(
+    async_fetch: bool = False, model: str | None = None, compactor: SearchCompactor | None = None
+) -> Agent:
+    """New explainer agent. async_fetch=True registers the async-native fetch tool (for arun)
+    under the same tool name, so prompts and instructions are unchanged. model: default config.OPENAI_MODEL.
+    compactor: the run's search result compactor (see tools/compaction.py); None sends raw results."""
+    fetch = afetch_bluesky_post if async_fetch else fetch_bluesky_post
+    if compactor is not None:
+        fetch = _fetch_recording_post(fetch, compactor)
+    return Agent(
+        name="Bluesky Explainer",
+        model=OpenAIChat(id=model or config.OPENAI_MODEL, http_client=openai_http_client(async_client=async_fetch)),
+        tools=[tool(name="fetch_bluesky_post")(fetch), CachedWebSearchTools(compactor=compactor)],
+        instructions=BLUESKY_EXPLAINER_INSTRUCTIONS,
+        markdown=True,
+    )
+
+
+# Sync agent for interactive use (agent.print_response). Explain runs build their own agent per call
+# (build_agent / new_async_agent) so run state, including search compaction, is never shared.
+agent = build_agent()
+
+
+def new_async_agent(model: str | None = None, compactor: SearchCompactor | None = None) -> Agent:
+    """Fresh async agent for one run, so no run state is shared between concurrent requests.
+    Cheap: the OpenAI HTTP client (connection pool) and the caches behind the tools are process-wide."""
+    return build_agent(async_fetch=True, model=model, compactor=compactor)
+
+
+def format_search_results(results: list) -> str:
+    """Prompt block for (kind, query, result) search results."""
+    return "\n\n".join(
+        f"### {'search_news' if kind == 'news' else 'web_search'}: {query}\n{result}"
+        for kind, query, result in results
+    ) or "(no search results)"
+
+
+def _make_prompt(post_url: str, post_text: str | None = None, search_context: list | None = None) -> str:
+    if post_text is None:
+        prompt = f"""Explain this Bluesky post. Fetch its content and search for relevant context, then write your explanation in bullet points as specified in your instructions.
 
 Post URL: {post_url}"""
+    else:
+        # Post already fetched (e.g. bulk-hydrated by the batch endpoint): skip the fetch tool call.
+        prompt = f"""Explain this Bluesky post. Its content is already fetched below, so do not call fetch_bluesky_post; search for relevant context, then write your explanation in bullet points as specified in your instructions.
+
+Post URL: {post_url}
+Post text:
+{post_text}"""
+    if search_context:
+        # Searches made for a near-duplicate post (semantic.py): search only for what they leave out.
+        prompt += f"""
 
+Search results already gathered for a near-identical post are below; only search for context they do not cover.
 
-def _usage_from_response(response) -> dict | None:
-    """Build usage dict from agent run response.metrics. Cost from config.OPENAI_MODEL_COSTS when available."""
+{format_search_results(search_context)}"""
+    return prompt
+
+
+def _count_model_turns(response) -> int | None:
+    """Model completions in the run (assistant messages, including tool-call turns)."""
+    messages = getattr(response, "messages", None) if response else None
+    if not messages:
+        return None
+    return sum(1 for m in messages if getattr(m, "role", None) == "assistant")
+
+
+def _usage_from_response(response, model: str = config.OPENAI_MODEL) -> dict | None:
+    """Build usage dict from agent run response.metrics. Cost for `model` from config.OPENAI_MODEL_COSTS when available."""
     usage = {}
     if response and getattr(response, "metrics", None):
         m = response.metrics
@@ -54,7 +136,7 @@ def _usage_from_response(response) -> dict | None:
         # Cost: use helper with config.OPENAI_MODEL_COSTS when we have token counts
         if usage.get("input_tokens") is not None and usage.get("output_tokens") is not None:
             estimated = estimate_openai_cost(
-                config.OPENAI_MODEL,
+                model,
                 usage["input_tokens"],
                 usage["output_tokens"],
             )
@@ -69,27 +151,93 @@ def _usage_from_response(response) -> dict | None:
     return usage if usage else None
 
 
+def compaction_stats(compactor: SearchCompactor | None, response=None) -> dict | None:
+    """The run's search compaction counters (result dict "compaction"); None when compaction is off."""
+    if compactor is None:
+        return None
+    return compactor.stats(getattr(response, "messages", None) if response else None)
+
+
 def explain_with_stats(post_url: str) -> dict:
-    """Run the agent (sync) and return explanation plus usage and timing stats."""
+    """Run a fresh agent (sync) and return explanation plus usage and timing stats."""
     start = time.perf_counter()
-    response = agent.run(_make_prompt(post_url), stream=False)
+    compactor = new_compactor()
+    response = build_agent(compactor=compactor).run(_make_prompt(post_url), stream=False)
     request_elapsed_seconds = round(time.perf_counter() - start, 2)
     explanation = (response.content or "").strip() if response else ""
     return {
         "explanation": explanation,
         "usage": _usage_from_response(response),
         "request_elapsed_seconds": request_elapsed_seconds,
+        "mode": "agent",
+        "model": config.OPENAI_MODEL,
+        "llm_turns": _count_model_turns(response),
+        "compaction": compaction_stats(compactor, response),
     }
 
 
-async def explain_with_stats_async(post_url: str) -> dict:
-    """Run the agent (async) and return explanation plus usage and timing stats. Use in API."""
+@profiler.profiled("agent")
+async def explain_with_stats_async(
+    post_url: str, post_text: str | None = None, search_context: list | None = None
+) -> dict:
+    """Run the agent (async) and return explanation plus usage and timing stats. Use in API.
+
+    post_text: already-fetched post content; when given the agent does not fetch the post itself.
+    search_context: (kind, query, result) searches to put in the prompt (semantic.py). The result's
+    "search_context" holds the searches this run made.
+    """
     start = time.perf_counter()
-    response = await agent.arun(_make_prompt(post_url), stream=False)
+    compactor = new_compactor(post_text)
+    prompt = _make_prompt(post_url, post_text, search_context)
+    response = await new_async_agent(compactor=compactor).arun(prompt, stream=False)
+    record_model_turns(response)
     request_elapsed_seconds = round(time.perf_counter() - start, 2)
     explanation = (response.content or "").strip() if response else ""
     return {
         "explanation": explanation,
         "usage": _usage_from_response(response),
         "request_elapsed_seconds": request_elapsed_seconds,
+        "mode": "agent",
+        "model": config.OPENAI_MODEL,
+        "llm_turns": _count_model_turns(response),
+        "compaction": compaction_stats(compactor, response),
+        "search_context": compactor.context(),
+    }
+
+
+async def explain_stream_async(post_url: str) -> AsyncIterator[tuple[str, dict]]:
+    """Run the agent (async, streaming). Yields (event, data) as the run progresses:
+    ("tool_call", {"tool", "args"}) when a tool starts, ("delta", {"content"}) per explanation chunk,
+    then ("done", result) with the same keys as explain_with_stats_async.
+    Closing the generator (e.g. client disconnect) stops the underlying agent run.
+    """
+    start = time.perf_counter()
+    parts: list[str] = []
+    completed = None
+    compactor = new_compactor()
+    stream = new_async_agent(compactor=compactor).arun(_make_prompt(post_url), stream=True, stream_events=True)
+    try:
+        async for event in stream:
+            kind = getattr(event, "event", None)
+            if kind == RunEvent.tool_call_started.value and getattr(event, "tool", None):
+                yield "tool_call", {"tool": event.tool.tool_name, "args": event.tool.tool_args}
+            elif kind == RunEvent.run_content.value and getattr(event, "content", None):
+                parts.append(str(event.content))
+                yield "delta", {"content": str(event.content)}
+            elif kind == RunEvent.run_completed.value:
+                completed = event
+    finally:
+        await stream.aclose()
+
+    content = getattr(completed, "content", None) if completed else None
+    explanation = (str(content) if content else "".join(parts)).strip()
+    yield "done", {
+        "explanation": explanation,
+        "usage": _usage_from_response(completed),
+        "request_elapsed_seconds": round(time.perf_counter() - start, 2),
+        "mode": "agent",
+        "model": config.OPENAI_MODEL,
+        "llm_turns": None,
+        # The completed event carries no messages, so savings count each result once (a lower bound).
+        "compaction": compaction_stats(compactor),
     }
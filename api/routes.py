@@ -1,10 +1,35 @@
-"""Async API routes for the Bluesky Explainer."""
+"""Async API routes for the Bluesky Explainer.
+
+The explainer modules (agent, pipeline, cascade, semantic, tools) are heavy to import; they are imported inside the
+handlers after `await startup.ensure_imported()`, which loads them off the event loop (see helpers/startup.py).
+"""
+import asyncio
+import json
 import re
+import time
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from agent import explain_with_stats_async
-from schemas import ExplainRequest, ExplainResponse, TokenUsage
+import config
+from helpers.admission import AdmissionController, Overloaded, busy_cause, upstream_stats
+from helpers.deadline import DeadlineExceeded, deadline_stats, run_with_deadline, set_request_deadline
+from helpers.explanation_cache import ExplanationCache
+from helpers.profiling import profiler
+from helpers.startup import startup
+from helpers.telemetry import record_error, record_explain, register_admission, register_cache, render_metrics
+from helpers.job_queue import JobQueue, WebhookConflict
+from jobs import JobService, job_view, webhook_url_problem
+from schemas import (
+    BatchExplainItem,
+    BatchExplainRequest,
+    ExplainJob,
+    ExplainJobRequest,
+    ExplainRequest,
+    ExplainResponse,
+    TokenUsage,
+)
+from trending import TrendingService
 
 BSKY_POST_URL_PATTERN = re.compile(
     r"^https?://(?:www\.)?bsky\.app/profile/[^/]+/post/[^/?#]+$"
@@ -12,6 +37,180 @@ BSKY_POST_URL_PATTERN = re.compile(
 
 router = APIRouter(tags=["explain"])
 
+# Finished explanations by canonical AT URI; concurrent requests for one post share a single agent run.
+explanation_cache = ExplanationCache(
+    maxsize=config.EXPLANATION_CACHE_MAXSIZE,
+    ttl=config.EXPLANATION_CACHE_TTL_SECONDS,
+    path=config.EXPLANATION_CACHE_PATH,
+    partial_ttl=config.EXPLANATION_CACHE_PARTIAL_TTL_SECONDS,
+)
+
+# Global cap on concurrent explain runs; cache hits bypass it.
+admission = AdmissionController(
+    "explain",
+    max_concurrent=config.ADMISSION_MAX_CONCURRENT,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    max_wait_seconds=config.ADMISSION_MAX_WAIT_SECONDS,
+)
+
+register_admission("explain", admission.stats)
+register_cache("explanation", explanation_cache.stats)
+
+
+def _explain_async(
+    url: str,
+    mode: str | None,
+    post_text: str | None = None,
+    max_cost_usd: float | None = None,
+    refresh: bool = False,
+    deadline_seconds: float | None = None,
+):
+    """Coroutine for the requested execution mode (None = config.EXPLAIN_MODE), behind the semantic
+    near-duplicate cache (semantic.py; refresh=True skips reuse), under the request deadline
+    (None = config.EXPLAIN_DEADLINE_SECONDS)."""
+    from semantic import explain_with_semantic_cache
+
+    return _with_deadline(
+        explain_with_semantic_cache(
+            url, lambda text, context: _run_mode(url, mode, text, context, max_cost_usd), post_text, refresh=refresh
+        ),
+        deadline_seconds,
+    )
+
+
+async def _with_deadline(coro, deadline_seconds: float | None = None) -> dict:
+    """Run coro under deadline_seconds (None = config.EXPLAIN_DEADLINE_SECONDS; helpers/deadline.py). Tool calls
+    that timed out are listed in the result's "timed_out_tools" (the explanation was written without them)."""
+    seconds = deadline_seconds if deadline_seconds is not None else config.EXPLAIN_DEADLINE_SECONDS
+    result, timed_out = await run_with_deadline(coro, seconds, config.DEADLINE_GRACE_SECONDS)
+    if timed_out:
+        result = {**result, "timed_out_tools": sorted(set(timed_out))}
+    return result
+
+
+def _run_mode(url: str, mode: str | None, post_text: str | None, search_context: list | None, max_cost_usd: float | None):
+    mode = mode or config.EXPLAIN_MODE
+    if mode == "pipeline":
+        from pipeline import explain_pipeline_async
+
+        return explain_pipeline_async(url, post_text=post_text, search_context=search_context)
+    if mode == "cascade":
+        from cascade import explain_cascade_async
+
+        budget = max_cost_usd if max_cost_usd is not None else config.CASCADE_MAX_COST_USD
+        return explain_cascade_async(url, post_text=post_text, max_cost_usd=budget, search_context=search_context)
+    from agent import explain_with_stats_async
+
+    return explain_with_stats_async(url, post_text=post_text, search_context=search_context)
+
+
+async def _admitted(make_coro):
+    """Run make_coro() once an admission slot is free (raises Overloaded otherwise)."""
+    async with admission.slot():
+        return await make_coro()
+
+
+# Pre-explains trending posts into explanation_cache when config.TRENDING_SOURCE is set (started by main's
+# lifespan); its runs take admission slots like any request. Counts cache hits on pre-explained posts either way,
+# so it also reports hits when the ingestion runs as a separate process (python trending.py).
+trending = TrendingService(
+    explanation_cache, lambda url: _admitted(lambda: _explain_async(url, config.TRENDING_MODE))
+)
+
+
+async def _run_job(job: dict) -> dict:
+    """One explain job: like POST /explain (explanation cache, then an admitted run) under the longer
+    config.JOBS_DEADLINE_SECONDS; returns the response dict."""
+    start = time.perf_counter()
+    url, params = job["post_url"], job["params"]
+    result, cache_hit = await explanation_cache.get_or_compute(
+        job["at_uri"],
+        lambda: _admitted(
+            lambda: _explain_async(
+                url,
+                params.get("mode"),
+                max_cost_usd=params.get("max_cost_usd"),
+                refresh=params.get("refresh", False),
+                deadline_seconds=config.JOBS_DEADLINE_SECONDS,
+            )
+        ),
+        refresh=params.get("refresh", False),
+    )
+    _record(result, start, cache_hit)
+    response = _cached_response(url, result, start) if cache_hit else _to_response(url, result)
+    return response.model_dump()
+
+
+# Explain jobs (POST /explain/jobs) from a durable SQLite queue; workers are started by main's lifespan.
+jobs = JobService(JobQueue(config.JOBS_PATH), _run_job)
+
+
+def _overloaded(e: BaseException) -> HTTPException | None:
+    """429/503 with Retry-After for admission rejections and saturated upstreams, 504 for runs past their
+    deadline; None for other errors."""
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, Overloaded):
+        return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    busy = busy_cause(e)
+    if busy is not None:
+        return HTTPException(status_code=503, detail=str(busy), headers={"Retry-After": str(busy.retry_after)})
+    return None
+
+
+async def _resolve_at_uri(url: str) -> str:
+    """Canonical AT URI for the explanation cache key; unknown handles are a 404."""
+    from tools import HandleNotFoundError, aresolve_post_uri
+
+    try:
+        return await aresolve_post_uri(url)
+    except HandleNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except Exception as e:
+        record_error("resolve_post_uri")
+        overloaded = _overloaded(e)
+        if overloaded is not None:
+            raise overloaded from e
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+def _record(result: dict, start: float, cache_hit: bool) -> None:
+    trending.record_served(result, cache_hit)
+    record_explain(
+        result,
+        time.perf_counter() - start,
+        cache_hit=cache_hit,
+        model=result.get("model") or config.OPENAI_MODEL,
+        mode=result.get("mode"),
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class _CleanupStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls cleanup() once the response is over, however it ended: also when the body
+    iterator never started (client gone before the first chunk, failed send), whose finally would not run."""
+
+    def __init__(self, content, cleanup, **kwargs):
+        super().__init__(content, **kwargs)
+        self._cleanup = cleanup
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._cleanup()
+
+
+# Progress labels for tool_call events on /explain/stream.
+_TOOL_PROGRESS = {
+    "fetch_bluesky_post": "fetching post",
+    "web_search": "searching",
+    "search_news": "searching news",
+}
+
 
 def _validate_post_url(url: str) -> str:
     url = (url or "").strip()
@@ -27,23 +226,160 @@ def _validate_post_url(url: str) -> str:
 
 @router.get("/health")
 async def health():
-    """Health check."""
+    """Liveness: the process is up and serving (does not wait for imports or warm-up)."""
     return {"status": "ok"}
 
 
+@router.get("/ready")
+async def ready():
+    """Readiness: 200 once the explainer modules are imported and warm-up finished, else 503. Includes phase timings."""
+    status = startup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@router.get("/stats")
+async def stats():
+    """Process-level counters: shared Bluesky session (logins, refreshes, reuses), cache hits/misses and search latency."""
+    await startup.ensure_imported()
+    from helpers.cassette import cassette
+    from semantic import semantic_cache_stats
+    from tools import handle_cache_stats, search_cache_stats, session_stats
+
+    return {
+        "bluesky_session": session_stats(),
+        "handle_cache": handle_cache_stats(),
+        "explanation_cache": explanation_cache.stats(),
+        "search_cache": search_cache_stats(),
+        "semantic_cache": semantic_cache_stats(),
+        "cassette": cassette.stats(),
+        "admission": admission.stats(),
+        "upstreams": upstream_stats(),
+        "trending": trending.stats(),
+        "jobs": jobs.stats(),
+        "deadlines": deadline_stats(),
+    }
+
+
+@router.get("/admission", include_in_schema=False)
+async def admission_status():
+    """Queue depth, in-flight runs and wait-time percentiles (explain and per upstream), for autoscaling."""
+    return {"explain": admission.stats(), "upstreams": upstream_stats()}
+
+
+@router.get("/trending", include_in_schema=False)
+async def trending_status(n: int = 20):
+    """Pre-explanation service: event counts, queue, budget, cache hits it produced, and the n top-scoring posts."""
+    return {**trending.stats(), "top": trending.trending(max(1, min(n, config.TRENDING_TOP_K)))}
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: request/stage latency histograms, LLM turns, TTFT, tokens, cost, cache hits, errors."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@router.get("/debug/slow", include_in_schema=False)
+async def debug_slow(n: int = 10):
+    """The n slowest recent explain runs with per-stage breakdown and span timeline (and profile file if sampled)."""
+    return {"runs": profiler.slowest(max(1, min(n, 100)))}
+
+
 @router.post(
     "/explain",
     response_model=ExplainResponse,
     summary="Explain a Bluesky post",
 )
 async def explain_post(body: ExplainRequest):
-    """Explain a Bluesky post. Pass the post URL in the request body. Runs asynchronously."""
+    """Explain a Bluesky post. Pass the post URL in the request body. Runs asynchronously.
+
+    Results are cached by canonical AT URI (set refresh=true to recompute); concurrent requests
+    for a post that is already being explained wait for that run. New runs go through admission
+    control: 429 (queue full) or 503 (no slot in time, or an upstream saturated) with Retry-After.
+    Runs have a deadline (config.EXPLAIN_DEADLINE_SECONDS): tool calls that time out are listed in
+    timed_out_tools, and a run that overruns it entirely is a 504.
+    """
+    start = time.perf_counter()
     url = _validate_post_url(body.post_url)
+    await startup.ensure_imported()
+    at_uri = await _resolve_at_uri(url)
     try:
-        result = await explain_with_stats_async(url)
+        result, cache_hit = await explanation_cache.get_or_compute(
+            at_uri,
+            lambda: _admitted(
+                lambda: _explain_async(url, body.mode, max_cost_usd=body.max_cost_usd, refresh=body.refresh)
+            ),
+            refresh=body.refresh,
+        )
     except Exception as e:
+        record_error("explain")
+        overloaded = _overloaded(e)
+        if overloaded is not None:
+            raise overloaded from e
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+    _record(result, start, cache_hit)
+    if cache_hit:
+        return _cached_response(url, result, start)
+    return _to_response(url, result)
+
+
+@router.post(
+    "/explain/jobs",
+    response_model=ExplainJob,
+    status_code=202,
+    summary="Submit an explain job",
+)
+async def submit_explain_job(body: ExplainJobRequest, response: Response):
+    """Queue an explanation and return the job at once; poll GET /explain/jobs/{id} or pass webhook_url.
+
+    Jobs survive restarts (SQLite queue) and are run by a bounded worker pool. Submitting a post that already
+    has a queued, running or recently finished job returns that job (200) instead of a new one (202);
+    refresh=true only reuses a queued or running job. If that job reports to a different webhook_url, the request
+    is a 409 (Location: the existing job). A webhook_url whose host is not allowed (see jobs.py:
+    private/loopback addresses, or not in JOBS_WEBHOOK_ALLOWED_HOSTS) is a 400.
+    """
+    url = _validate_post_url(body.post_url)
+    if body.webhook_url is not None:
+        problem = await webhook_url_problem(body.webhook_url)
+        if problem is not None:
+            raise HTTPException(status_code=400, detail=problem)
+    await startup.ensure_imported()
+    at_uri = await _resolve_at_uri(url)
+    params = {"mode": body.mode, "max_cost_usd": body.max_cost_usd, "refresh": body.refresh}
+    try:
+        job, created = await asyncio.to_thread(jobs.submit, at_uri, url, params, body.webhook_url, body.refresh)
+    except WebhookConflict as e:
+        raise HTTPException(
+            status_code=409, detail=str(e), headers={"Location": f"/explain/jobs/{e.job['id']}"}
+        ) from e
+    response.status_code = 202 if created else 200
+    response.headers["Location"] = f"/explain/jobs/{job['id']}"
+    return ExplainJob(**job_view(job))
+
+
+@router.get("/explain/jobs/{job_id}", response_model=ExplainJob, summary="Explain job status and result")
+async def get_explain_job(job_id: str):
+    """Status of an explain job; result (same fields as POST /explain) once done, error once failed."""
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return ExplainJob(**job_view(job))
+
+
+def _cached_response(url: str, result: dict, start: float) -> ExplainResponse:
+    return ExplainResponse(
+        post_url=url,
+        explanation=result["explanation"],
+        request_elapsed_seconds=round(time.perf_counter() - start, 2),
+        mode=result.get("mode"),
+        model=result.get("model"),
+        timed_out_tools=result.get("timed_out_tools"),
+        cache_hit=True,
+    )
+
+
+def _to_response(url: str, result: dict) -> ExplainResponse:
     usage = result.get("usage") or {}
     token_usage = None
     if any(
@@ -65,4 +401,200 @@ async def explain_post(body: ExplainRequest):
         token_usage=token_usage,
         time_to_first_token_seconds=round(ttft, 2) if ttft is not None else None,
         model_run_duration_seconds=round(model_dur, 2) if model_dur is not None else None,
+        search_tokens_saved=(result.get("compaction") or {}).get("tokens_saved"),
+        mode=result.get("mode"),
+        model=result.get("model"),
+        escalation_reason=(result.get("cascade") or {}).get("escalation_reason"),
+        semantic_reuse=(result.get("semantic_cache") or {}).get("reuse"),
+        semantic_similarity=(result.get("semantic_cache") or {}).get("similarity"),
+        timed_out_tools=result.get("timed_out_tools"),
+    )
+
+
+@router.post(
+    "/explain/stream",
+    summary="Explain a Bluesky post (server-sent events)",
+    response_class=StreamingResponse,
+)
+async def explain_post_stream(body: ExplainRequest, request: Request):
+    """Explain a Bluesky post, streaming progress as server-sent events.
+
+    Events: `progress` (tool calls: fetching post, searching), `delta` (explanation text chunks),
+    then `done` with the same fields as the /explain response (or `error`). A cached explanation is
+    sent as a single delta, and so is the result of a run already in flight for the post (from /explain, a job
+    or another stream), which this request joins instead of starting its own. A stream's own run is joined the
+    same way by concurrent requests for the post. If the client disconnects, the agent run is cancelled (joined
+    /explain requests then run it themselves). A new run needs an
+    admission slot; if none is free in time the request fails with 429/503 before streaming starts.
+    Streaming always runs the agent: "mode" other than agent, or "max_cost_usd" (cascade only), is a 400.
+    The run has the same deadline as /explain; past it the stream ends with an `error` event.
+    """
+    start = time.perf_counter()
+    url = _validate_post_url(body.post_url)
+    if body.mode not in (None, "agent") or body.max_cost_usd is not None:
+        raise HTTPException(
+            status_code=400, detail="/explain/stream only supports agent mode (no mode or max_cost_usd); use /explain"
+        )
+    await startup.ensure_imported()
+    from agent import explain_stream_async
+
+    at_uri = await _resolve_at_uri(url)
+    cached = None if body.refresh else explanation_cache.get(at_uri)
+    # A run in flight is fresh, so it is joined even with refresh.
+    joined = explanation_cache.in_flight(at_uri) if cached is None else None
+    release = run = None
+    if cached is None and joined is None:
+        try:
+            release = await admission.acquire()
+        except Overloaded as e:
+            raise _overloaded(e) from e
+        run = explanation_cache.begin_external(at_uri)
+
+    def cleanup() -> None:
+        # Idempotent; a run that never produced its result is abandoned, so joined requests compute it themselves.
+        if run is not None:
+            explanation_cache.end_external(at_uri, run)
+        if release is not None:
+            release()
+
+    async def events():
+        if cached is not None:
+            yield _sse("delta", {"content": cached["explanation"]})
+            yield _sse("done", _cached_response(url, cached, start).model_dump())
+            _record(cached, start, cache_hit=True)
+            return
+        if joined is not None:
+            try:
+                data = await asyncio.shield(joined)
+            except Exception as e:
+                record_error("explain")
+                yield _sse("error", {"detail": str(e) or "The run this request joined was abandoned; retry"})
+                return
+            yield _sse("delta", {"content": data["explanation"]})
+            yield _sse("done", _to_response(url, data).model_dump())
+            _record(data, start, cache_hit=False)
+            return
+        scope = set_request_deadline(config.EXPLAIN_DEADLINE_SECONDS)
+        stream = explain_stream_async(url)
+        try:
+            while True:
+                # Only the wait for the next event is bounded; the time spent sending chunks to the client is not.
+                try:
+                    async with asyncio.timeout(max(0.0, scope.remaining() + config.DEADLINE_GRACE_SECONDS)) as step:
+                        event, data = await anext(stream)
+                except StopAsyncIteration:
+                    break
+                except TimeoutError as e:
+                    if not step.expired():
+                        raise
+                    raise DeadlineExceeded(config.EXPLAIN_DEADLINE_SECONDS) from e
+                if await request.is_disconnected():
+                    break
+                if event == "tool_call":
+                    label = _TOOL_PROGRESS.get(data["tool"], f"calling {data['tool']}")
+                    yield _sse("progress", {"stage": label, **data})
+                elif event == "delta":
+                    yield _sse("delta", data)
+                elif event == "done":
+                    if scope.timed_out:
+                        data = {**data, "timed_out_tools": sorted(set(scope.timed_out))}
+                    explanation_cache.end_external(at_uri, run, value=data)
+                    _record(data, start, cache_hit=False)
+                    yield _sse("done", _to_response(url, data).model_dump())
+        except Exception as e:
+            record_error("explain")
+            explanation_cache.end_external(at_uri, run, error=e)
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            # Also reached on cancellation (client gone): closing the generator stops the agent run.
+            await stream.aclose()
+            cleanup()
+
+    # The response calls cleanup() too, for when events() never ran.
+    return _CleanupStreamingResponse(
+        events(),
+        cleanup,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@router.post(
+    "/explain/batch",
+    summary="Explain many Bluesky posts (NDJSON stream)",
+    response_class=StreamingResponse,
+)
+async def explain_batch(body: BatchExplainRequest):
+    """Explain up to config.BATCH_MAX_URLS posts. Streams one JSON line (BatchExplainItem) per URL as it finishes.
+
+    URLs are deduplicated by AT URI, authors are resolved once each and post text is fetched in bulk
+    (getPosts, 25 per call), so the agent does not fetch posts itself. At most
+    config.BATCH_EXPLAIN_CONCURRENCY agent runs are in flight, each also holding an admission slot;
+    a failing (or rejected) item only fails its own line.
+    """
+    start = time.perf_counter()
+    await startup.ensure_imported()
+    from tools import ahydrate_posts
+
+    urls = [(u or "").strip() for u in body.post_urls]
+    valid = sorted({u for u in urls if BSKY_POST_URL_PATTERN.match(u)})
+    hydrated = await ahydrate_posts(valid)
+
+    # One agent run per distinct post; remember which request positions it answers.
+    indexes_by_uri: dict[str, list[int]] = {}
+    url_by_uri: dict[str, str] = {}
+    failed: list[BatchExplainItem] = []
+    for i, url in enumerate(urls):
+        info = hydrated.get(url)
+        if info is None:
+            failed.append(BatchExplainItem(index=i, post_url=url, error="post_url must be a bsky.app post URL"))
+        elif info.get("error"):
+            failed.append(BatchExplainItem(index=i, post_url=url, at_uri=info.get("at_uri"), error=info["error"]))
+        else:
+            indexes_by_uri.setdefault(info["at_uri"], []).append(i)
+            url_by_uri.setdefault(info["at_uri"], url)
+
+    semaphore = asyncio.Semaphore(config.BATCH_EXPLAIN_CONCURRENCY)
+
+    async def explain_one(at_uri: str) -> tuple[str, ExplainResponse | None, str | None]:
+        url = url_by_uri[at_uri]
+        cached = None if body.refresh else explanation_cache.get(at_uri)
+        if cached is not None:
+            _record(cached, start, cache_hit=True)
+            return at_uri, _cached_response(url, cached, start), None
+        text = hydrated[url]["text"]
+        item_start = time.perf_counter()
+        try:
+            async with semaphore:
+                result, cache_hit = await explanation_cache.get_or_compute(
+                    at_uri,
+                    lambda: _admitted(
+                        lambda: _explain_async(
+                            url, body.mode, post_text=text, max_cost_usd=body.max_cost_usd, refresh=body.refresh
+                        )
+                    ),
+                    refresh=body.refresh,
+                )
+        except Exception as e:
+            record_error("explain")
+            return at_uri, None, str(e)
+        _record(result, item_start, cache_hit)
+        return at_uri, _cached_response(url, result, start) if cache_hit else _to_response(url, result), None
+
+    async def lines():
+        for item in failed:
+            yield item.model_dump_json() + "\n"
+        tasks = [asyncio.create_task(explain_one(uri)) for uri in indexes_by_uri]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                at_uri, response, error = await next_done
+                for i in indexes_by_uri[at_uri]:
+                    if response is not None:
+                        response = response.model_copy(update={"post_url": urls[i]})
+                    item = BatchExplainItem(index=i, post_url=urls[i], at_uri=at_uri, result=response, error=error)
+                    yield item.model_dump_json() + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
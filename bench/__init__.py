@@ -0,0 +1 @@
+# Benchmarks and local stub backends for the Bluesky Post Explainer
@@ -0,0 +1,130 @@
+"""
+Event-loop lag with N concurrent explains (explain_with_stats_async) against local stub backends (stub PDS,
+bench/stub_openai.py, bench/stub_search.py), and with N concurrent Bluesky fetches: the sync fetch tool called on
+the loop (what arun did before, for reference) vs the async-native tool.
+Exits with status 1 when the max lag of the async tool or of the explains exceeds --max-lag-ms.
+Usage (from project root): python bench/event_loop_lag.py [--concurrency 20] [--delay 0.05] [--max-lag-ms 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from bench.stub_openai import StubOpenAI
+from bench.stub_pds import StubPDS
+from bench.stub_search import StubSearch
+
+
+class LagMonitor:
+    """Ticks every `interval` seconds on the loop and records how late each tick fires."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def summary(self) -> dict:
+        lags = sorted(self.lags) or [0.0]
+        return {
+            "ticks": len(self.lags),
+            "max_lag_ms": round(lags[-1] * 1000, 2),
+            "p99_lag_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+            "mean_lag_ms": round(sum(lags) / len(lags) * 1000, 2),
+        }
+
+
+async def _measure(call, concurrency: int) -> dict:
+    urls = [f"https://bsky.app/profile/author{i % 5}.stub/post/rkey{i}" for i in range(concurrency)]
+    with LagMonitor() as monitor:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(call(u) for u in urls), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+    errors = [r for r in results if isinstance(r, Exception)]
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+        **monitor.summary(),
+    }
+
+
+async def run(concurrency: int) -> dict:
+    from agent import explain_with_stats_async
+    from tools import afetch_bluesky_post, fetch_bluesky_post, session_stats
+
+    async def sync_on_loop(url: str) -> str:
+        # A sync tool invoked directly from a coroutine: blocks the loop for the whole fetch.
+        return fetch_bluesky_post(url)
+
+    # Warm both sessions so the numbers exclude the one-time login.
+    fetch_bluesky_post("https://bsky.app/profile/warm.stub/post/warm")
+    await afetch_bluesky_post("https://bsky.app/profile/warm.stub/post/warm")
+    return {
+        "explain": await _measure(explain_with_stats_async, concurrency),
+        "sync_tool_on_loop": await _measure(sync_on_loop, concurrency),
+        "async_tool": await _measure(afetch_bluesky_post, concurrency),
+        "bluesky_session": session_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop lag of concurrent explains and the fetch tools")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.05, help="Stub PDS and search delay per request (seconds)")
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="Stub OpenAI time to first token (seconds)")
+    parser.add_argument(
+        "--max-lag-ms", type=float, default=50.0, help="Fail when explain or async-tool max lag exceeds this"
+    )
+    args = parser.parse_args()
+
+    stub_search = StubSearch(delay_seconds=args.delay)
+    with StubPDS(delay_seconds=args.delay) as pds, StubOpenAI(delay_seconds=args.llm_delay) as oai:
+        # Read at import time by config, the OpenAI SDK and the fetch tools.
+        os.environ["BLUESKY_BASE_URL"] = pds.base_url
+        os.environ["BLUESKY_EMAIL"] = "stub@example.com"
+        os.environ["BLUESKY_PASSWORD"] = "stub-password"
+        os.environ["OPENAI_BASE_URL"] = oai.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        from tools.cached_search import set_search_backend
+
+        set_search_backend(stub_search)
+        report = asyncio.run(run(args.concurrency))
+        report["upstream_requests"] = {"pds": pds.requests, "openai": oai.requests, "search": stub_search.calls}
+    failures = [
+        f"{name}: max lag {report[name]['max_lag_ms']}ms > {args.max_lag_ms:g}ms"
+        for name in ("explain", "async_tool")
+        if report[name]["max_lag_ms"] > args.max_lag_ms
+    ]
+    failures += [
+        f"{name}: {report[name]['errors']} errors" for name in ("explain", "async_tool") if report[name]["errors"]
+    ]
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Load test / latency benchmark for the FastAPI app (main:app), run in-process against local stub backends
+(bench/stub_pds.py, bench/stub_openai.py, bench/stub_search.py).
+Drives POST /explain at fixed request rates (open loop) and fixed concurrency levels (closed loop) and reports
+p50/p95/p99 latency, throughput, error rate, event-loop lag and peak RSS. Results are saved as JSON.
+
+Usage (from project root):
+  python bench/load_test.py [--rps 1 5 10] [--concurrency 1 8 32] [--duration 15] [--llm-delay 0.5] [--output out.json]
+  python bench/load_test.py --compare bench/results/before.json bench/results/after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from bench.event_loop_lag import LagMonitor
+from bench.stub_openai import StubOpenAI
+from bench.stub_pds import StubPDS
+from bench.stub_search import StubSearch
+
+RESULTS_DIR = _root / "bench" / "results"
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def _summary(label: dict, latencies: list[float], errors: int, elapsed: float, lag: dict) -> dict:
+    lat = sorted(latencies)
+    total = len(latencies) + errors
+
+    def ms(v):
+        return round(v * 1000, 1) if v is not None else None
+
+    return {
+        **label,
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else None,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": ms(percentile(lat, 0.50)),
+            "p95": ms(percentile(lat, 0.95)),
+            "p99": ms(percentile(lat, 0.99)),
+            "max": ms(lat[-1] if lat else None),
+            "mean": ms(sum(lat) / len(lat) if lat else None),
+        },
+        "event_loop_lag": lag,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+class Driver:
+    """Sends /explain requests for unique post URLs (so the explanation cache does not short-circuit runs)."""
+
+    def __init__(self, client, authors: int = 20):
+        self.client = client
+        self.authors = authors
+        self._ids = itertools.count()
+        self._run = int(time.time())
+
+    def _body(self) -> dict:
+        n = next(self._ids)
+        return {"post_url": f"https://bsky.app/profile/author{n % self.authors}.stub/post/bench{self._run}x{n}"}
+
+    async def one(self, latencies: list[float], errors: list[str]) -> None:
+        start = time.perf_counter()
+        try:
+            resp = await self.client.post("/explain", json=self._body())
+            if resp.status_code != 200:
+                errors.append(f"HTTP {resp.status_code}")
+                return
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        latencies.append(time.perf_counter() - start)
+
+    async def fixed_rps(self, rps: float, duration: float) -> dict:
+        """Open loop: start a request every 1/rps seconds regardless of how many are in flight."""
+        latencies: list[float] = []
+        errors: list[str] = []
+        tasks = []
+        with LagMonitor() as monitor:
+            start = time.perf_counter()
+            for i in range(int(rps * duration)):
+                delay = start + i / rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self.one(latencies, errors)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        return _summary({"mode": "rps", "target_rps": rps}, latencies, len(errors), elapsed, monitor.summary())
+
+    async def fixed_concurrency(self, concurrency: int, duration: float) -> dict:
+        """Closed loop: `concurrency` workers each send the next request as soon as the previous one finishes."""
+        latencies: list[float] = []
+        errors: list[str] = []
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.one(latencies, errors)
+
+        with LagMonitor() as monitor:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+        return _summary({"mode": "concurrency", "concurrency": concurrency}, latencies, len(errors), elapsed, monitor.summary())
+
+
+async def run(args) -> list[dict]:
+    import httpx
+
+    from main import app
+
+    levels = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            driver = Driver(client)
+            # Warm-up: login, handle cache, client construction.
+            await driver.one([], [])
+            for rps in args.rps:
+                levels.append(await driver.fixed_rps(rps, args.duration))
+                print(json.dumps(levels[-1]), flush=True)
+            for concurrency in args.concurrency:
+                levels.append(await driver.fixed_concurrency(concurrency, args.duration))
+                print(json.dumps(levels[-1]), flush=True)
+    return levels
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_root, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def _level_key(level: dict) -> str:
+    return f"rps={level['target_rps']}" if level["mode"] == "rps" else f"concurrency={level['concurrency']}"
+
+
+def compare(before_path: Path, after_path: Path) -> None:
+    """Print per-level deltas between two saved result files."""
+    before = json.loads(before_path.read_text(encoding="utf-8"))
+    after = json.loads(after_path.read_text(encoding="utf-8"))
+    old = {_level_key(lv): lv for lv in before["levels"]}
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'level':<16}{'metric':<16}{'before':>10}{'after':>10}{'delta':>10}")
+    for level in after["levels"]:
+        key = _level_key(level)
+        if key not in old:
+            continue
+        rows = [(f"{p} ms", old[key]["latency_ms"][p], level["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        rows += [
+            ("throughput", old[key]["throughput_rps"], level["throughput_rps"]),
+            ("error_rate", old[key]["error_rate"], level["error_rate"]),
+            ("max lag ms", old[key]["event_loop_lag"]["max_lag_ms"], level["event_loop_lag"]["max_lag_ms"]),
+        ]
+        for name, a, b in rows:
+            delta = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "n/a"
+            print(f"{key:<16}{name:<16}{a if a is not None else '-':>10}{b if b is not None else '-':>10}{delta:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /explain against stub backends")
+    parser.add_argument("--rps", type=float, nargs="*", default=[1.0, 5.0], help="Open-loop request rates")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32], help="Closed-loop concurrency levels")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per level")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout (seconds)")
+    parser.add_argument("--pds-delay", type=float, default=0.05, help="Stub PDS latency per request (seconds)")
+    parser.add_argument("--search-delay", type=float, default=0.3, help="Stub search latency per call (seconds)")
+    parser.add_argument("--search-slow-fraction", type=float, default=0.0, help="Share of stub searches that hang")
+    parser.add_argument("--search-slow-seconds", type=float, default=10.0, help="How long a hanging stub search takes")
+    parser.add_argument("--pds-slow-fraction", type=float, default=0.0, help="Share of stub getPostThread calls that hang")
+    parser.add_argument("--pds-slow-seconds", type=float, default=10.0, help="How long a hanging getPostThread takes")
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="Stub OpenAI time to first token per completion (seconds)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub OpenAI delay per streamed chunk (seconds)")
+    parser.add_argument("--output-tokens", type=int, default=200, help="Stub OpenAI answer length (tokens)")
+    parser.add_argument("--searches", type=int, default=1, help="web_search calls the stub model makes per run")
+    parser.add_argument("--output", type=Path, default=None, help="Results JSON (default: bench/results/load-<commit>-<time>.json)")
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    stub_search = StubSearch(
+        delay_seconds=args.search_delay, slow_fraction=args.search_slow_fraction, slow_seconds=args.search_slow_seconds
+    )
+    with StubPDS(
+        delay_seconds=args.pds_delay, slow_fraction=args.pds_slow_fraction, slow_seconds=args.pds_slow_seconds
+    ) as pds, StubOpenAI(
+        delay_seconds=args.llm_delay,
+        token_delay_seconds=args.token_delay,
+        output_tokens=args.output_tokens,
+        searches=args.searches,
+    ) as oai:
+        # Read at import time by config, the OpenAI SDK and the fetch tools.
+        os.environ["BLUESKY_BASE_URL"] = pds.base_url
+        os.environ["BLUESKY_EMAIL"] = "stub@example.com"
+        os.environ["BLUESKY_PASSWORD"] = "stub-password"
+        os.environ["OPENAI_BASE_URL"] = oai.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        from tools.cached_search import set_search_backend
+
+        set_search_backend(stub_search)
+        levels = asyncio.run(run(args))
+        report = {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k != "compare"},
+            "levels": levels,
+            "upstream_requests": {"pds": pds.requests, "openai": oai.requests, "search": stub_search.calls},
+        }
+
+    out_path = args.output or RESULTS_DIR / f"load-{report['commit'] or 'nogit'}-{int(time.time())}.json"
+    out_path = out_path if out_path.is_absolute() else _root / out_path
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
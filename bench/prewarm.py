@@ -0,0 +1,159 @@
+"""
+Trending pre-explanation benchmark on a synthetic Jetstream replay (no network, explainer stubbed).
+Generates a feed where most posts get a trickle of likes and a few go viral (engagement ramps up from a
+random start), replays it through TrendingService at --speed times real time, and has simulated users
+request posts in proportion to their engagement. Reports the share of requests served from pre-explained
+entries, how many pre-explanations were never requested, the sketch's top-k recall against exact counts,
+and the sketch memory. --write-replay keeps the generated file for `python trending.py --source`.
+
+Usage (from project root):
+  python bench/prewarm.py [--posts 20000] [--viral 20] [--minutes 30] [--speed 60] [--output out.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import config
+from bench.load_test import RESULTS_DIR, _git_commit, peak_rss_mb
+from helpers.explanation_cache import ExplanationCache
+from trending import TrendingService, engagement, replay_events
+
+_KINDS = (("app.bsky.feed.like", 0.75), ("app.bsky.feed.repost", 0.15), ("reply", 0.07), ("quote", 0.03))
+
+
+def _event(post_uri: str, t: float, rng: random.Random) -> dict:
+    collection = rng.choices([k for k, _ in _KINDS], weights=[w for _, w in _KINDS])[0]
+    if collection == "reply":
+        collection, record = "app.bsky.feed.post", {"text": "…", "reply": {"parent": {"uri": post_uri}, "root": {"uri": post_uri}}}
+    elif collection == "quote":
+        collection, record = "app.bsky.feed.post", {"text": "…", "embed": {"$type": "app.bsky.embed.record", "record": {"uri": post_uri}}}
+    else:
+        record = {"subject": {"uri": post_uri, "cid": "bafy"}}
+    return {
+        "did": f"did:plc:user{rng.randrange(10**6)}",
+        "time_us": int(t * 1e6),
+        "kind": "commit",
+        "commit": {"operation": "create", "collection": collection, "rkey": "r", "record": record},
+    }
+
+
+def synthesize(path: Path, posts: int, viral: int, minutes: float, background_rate: float, seed: int) -> int:
+    """Write a replay file: `background_rate` events/s spread Zipf-like over `posts`, plus `viral` posts
+    ramping up to 20 events/s each from random start times. Returns the number of events."""
+    rng = random.Random(seed)
+    start, duration = 1_700_000_000.0, minutes * 60
+    uris = [f"at://did:plc:author{i % 997}/app.bsky.feed.post/p{i}" for i in range(posts)]
+    weights = [1 / (i + 1) for i in range(posts)]
+    times = [(start + rng.uniform(0, duration), uri) for uri in rng.choices(uris, weights, k=int(background_rate * duration))]
+    for v in range(viral):
+        uri = f"at://did:plc:viral{v}/app.bsky.feed.post/v{v}"
+        t = start + rng.uniform(0, duration * 0.7)
+        while t < start + duration:
+            rate = min(20.0, 0.2 * 1.5 ** ((t - start) / 60))
+            t += rng.expovariate(rate)
+            times.append((t, uri))
+    times.sort()
+    with open(path, "w", encoding="utf-8") as f:
+        for t, uri in times:
+            f.write(json.dumps(_event(uri, t, rng)) + "\n")
+    return len(times)
+
+
+async def run(replay: Path, speed: float, view_rate: float, llm_delay: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    cache = ExplanationCache(maxsize=config.EXPLANATION_CACHE_MAXSIZE, ttl=config.EXPLANATION_CACHE_TTL_SECONDS)
+
+    async def fake_explain(post_url: str) -> dict:
+        await asyncio.sleep(llm_delay / speed)
+        return {"explanation": f"stub for {post_url}", "usage": {"cost": 0.002}, "mode": "stub"}
+
+    budget = config.TRENDING_MAX_COST_USD_PER_HOUR
+    service = TrendingService(
+        cache,
+        fake_explain,
+        explains_per_minute=config.TRENDING_EXPLAINS_PER_MINUTE * speed,
+        max_cost_usd_per_hour=budget * speed if budget else None,
+    )
+    exact: dict[str, float] = {}
+    requests = {"total": 0, "cache_hits": 0}
+
+    async def events_with_users():
+        async for event in replay_events(replay, speed=speed):
+            found = engagement(event)
+            if found:
+                exact[found[1]] = exact.get(found[1], 0.0) + 1
+                if rng.random() < view_rate:
+                    requests["total"] += 1
+                    cached = cache.get(found[1])
+                    if cached is not None:
+                        requests["cache_hits"] += 1
+                        service.record_served(cached, cache_hit=True)
+            yield event
+
+    started = time.perf_counter()
+    await service.run(events_with_users(), source=str(replay))
+    elapsed = time.perf_counter() - started
+    stats = service.stats()
+    k = config.TRENDING_TOP_K
+    exact_top = {uri for uri, _ in sorted(exact.items(), key=lambda kv: kv[1], reverse=True)[:k]}
+    sketch_top = {uri for uri, _ in service.top.items()}
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "distinct_posts": len(exact),
+        "requests": requests["total"],
+        "prewarmed_hit_share": round(stats["cache_hits"] / requests["total"], 4) if requests["total"] else None,
+        "posts_explained": stats["runs"].get("explained", 0),
+        "posts_hit_rate": stats["posts_hit_rate"],
+        # All-time totals vs decayed scores, so this understates how well the sketch tracks current velocity.
+        "top_k_recall_vs_alltime": round(len(exact_top & sketch_top) / len(exact_top), 3) if exact_top else None,
+        "sketch_memory_kb": round(stats["sketch"]["memory_bytes"] / 1024, 1),
+        "trending_stats": stats,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trending pre-explanation on a synthetic replay")
+    parser.add_argument("--posts", type=int, default=20_000, help="Long-tail posts")
+    parser.add_argument("--viral", type=int, default=20, help="Posts that go viral")
+    parser.add_argument("--minutes", type=float, default=30.0, help="Feed duration (event time)")
+    parser.add_argument("--background-rate", type=float, default=50.0, help="Long-tail events per second")
+    parser.add_argument("--speed", type=float, default=60.0, help="Replay speed (x real time)")
+    parser.add_argument("--view-rate", type=float, default=0.02, help="Explain requests per engagement event")
+    parser.add_argument("--llm-delay", type=float, default=5.0, help="Stub explain time at real-time speed (seconds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--write-replay", type=Path, default=None, help="Keep the generated replay file here")
+    parser.add_argument("--output", type=Path, default=None, help="Results JSON (default: bench/results/prewarm-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replay = args.write_replay or Path(tmp) / "replay.jsonl"
+        count = synthesize(replay, args.posts, args.viral, args.minutes, args.background_rate, args.seed)
+        print(f"Replaying {count} events from {replay}", flush=True)
+        result = asyncio.run(run(replay, args.speed, args.view_rate, args.llm_delay, args.seed))
+    print(json.dumps({k: v for k, v in result.items() if k != "trending_stats"}, indent=2), flush=True)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "result": result,
+    }
+    out_path = args.output or RESULTS_DIR / f"prewarm-{report['commit'] or 'nogit'}-{int(time.time())}.json"
+    out_path = out_path if out_path.is_absolute() else _root / out_path
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Startup benchmark: cold import times and time to liveness / readiness / first /explain, against local stubs.
+Each module's import time is measured in a fresh interpreter (median of --repeat runs). The startup timeline is
+measured in-process: import main, enter the lifespan, then time the first /health, the first 200 from /ready
+(with the warm-up phase timings it reports) and the first /explain. Results are saved as JSON.
+
+Usage (from project root):
+  python bench/startup.py [--repeat 5] [--output out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from bench.load_test import RESULTS_DIR, _git_commit, peak_rss_mb
+from bench.stub_openai import StubOpenAI
+from bench.stub_pds import StubPDS
+from bench.stub_search import StubSearch
+
+# main first: it should stay light; the rest are what warm-up imports in the background.
+MODULES = ("main", "tools", "agent", "pipeline", "cascade")
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def cold_import_seconds(module: str, repeat: int, env: dict) -> dict:
+    """Import `module` in a fresh interpreter `repeat` times; median/min/max seconds."""
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+            cwd=_root, env=env, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "import failed"}
+        runs.append(float(out.stdout.strip().splitlines()[-1]))
+    return {
+        "median_ms": round(statistics.median(runs) * 1000, 1),
+        "min_ms": round(min(runs) * 1000, 1),
+        "max_ms": round(max(runs) * 1000, 1),
+    }
+
+
+async def startup_timeline(ready_timeout: float, search_backend) -> dict:
+    """Seconds from `import main` to the first /health, /ready 200 and /explain responses."""
+    import httpx
+
+    t0 = time.perf_counter()
+    from main import app
+
+    timeline = {"import_main_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            r = await client.get("/health")
+            timeline["first_health_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            timeline["health_status"] = r.status_code
+            deadline = time.perf_counter() + ready_timeout
+            while True:
+                r = await client.get("/ready")
+                if r.status_code == 200 or time.perf_counter() > deadline:
+                    break
+                await asyncio.sleep(0.01)
+            timeline["ready_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            timeline["ready"] = r.json()
+            # tools is imported by now (warm-up); importing it earlier would skew import_main_ms.
+            from tools.cached_search import set_search_backend
+
+            set_search_backend(search_backend)
+            start = time.perf_counter()
+            r = await client.post(
+                "/explain", json={"post_url": "https://bsky.app/profile/startup.bench.test/post/first"}
+            )
+            timeline["first_explain_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            timeline["first_explain_status"] = r.status_code
+    timeline["peak_rss_mb"] = peak_rss_mb()
+    return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import and startup time")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh-interpreter imports per module")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="Seconds to wait for /ready")
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="Stub OpenAI time to first token (seconds)")
+    parser.add_argument("--output", type=Path, default=None, help="Results JSON (default: bench/results/startup-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    with StubPDS(delay_seconds=0.05) as pds, StubOpenAI(delay_seconds=args.llm_delay) as oai:
+        # Read at import time by config, the OpenAI SDK and the fetch tools.
+        os.environ["BLUESKY_BASE_URL"] = pds.base_url
+        os.environ["BLUESKY_EMAIL"] = "stub@example.com"
+        os.environ["BLUESKY_PASSWORD"] = "stub-password"
+        os.environ["OPENAI_BASE_URL"] = oai.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        imports = {m: cold_import_seconds(m, args.repeat, dict(os.environ)) for m in MODULES}
+        for module, timing in imports.items():
+            print(f"import {module:<10} {json.dumps(timing)}", flush=True)
+
+        timeline = asyncio.run(startup_timeline(args.ready_timeout, StubSearch(delay_seconds=0.05)))
+        print(json.dumps(timeline, indent=2), flush=True)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "imports": imports,
+        "timeline": timeline,
+    }
+    out_path = args.output or RESULTS_DIR / f"startup-{report['commit'] or 'nogit'}-{int(time.time())}.json"
+    out_path = out_path if out_path.is_absolute() else _root / out_path
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Local stub OpenAI API: /v1/chat/completions (streamed or not, with tool calls) and /v1/embeddings.
+Plays the explainer's usual script: call fetch_bluesky_post, then `searches` web_search calls, then answer.
+Point the app at it with OPENAI_BASE_URL=<stub.base_url>.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_URL = re.compile(r"https?://(?:www\.)?bsky\.app/profile/[^/\s]+/post/[^/?#\s]+")
+
+
+def _approx_tokens(messages: list[dict]) -> int:
+    return sum(len(str(m.get("content") or "")) for m in messages) // 4 + 10 * len(messages)
+
+
+class StubOpenAI:
+    """Threaded HTTP server faking the OpenAI API.
+
+    delay_seconds: time before the first token of every completion. token_delay_seconds: per streamed chunk.
+    output_tokens: length of the final answer. searches: web_search calls before answering.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        delay_seconds: float = 0.5,
+        token_delay_seconds: float = 0.0,
+        output_tokens: int = 200,
+        searches: int = 1,
+    ):
+        self.delay_seconds = delay_seconds
+        self.token_delay_seconds = token_delay_seconds
+        self.output_tokens = output_tokens
+        self.searches = searches
+        self.requests: dict[str, int] = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                stub._handle(self)
+
+            def do_GET(self):
+                stub._handle(self)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAI":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_step(self, body: dict) -> tuple[str, dict] | None:
+        """(tool name, arguments) for the next tool call, or None to answer."""
+        messages = body.get("messages") or []
+        available = {t.get("function", {}).get("name") for t in body.get("tools") or []}
+        called = [
+            tc["function"]["name"]
+            for m in messages
+            if m.get("role") == "assistant"
+            for tc in m.get("tool_calls") or []
+        ]
+        prompt = " ".join(str(m.get("content") or "") for m in messages if m.get("role") == "user")
+        if "fetch_bluesky_post" in available and "fetch_bluesky_post" not in called and "Post text:" not in prompt:
+            match = _URL.search(prompt)
+            return "fetch_bluesky_post", {"post_url": match.group(0) if match else ""}
+        n_searches = called.count("web_search")
+        if "web_search" in available and n_searches < self.searches:
+            return "web_search", {"query": f"stub meme origin {n_searches + 1}"}
+        return None
+
+    def _answer(self) -> list[str]:
+        words = ["• The", "post", "refers", "to", "a", "stub", "meme", "that", "spread", "quickly."]
+        return [(" " if i else "") + words[i % len(words)] for i in range(self.output_tokens)]
+
+    def _chat(self, handler: BaseHTTPRequestHandler, body: dict) -> None:
+        time.sleep(self.delay_seconds)
+        step = self._next_step(body)
+        prompt_tokens = _approx_tokens(body.get("messages") or [])
+        created = int(time.time())
+        base = {"id": "chatcmpl-stub", "created": created, "model": body.get("model", "stub")}
+        if step is not None:
+            name, args = step
+            tool_call = {"id": f"call_{name}_{created}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+            content, completion_tokens, finish = None, 20, "tool_calls"
+        else:
+            tool_call, finish = None, "stop"
+            pieces = self._answer()
+            content, completion_tokens = "".join(pieces), len(pieces)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": content}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            payload = {**base, "object": "chat.completion", "choices": [{"index": 0, "message": message, "finish_reason": finish}], "usage": usage}
+            self._send_json(handler, 200, payload)
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def emit(obj) -> None:
+            data = f"data: {obj if isinstance(obj, str) else json.dumps(obj)}\n\n".encode()
+            handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            handler.wfile.flush()
+
+        chunk = {**base, "object": "chat.completion.chunk"}
+        if tool_call:
+            emit({**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}, "finish_reason": None}]})
+        else:
+            for i, piece in enumerate(self._answer()):
+                delta = {"content": piece} if i else {"role": "assistant", "content": piece}
+                emit({**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                if self.token_delay_seconds:
+                    time.sleep(self.token_delay_seconds)
+        emit({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": finish}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            emit({**chunk, "choices": [], "usage": usage})
+        emit("[DONE]")
+        handler.wfile.write(b"0\r\n\r\n")
+
+    def _embeddings(self, handler: BaseHTTPRequestHandler, body: dict) -> None:
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        data = []
+        for i, text in enumerate(inputs):
+            digest = hashlib.sha256(str(text).encode()).digest()
+            data.append({"object": "embedding", "index": i, "embedding": [(b - 128) / 128 for b in digest]})
+        tokens = sum(len(str(t)) // 4 for t in inputs)
+        self._send_json(handler, 200, {"object": "list", "data": data, "model": body.get("model"), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    @staticmethod
+    def _send_json(handler: BaseHTTPRequestHandler, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length) or b"{}")
+        path = handler.path.split("?", 1)[0]
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+        if path.endswith("/chat/completions"):
+            self._chat(handler, body)
+        elif path.endswith("/embeddings"):
+            self._embeddings(handler, body)
+        elif path.endswith("/models"):
+            self._send_json(handler, 200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model"}]})
+        else:
+            self._send_json(handler, 404, {"error": {"message": f"Unknown path {path}"}})
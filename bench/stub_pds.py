@@ -0,0 +1,168 @@
+"""
+Local stub PDS: just enough of the Bluesky XRPC API for the fetch tools (createSession, refreshSession,
+getProfile, resolveHandle, getPostThread, getPosts), with a configurable per-request delay (and optionally a share of
+getPostThread calls that hang, for tail-latency runs).
+Runs in a background thread; point the app at it with BLUESKY_BASE_URL=<stub.base_url>.
+"""
+import base64
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STUB_DID_PREFIX = "did:plc:stub"
+
+
+def _b64(obj: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+
+def _fake_jwt(did: str, ttl_seconds: int, scope: str) -> str:
+    now = int(time.time())
+    header = {"alg": "HS256", "typ": "JWT"}
+    payload = {"scope": scope, "sub": did, "iat": now, "exp": now + ttl_seconds, "aud": "did:web:stub"}
+    return f"{_b64(header)}.{_b64(payload)}.c2ln"
+
+
+def did_for_handle(handle: str) -> str:
+    return f"{STUB_DID_PREFIX}{zlib.crc32(handle.encode()) % 10**8:08d}"
+
+
+class StubPDS:
+    """Threaded HTTP server faking a PDS. delay_seconds is added to every request; slow_fraction of getPostThread
+    calls take slow_seconds instead (seeded).
+
+    Handles ending in `.invalid` do not resolve; every other handle maps to a stable fake DID.
+    `requests` counts calls per XRPC method.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        delay_seconds: float = 0.05,
+        slow_fraction: float = 0.0,
+        slow_seconds: float = 5.0,
+        seed: int = 0,
+    ):
+        self.delay_seconds = delay_seconds
+        self.slow_fraction = slow_fraction
+        self.slow_seconds = slow_seconds
+        self._random = random.Random(seed)
+        self.requests: dict[str, int] = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def do_POST(self):
+                stub._handle(self)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/xrpc"
+
+    def start(self) -> "StubPDS":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _session(self) -> dict:
+        did = did_for_handle("stub.user")
+        return {
+            "did": did,
+            "handle": "stub.user",
+            "accessJwt": _fake_jwt(did, 2 * 60 * 60, "com.atproto.access"),
+            "refreshJwt": _fake_jwt(did, 90 * 24 * 60 * 60, "com.atproto.refresh"),
+        }
+
+    @staticmethod
+    def _post_view(uri: str) -> dict:
+        did = uri.split("/")[2]
+        return {
+            "uri": uri,
+            "cid": "bafyreistubcid",
+            "author": {"did": did, "handle": f"{did.rsplit(':', 1)[-1]}.stub"},
+            "record": {
+                "$type": "app.bsky.feed.post",
+                "text": f"Stub post {uri.rsplit('/', 1)[-1]}: nobody expected the $STUB rally #stubcoin",
+                "createdAt": "2026-01-01T00:00:00.000Z",
+            },
+            "indexedAt": "2026-01-01T00:00:00.000Z",
+        }
+
+    def _route(self, method: str, params: dict) -> tuple[int, dict]:
+        if method in ("com.atproto.server.createSession", "com.atproto.server.refreshSession"):
+            return 200, self._session()
+        if method == "app.bsky.actor.getProfile":
+            actor = params.get("actor", ["stub.user"])[0]
+            did = actor if actor.startswith("did:") else did_for_handle(actor)
+            return 200, {"did": did, "handle": actor}
+        if method == "com.atproto.identity.resolveHandle":
+            handle = params.get("handle", [""])[0]
+            if not handle or handle.endswith(".invalid"):
+                return 400, {"error": "InvalidRequest", "message": "Unable to resolve handle"}
+            return 200, {"did": did_for_handle(handle)}
+        if method == "app.bsky.feed.getPostThread":
+            uri = params["uri"][0]
+            return 200, {"thread": {"$type": "app.bsky.feed.defs#threadViewPost", "post": self._post_view(uri)}}
+        if method == "app.bsky.feed.getPosts":
+            return 200, {"posts": [self._post_view(uri) for uri in params.get("uris", [])]}
+        return 501, {"error": "MethodNotImplemented", "message": method}
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        parsed = urlparse(handler.path)
+        method = parsed.path.rsplit("/", 1)[-1]
+        length = int(handler.headers.get("Content-Length") or 0)
+        if length:
+            handler.rfile.read(length)
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            slow = method == "app.bsky.feed.getPostThread" and self._random.random() < self.slow_fraction
+        delay = self.slow_seconds if slow else self.delay_seconds
+        if delay:
+            time.sleep(delay)
+        status, body = self._route(method, parse_qs(parsed.query))
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a stub Bluesky PDS")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--delay", type=float, default=0.05, help="Seconds added to every request")
+    args = parser.parse_args()
+    with StubPDS(port=args.port, delay_seconds=args.delay) as pds:
+        print(f"Stub PDS at {pds.base_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,39 @@
+"""Stub search backend for benchmarks: canned results after a configurable (optionally heavy-tailed) delay."""
+import json
+import random
+import threading
+import time
+
+
+class StubSearch:
+    """Callable usable with tools.cached_search.set_search_backend.
+
+    delay_seconds: base latency per search. slow_fraction / slow_seconds: share of calls that hang for
+    slow_seconds instead (the stuck-call tail). Seeded for reproducible runs.
+    """
+
+    def __init__(self, delay_seconds: float = 0.2, slow_fraction: float = 0.0, slow_seconds: float = 5.0, seed: int = 0):
+        self.delay_seconds = delay_seconds
+        self.slow_fraction = slow_fraction
+        self.slow_seconds = slow_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, kind: str, query: str, max_results: int = 5) -> str:
+        # Hedged searches call in from several threads at once.
+        with self._lock:
+            self.calls += 1
+            slow = self._random.random() < self.slow_fraction
+        time.sleep(self.slow_seconds if slow else self.delay_seconds)
+        return json.dumps(
+            [
+                {
+                    "title": f"{query} – result {i + 1}",
+                    "href": f"https://example.com/{kind}/{i + 1}?q={query.replace(' ', '+')}",
+                    "body": f"Background on {query}. It started as an in-joke and spread quickly in {2020 + i}. "
+                    f"Commentators linked {query} to several follow-up memes and a short-lived token.",
+                }
+                for i in range(max_results)
+            ]
+        )
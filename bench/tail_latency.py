@@ -0,0 +1,118 @@
+"""
+Tail latency of explain-style search fan-out against the heavy-tailed stub search backend, with and without the
+deadlines and hedging of helpers/deadline.py.
+Each simulated request runs --searches concurrent searches (like pipeline mode) under a request deadline and waits
+for all of them; a --slow-fraction share of backend calls hangs for --slow-seconds. Strategies:
+  plain:    backend called directly, no timeout (the tools before deadlines);
+  deadline: per-search timeout (config.SEARCH_TIMEOUT_SECONDS), no hedging;
+  hedged:   timeout plus a duplicate request after --hedge-after seconds, first answer wins.
+Usage (from project root): python bench/tail_latency.py [--requests 300] [--concurrency 8] [--slow-fraction 0.05]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import config
+from bench.load_test import percentile
+from bench.stub_search import StubSearch
+from helpers.deadline import ToolTimeout, call_with_deadline, deadline_stats, request_deadline
+
+STRATEGIES = ("plain", "deadline", "hedged")
+
+
+def _search(strategy: str, backend: StubSearch, query: str, hedge_after: float) -> str:
+    if strategy == "plain":
+        return backend("web", query, 5)
+    try:
+        return call_with_deadline(
+            f"bench_{strategy}",
+            lambda: backend("web", query, 5),
+            config.SEARCH_TIMEOUT_SECONDS,
+            hedge_after if strategy == "hedged" else None,
+        )
+    except ToolTimeout as e:
+        return f"[Search timed out after {e.seconds:g}s]"
+
+
+async def _request(strategy: str, backend: StubSearch, i: int, searches: int, hedge_after: float) -> tuple[float, bool]:
+    """(seconds, partial) for one request's concurrent searches."""
+    start = time.perf_counter()
+    with request_deadline(config.EXPLAIN_DEADLINE_SECONDS):
+        found = await asyncio.gather(
+            *(asyncio.to_thread(_search, strategy, backend, f"query {i}-{j}", hedge_after) for j in range(searches))
+        )
+    return time.perf_counter() - start, any(r.startswith("[Search timed out") for r in found)
+
+
+async def _run_strategy(strategy: str, args: argparse.Namespace) -> dict:
+    backend = StubSearch(args.delay, args.slow_fraction, args.slow_seconds, seed=args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int) -> tuple[float, bool]:
+        async with semaphore:
+            return await _request(strategy, backend, i, args.searches, args.hedge_after)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    lat = sorted(seconds for seconds, _ in results)
+
+    def ms(v):
+        return round(v * 1000, 1) if v is not None else None
+
+    return {
+        "strategy": strategy,
+        "requests": len(results),
+        "partial_results": sum(1 for _, partial in results if partial),
+        "backend_calls": backend.calls,
+        "extra_load": round(backend.calls / (args.requests * args.searches) - 1, 4),
+        "elapsed_seconds": round(elapsed, 2),
+        "latency_ms": {q: ms(percentile(lat, v)) for q, v in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+        | {"max": ms(lat[-1])},
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # One thread per in-flight search, so requests never queue for the default executor.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency * args.searches))
+    return {
+        "params": vars(args),
+        "strategies": [await _run_strategy(strategy, args) for strategy in args.strategies],
+        "deadlines": deadline_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request tail latency with and without search deadlines/hedging")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--searches", type=int, default=3, help="Concurrent searches per request")
+    parser.add_argument("--delay", type=float, default=0.3, help="Stub search latency per call (seconds)")
+    parser.add_argument("--slow-fraction", type=float, default=0.03, help="Share of stub searches that hang")
+    parser.add_argument("--slow-seconds", type=float, default=12.0, help="How long a hanging search takes")
+    parser.add_argument("--hedge-after", type=float, default=config.SEARCH_HEDGE_AFTER_SECONDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategies", nargs="*", choices=STRATEGIES, default=list(STRATEGIES))
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    for s in report["strategies"]:
+        lat = s["latency_ms"]
+        print(
+            f"{s['strategy']:>8}: p50 {lat['p50']}ms  p95 {lat['p95']}ms  p99 {lat['p99']}ms  max {lat['max']}ms  "
+            f"partial {s['partial_results']}/{s['requests']}  extra backend load {s['extra_load']:+.1%}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Model cascade mode for the explainer: cheap model first, stronger model only when needed.
+Runs the agent with config.CASCADE_MODELS[0]; if the answer looks low-confidence (too short, hedging,
+every search came back empty, or terms from the post left unexplained) and the projected total cost stays
+within the budget, reruns with the next model (post text is passed along, so the fetch is not repeated).
+The budget only governs escalation: the first run always happens, and a result whose cost already exceeds the
+budget is flagged ("over_budget" in "cascade").
+Returns the same dict shape as agent.explain_with_stats / explain_with_stats_async, plus "cascade".
+"""
+import json
+import re
+import time
+
+import config
+from agent import _count_model_turns, _make_prompt, _usage_from_response, build_agent, compaction_stats, new_async_agent
+from helpers.cost import estimate_openai_cost
+from helpers.profiling import profiler, record_model_turns
+from helpers.terms import extract_terms
+from tools import new_compactor
+
+_HEDGES = re.compile(
+    r"\b(?:i (?:could not|couldn't|can't|cannot|was unable to) find|unable to (?:find|determine|verify)"
+    r"|no (?:relevant |specific )?(?:information|results|context) (?:was |were )?(?:found|available)"
+    r"|(?:it is |it's )?unclear (?:what|who|whether|if)|not (?:sure|certain) (?:what|who|whether))\b",
+    re.IGNORECASE,
+)
+_SEARCH_TOOLS = {"web_search", "search_news"}
+
+
+def _tool_outputs(response, names: set[str]) -> list[str]:
+    """Contents of the run's tool results for the given tool names."""
+    messages = getattr(response, "messages", None) if response else None
+    return [
+        str(getattr(m, "content", "") or "")
+        for m in messages or []
+        if getattr(m, "role", None) == "tool" and getattr(m, "tool_name", None) in names
+    ]
+
+
+# Notes CachedWebSearchTools returns instead of results when a search timed out or was skipped at the deadline.
+_NO_RESULT_NOTES = ("[Search timed out", "[Search skipped")
+
+
+def _is_empty_search(output: str) -> bool:
+    output = output.strip()
+    if not output or output.startswith(_NO_RESULT_NOTES):
+        return True
+    try:
+        return not json.loads(output)
+    except ValueError:
+        return False
+
+
+def escalation_reason(explanation: str, post_text: str | None, search_outputs: list[str]) -> str | None:
+    """Why the answer looks low-confidence, or None if it can be kept."""
+    if len(explanation) < config.CASCADE_MIN_EXPLANATION_CHARS:
+        return "short_explanation"
+    if _HEDGES.search(explanation):
+        return "hedging"
+    if search_outputs and all(_is_empty_search(o) for o in search_outputs):
+        return "empty_searches"
+    if post_text:
+        lowered = explanation.lower()
+        terms = extract_terms(post_text, limit=config.PIPELINE_MAX_SEARCHES)
+        unexplained = [t for t in terms if t.lstrip("#$").lower() not in lowered]
+        if len(unexplained) > config.CASCADE_MAX_UNEXPLAINED_TERMS:
+            return "unexplained_terms"
+    return None
+
+
+def _projected_cost(spent: float | None, usage: dict | None, next_model: str) -> float | None:
+    """Spent so far plus the next model's cost for the same token counts; None if unknown."""
+    usage = usage or {}
+    if spent is None or usage.get("input_tokens") is None or usage.get("output_tokens") is None:
+        return None
+    next_cost = estimate_openai_cost(next_model, usage["input_tokens"], usage["output_tokens"])
+    return None if next_cost is None else spent + next_cost
+
+
+def _merge_usage(runs: list[dict]) -> dict | None:
+    """Token counts and cost summed over all runs; timings from the final run."""
+    usages = [r["usage"] for r in runs if r["usage"]]
+    if not usages:
+        return None
+    merged = {}
+    for key in ("input_tokens", "output_tokens", "total_tokens", "cost"):
+        values = [u[key] for u in usages if u.get(key) is not None]
+        if values:
+            merged[key] = round(sum(values), 4) if key == "cost" else sum(values)
+    final = runs[-1]["usage"] or {}
+    for key in ("time_to_first_token_seconds", "model_run_duration_seconds"):
+        if final.get(key) is not None:
+            merged[key] = final[key]
+    return merged
+
+
+def _merge_compaction(runs: list[dict]) -> dict | None:
+    """Search compaction counters summed over runs (each run compacts against its own context)."""
+    stats = [r["compaction"] for r in runs if r.get("compaction")]
+    if not stats:
+        return None
+    return {key: sum(s.get(key, 0) for s in stats) for key in stats[0]}
+
+
+class _Cascade:
+    """Bookkeeping for one cascade run: results per model and the escalation decision."""
+
+    def __init__(self, post_text: str | None, max_cost_usd: float | None):
+        self.post_text = post_text
+        self.budget = max_cost_usd
+        self.runs: list[dict] = []
+        self.reason: str | None = None
+        self.stopped_by_budget = False
+
+    def add_run(self, model: str, response, compaction: dict | None = None) -> bool:
+        """Record a finished run; True if the next model should be tried."""
+        explanation = (response.content or "").strip() if response else ""
+        usage = _usage_from_response(response, model=model)
+        self.runs.append({
+            "model": model,
+            "explanation": explanation,
+            "usage": usage,
+            "llm_turns": _count_model_turns(response),
+            "compaction": compaction,
+        })
+        if self.post_text is None:
+            fetched = _tool_outputs(response, {"fetch_bluesky_post"})
+            if fetched and fetched[0] and not fetched[0].startswith("["):
+                self.post_text = fetched[0]
+        if len(self.runs) >= len(config.CASCADE_MODELS):
+            return False
+        self.reason = escalation_reason(explanation, self.post_text, _tool_outputs(response, _SEARCH_TOOLS))
+        if self.reason is None:
+            return False
+        if self.budget is not None:
+            spent = sum(r["usage"]["cost"] for r in self.runs if r["usage"] and r["usage"].get("cost") is not None)
+            projected = _projected_cost(spent, usage, config.CASCADE_MODELS[len(self.runs)])
+            if projected is None or projected > self.budget:
+                self.stopped_by_budget = True
+                return False
+        return True
+
+    def result(self, start: float) -> dict:
+        final = self.runs[-1]
+        turns = [r["llm_turns"] for r in self.runs if r["llm_turns"] is not None]
+        usage = _merge_usage(self.runs)
+        cost = (usage or {}).get("cost")
+        return {
+            "explanation": final["explanation"],
+            "usage": usage,
+            "request_elapsed_seconds": round(time.perf_counter() - start, 2),
+            "mode": "cascade",
+            "model": final["model"],
+            "llm_turns": sum(turns) if turns else None,
+            "compaction": _merge_compaction(self.runs),
+            "cascade": {
+                "models_tried": [r["model"] for r in self.runs],
+                "escalated": len(self.runs) > 1,
+                "escalation_reason": self.reason,
+                "stopped_by_budget": self.stopped_by_budget,
+                "max_cost_usd": self.budget,
+                "over_budget": self.budget is not None and cost is not None and cost > self.budget,
+            },
+        }
+
+
+def explain_cascade(post_url: str, max_cost_usd: float | None = config.CASCADE_MAX_COST_USD) -> dict:
+    """Cascade mode (sync). Agents are built per call so concurrent eval threads do not share agent state."""
+    start = time.perf_counter()
+    cascade = _Cascade(None, max_cost_usd)
+    for model in config.CASCADE_MODELS:
+        compactor = new_compactor(cascade.post_text)
+        response = build_agent(model=model, compactor=compactor).run(_make_prompt(post_url, cascade.post_text), stream=False)
+        if not cascade.add_run(model, response, compaction_stats(compactor, response)):
+            break
+    return cascade.result(start)
+
+
+@profiler.profiled("cascade")
+async def explain_cascade_async(
+    post_url: str,
+    post_text: str | None = None,
+    max_cost_usd: float | None = config.CASCADE_MAX_COST_USD,
+    search_context: list | None = None,
+) -> dict:
+    """Cascade mode (async). post_text: already-fetched post content (skips the fetch tool call).
+    search_context: searches of a near-duplicate post for every model's prompt (semantic.py); the result's
+    "search_context" holds the searches of the final model's run."""
+    start = time.perf_counter()
+    cascade = _Cascade(post_text, max_cost_usd)
+    for model in config.CASCADE_MODELS:
+        compactor = new_compactor(cascade.post_text)
+        prompt = _make_prompt(post_url, cascade.post_text, search_context)
+        response = await new_async_agent(model, compactor).arun(prompt, stream=False)
+        record_model_turns(response)
+        if not cascade.add_run(model, response, compaction_stats(compactor, response)):
+            break
+    return {**cascade.result(start), "search_context": compactor.context()}
@@ -1,4 +1,5 @@
 """Load environment from project root .env and app config."""
+import os
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -12,6 +13,11 @@ else:
 # Model for the explainer agent (change here if needed)
 OPENAI_MODEL = "gpt-4o"
 
+# Default execution mode: "agent" (tool-calling loop) or "pipeline" (fetch + concurrent searches + one completion,
+# see pipeline.py) or "cascade" (cheap model first, see cascade.py). Requests can override it with ExplainRequest.mode.
+EXPLAIN_MODE = os.getenv("EXPLAIN_MODE", "agent")
+PIPELINE_MAX_SEARCHES = 4
+
 # OpenAI model costs: USD per 1M tokens (input, output). Source: https://openai.com/api/pricing
 OPENAI_MODEL_COSTS: dict[str, tuple[float, float]] = {
     # GPT-5 / flagship (2025)
@@ -32,3 +38,213 @@ OPENAI_MODEL_COSTS: dict[str, tuple[float, float]] = {
 EVAL_EMBEDDING_MODEL = "text-embedding-3-small"
 EVAL_JUDGE_MODEL = "gpt-4o-mini"
 EVAL_RESULTS_DIR = "eval/results"
+# On-disk embedding cache keyed by (model, sha256(text)); relative paths are from the project root.
+EVAL_EMBEDDING_CACHE_PATH = os.getenv("EVAL_EMBEDDING_CACHE_PATH", "eval/results/embedding_cache.sqlite")
+EVAL_EMBEDDING_BATCH_SIZE = 256
+# Judge calls in flight at once when the harness scores results (async client; TPM limits in OPENAI_TPM_LIMITS).
+EVAL_JUDGE_CONCURRENCY = 64
+# Requests per second per upstream when the harness runs items concurrently (None = unlimited).
+# "agent" counts whole explainer runs; "openai" covers embedding and judge calls.
+EVAL_RATE_LIMITS: dict[str, float | None] = {"bluesky": 5.0, "agent": 1.0, "openai": 5.0}
+
+# Eval run comparison (run_harness.py --compare BASELINE CANDIDATE, eval/compare.py). "<metric>.<stat>" -> allowed relative
+# increase; a statistic regresses when it exceeds that and the bootstrap CI of the difference lies above zero. Metrics:
+# request_elapsed_seconds, time_to_first_token_seconds, input/output/total_tokens, cost; stats: mean, p50, p95, max.
+# Metrics with fewer than EVAL_COMPARE_MIN_ITEMS values in either run are not gated. The error rate may rise by at most
+# EVAL_COMPARE_MAX_ERROR_RATE_INCREASE (absolute). Regressions exit non-zero.
+EVAL_COMPARE_THRESHOLDS: dict[str, float] = {
+    "request_elapsed_seconds.p50": 0.10,
+    "request_elapsed_seconds.p95": 0.15,
+    "time_to_first_token_seconds.p95": 0.15,
+    "total_tokens.mean": 0.10,
+    "cost.mean": 0.10,
+}
+EVAL_COMPARE_MIN_ITEMS = 10
+EVAL_COMPARE_MAX_ERROR_RATE_INCREASE = 0.05
+EVAL_COMPARE_BOOTSTRAP_SAMPLES = 2000
+EVAL_COMPARE_CONFIDENCE = 0.95
+
+# Bluesky XRPC endpoint (None = atproto default, https://bsky.social/xrpc). Point at a stub PDS for benchmarks.
+BLUESKY_BASE_URL = os.getenv("BLUESKY_BASE_URL") or None
+
+# Cross-process store for multi-worker deployments (`python main.py --workers N` sets it): one SQLite file in WAL
+# mode holding the Bluesky session and the handle -> DID, search and explanation caches, read through on
+# in-memory misses so workers reuse each other's work. A cache's own *_PATH setting takes precedence.
+SHARED_STORE_PATH = os.getenv("SHARED_STORE_PATH") or None
+SHARED_STORE_DEFAULT_PATH = "data/shared_store.sqlite"
+# Every worker drops expired handle, session and explanation rows (and caps the search rows) this often, so the
+# persistent stores do not grow without bound.
+STORE_PURGE_INTERVAL_SECONDS = 10 * 60
+
+# Bluesky session tokens shared between workers (tools/bluesky_session.py), so only one of them logs in.
+BLUESKY_SESSION_PATH = os.getenv("BLUESKY_SESSION_PATH") or SHARED_STORE_PATH
+BLUESKY_SESSION_SHARE_TTL_SECONDS = 24 * 60 * 60
+
+# Bluesky handle -> DID cache (tools/handle_cache.py). Set HANDLE_CACHE_PATH to persist across restarts.
+HANDLE_CACHE_MAXSIZE = 10_000
+HANDLE_CACHE_TTL_SECONDS = 6 * 60 * 60
+HANDLE_CACHE_NEGATIVE_TTL_SECONDS = 60
+HANDLE_CACHE_PATH = os.getenv("HANDLE_CACHE_PATH") or SHARED_STORE_PATH
+
+# Explanation cache keyed by canonical AT URI (helpers/explanation_cache.py). Set EXPLANATION_CACHE_PATH to persist.
+EXPLANATION_CACHE_MAXSIZE = 1_000
+EXPLANATION_CACHE_TTL_SECONDS = 30 * 60
+EXPLANATION_CACHE_PATH = os.getenv("EXPLANATION_CACHE_PATH") or SHARED_STORE_PATH
+# Explanations written after a tool call timed out (partial; see helpers/deadline.py) expire sooner.
+EXPLANATION_CACHE_PARTIAL_TTL_SECONDS = 5 * 60
+
+# Explain jobs (POST /explain/jobs; jobs.py, helpers/job_queue.py): durable SQLite queue at JOBS_PATH, processed by
+# JOBS_CONCURRENCY workers per process (each run also needs an admission slot). A job whose worker died is picked up
+# again after JOBS_LEASE_SECONDS; failed runs are retried up to JOBS_MAX_ATTEMPTS. Resubmitting an AT URI returns its
+# queued or running job, or its finished one for JOBS_DEDUPE_SECONDS. Finished jobs are kept JOBS_RETENTION_SECONDS.
+# Webhooks are signed (X-Explainer-Signature: sha256=HMAC of the body) when JOBS_WEBHOOK_SECRET is set. Webhook hosts
+# must be listed in JOBS_WEBHOOK_ALLOWED_HOSTS (comma-separated) when set; otherwise any host resolving only to public
+# addresses is accepted (no loopback, private, link-local or metadata addresses).
+JOBS_PATH = os.getenv("JOBS_PATH") or SHARED_STORE_PATH or "data/jobs.sqlite"
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "4"))
+JOBS_POLL_SECONDS = 1.0
+JOBS_LEASE_SECONDS = 300
+# Deadline of a job's run, instead of EXPLAIN_DEADLINE_SECONDS (jobs are for runs too long to wait on); it plus
+# DEADLINE_GRACE_SECONDS must stay under JOBS_LEASE_SECONDS. A run past it fails the job without a retry.
+JOBS_DEADLINE_SECONDS = float(os.getenv("JOBS_DEADLINE_SECONDS", "240"))
+JOBS_MAX_ATTEMPTS = 3
+JOBS_DEDUPE_SECONDS = EXPLANATION_CACHE_TTL_SECONDS
+JOBS_RETENTION_SECONDS = 24 * 60 * 60
+JOBS_WEBHOOK_TIMEOUT_SECONDS = 10
+JOBS_WEBHOOK_ATTEMPTS = 3
+JOBS_WEBHOOK_SECRET = os.getenv("JOBS_WEBHOOK_SECRET") or None
+JOBS_WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv("JOBS_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
+# POST /explain/batch: max URLs per request and max concurrent agent runs per batch.
+BATCH_MAX_URLS = 100
+BATCH_EXPLAIN_CONCURRENCY = 4
+
+# Search result compaction (tools/compaction.py), per explain run, between the search tools and the model: results whose
+# URL or text (word-trigram Jaccard >= COMPACTION_NEAR_DUPLICATE) was already sent are dropped, snippets keep only the
+# sentences mentioning the post's key terms or the query (at most COMPACTION_MAX_SNIPPET_CHARS), and search output
+# stops at COMPACTION_TOKEN_BUDGET estimated tokens. SEARCH_COMPACTION=0 sends raw results (eval A/B runs).
+SEARCH_COMPACTION = os.getenv("SEARCH_COMPACTION", "1") == "1"
+COMPACTION_TOKEN_BUDGET = int(os.getenv("COMPACTION_TOKEN_BUDGET", "2000"))
+COMPACTION_MAX_SNIPPET_CHARS = 320
+COMPACTION_NEAR_DUPLICATE = 0.6
+
+# Semantic near-duplicate cache (semantic.py, helpers/semantic_cache.py), off by default: it adds a post fetch and an
+# embedding call to every run. Fetched post text (at least SEMANTIC_CACHE_MIN_CHARS) is embedded with
+# SEMANTIC_CACHE_EMBEDDING_MODEL and matched by cosine similarity against recently explained posts: at
+# >= SEMANTIC_CACHE_THRESHOLD their search results are reused (no searches); with SEMANTIC_CACHE_REUSE_EXPLANATIONS=1
+# also their explanation at >= SEMANTIC_CACHE_EXPLANATION_THRESHOLD (a different post's answer, no model run).
+# The index is per process. SEMANTIC_CACHE_PATH (.npz, unset = memory only) is saved every SEMANTIC_CACHE_SAVE_EVERY
+# new entries and at shutdown; with --workers each process would overwrite the same file, so leave it unset there.
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_REUSE_EXPLANATIONS = os.getenv("SEMANTIC_CACHE_REUSE_EXPLANATIONS", "0") == "1"
+SEMANTIC_CACHE_EMBEDDING_MODEL = EVAL_EMBEDDING_MODEL
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_EXPLANATION_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_EXPLANATION_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_MIN_CHARS = 40
+SEMANTIC_CACHE_CAPACITY = 5_000
+SEMANTIC_CACHE_TTL_SECONDS = 6 * 60 * 60
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH") or None
+SEMANTIC_CACHE_SAVE_EVERY = 25
+
+# Web search cache (tools/cached_search.py). News goes stale faster than general web results.
+SEARCH_CACHE_MAXSIZE = 5_000
+SEARCH_CACHE_WEB_TTL_SECONDS = 6 * 60 * 60
+SEARCH_CACHE_NEWS_TTL_SECONDS = 30 * 60
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH") or SHARED_STORE_PATH
+
+# Record/replay of Bluesky, search and OpenAI calls (helpers/cassette.py): "off", "record" or "replay".
+# In replay mode each response is delayed by its recorded latency times CASSETTE_LATENCY_SCALE (0 = instant).
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "bench/cassettes")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "0"))
+
+# Profiling of explain runs (helpers/profiling.py). Span timelines are always kept for the last PROFILE_KEEP_RECENT
+# runs (GET /debug/slow); the stack sampler is opt-in: a random PROFILE_SAMPLE_RATE share of runs, and/or any run
+# that passes PROFILE_SLOW_SECONDS. Sampled runs are written to PROFILE_DIR, keeping the newest PROFILE_MAX_FILES.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_SECONDS = float(os.environ["PROFILE_SLOW_SECONDS"]) if os.getenv("PROFILE_SLOW_SECONDS") else None
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = 50
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_KEEP_RECENT = 200
+
+# Model cascade (EXPLAIN_MODE=cascade, or "mode": "cascade" per request): run CASCADE_MODELS in order, starting with the
+# cheapest, and escalate only when the answer looks low-confidence and the projected total cost (estimate_openai_cost,
+# assuming the next run uses as many tokens as the last) stays within CASCADE_MAX_COST_USD (None = no budget). The
+# budget only limits escalation: the first run is not checked against it (results over it have cascade.over_budget).
+CASCADE_MODELS = ["gpt-4o-mini", "gpt-4o"]
+CASCADE_MAX_COST_USD = float(os.environ["CASCADE_MAX_COST_USD"]) if os.getenv("CASCADE_MAX_COST_USD") else 0.05
+CASCADE_MIN_EXPLANATION_CHARS = 200
+CASCADE_MAX_UNEXPLAINED_TERMS = 1
+
+# Admission control for explain runs (helpers/admission.py): at most ADMISSION_MAX_CONCURRENT runs at once, up to
+# ADMISSION_MAX_QUEUE more wait for at most ADMISSION_MAX_WAIT_SECONDS; beyond that 429 (queue full) or 503 (timeout)
+# with Retry-After. Cached explanations are served without a slot.
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+# Concurrent calls per upstream across the process (OpenAI HTTP requests, uncached searches, Bluesky XRPC calls).
+UPSTREAM_CONCURRENCY = {"openai": 32, "search": 8, "bluesky": 16}
+UPSTREAM_MAX_WAIT_SECONDS = 15.0
+
+# Deadlines and hedging for tool calls (helpers/deadline.py). Every explain run has EXPLAIN_DEADLINE_SECONDS; tool
+# calls get their own timeout, capped by the time left minus DEADLINE_ANSWER_RESERVE_SECONDS (kept for the model's
+# final answer), and return a "timed out" result instead of hanging. A run still going DEADLINE_GRACE_SECONDS past
+# the deadline is cancelled (504). Searches and post fetches still running after *_HEDGE_AFTER_SECONDS get a duplicate
+# request (set empty to disable), first answer wins; at most HEDGE_MAX_RATIO of calls (+ HEDGE_BURST) are hedged.
+EXPLAIN_DEADLINE_SECONDS = float(os.getenv("EXPLAIN_DEADLINE_SECONDS", "45"))
+DEADLINE_ANSWER_RESERVE_SECONDS = 10.0
+DEADLINE_GRACE_SECONDS = 15.0
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "8"))
+SEARCH_HEDGE_AFTER_SECONDS = float(os.getenv("SEARCH_HEDGE_AFTER_SECONDS", "1.5") or "inf")
+BLUESKY_FETCH_TIMEOUT_SECONDS = float(os.getenv("BLUESKY_FETCH_TIMEOUT_SECONDS", "6"))
+BLUESKY_FETCH_HEDGE_AFTER_SECONDS = float(os.getenv("BLUESKY_FETCH_HEDGE_AFTER_SECONDS", "1") or "inf")
+HEDGE_MAX_RATIO = 0.1
+HEDGE_BURST = 5
+HEDGE_MAX_THREADS = 64
+# Threads of one tool still running after their call gave up (the pool cannot kill them). At this many, further calls
+# to that tool are skipped until some finish, so one hanging upstream cannot take the whole HEDGE_MAX_THREADS pool.
+HEDGE_MAX_ABANDONED = 16
+
+# Startup warm-up (helpers/startup.py), run in the background by the lifespan hook; GET /ready reports it.
+WARMUP_BLUESKY_LOGIN = os.getenv("WARMUP_BLUESKY_LOGIN", "1") == "1"
+WARMUP_OPENAI_CONNECT = os.getenv("WARMUP_OPENAI_CONNECT", "1") == "1"
+WARMUP_PRELOAD_CACHES = os.getenv("WARMUP_PRELOAD_CACHES", "1") == "1"
+
+# OpenAI HTTP pool shared by all clients (helpers/cassette.openai_http_client). HTTP/2 needs the h2 package
+# (httpx[http2]); without it the pool falls back to HTTP/1.1 keep-alive.
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "1") == "1"
+OPENAI_MAX_CONNECTIONS = 100
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 40
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = 60.0
+# Async helpers (helpers/openai_client.py): retries on 429/5xx with full-jitter exponential backoff, and a
+# client-side tokens-per-minute budget per model (None = unlimited).
+OPENAI_MAX_RETRIES = 6
+OPENAI_BACKOFF_BASE_SECONDS = 0.5
+OPENAI_BACKOFF_MAX_SECONDS = 30.0
+OPENAI_TPM_LIMITS: dict[str, int | None] = {"gpt-4o-mini": 200_000, "gpt-4o": 30_000, "text-embedding-3-small": 1_000_000}
+
+# Pre-explanation of trending posts (trending.py). TRENDING_SOURCE: "jetstream" (live feed at JETSTREAM_URL) or a path
+# to a JSONL file of Jetstream events replayed at TRENDING_REPLAY_SPEED (0 = as fast as possible); unset = off.
+# Engagement per post (TRENDING_WEIGHTS per like/repost/reply/quote) is counted in a count-min sketch that decays with
+# TRENDING_HALF_LIFE_SECONDS of event time; a score of TRENDING_MIN_SCORE is roughly MIN_SCORE * ln 2 / HALF_LIFE
+# weighted events per second, sustained. Posts crossing it are explained (TRENDING_MODE) highest score first, at most
+# TRENDING_EXPLAINS_PER_MINUTE and TRENDING_MAX_COST_USD_PER_HOUR (estimated; None = no limit).
+TRENDING_SOURCE = os.getenv("TRENDING_SOURCE") or None
+JETSTREAM_URL = os.getenv("JETSTREAM_URL", "wss://jetstream2.us-east.bsky.network/subscribe")
+TRENDING_REPLAY_SPEED = float(os.getenv("TRENDING_REPLAY_SPEED", "1"))
+TRENDING_WEIGHTS = {"like": 1.0, "repost": 2.0, "reply": 2.0, "quote": 3.0}
+TRENDING_HALF_LIFE_SECONDS = 300.0
+TRENDING_MIN_SCORE = float(os.getenv("TRENDING_MIN_SCORE", "100"))
+TRENDING_SKETCH_WIDTH = 4096
+TRENDING_SKETCH_DEPTH = 4
+TRENDING_TOP_K = 100
+TRENDING_QUEUE_MAX = 200
+TRENDING_CONCURRENCY = 2
+TRENDING_MODE = os.getenv("TRENDING_MODE", "pipeline")
+TRENDING_EXPLAINS_PER_MINUTE = float(os.getenv("TRENDING_EXPLAINS_PER_MINUTE", "20"))
+TRENDING_MAX_COST_USD_PER_HOUR = (
+    float(os.environ["TRENDING_MAX_COST_USD_PER_HOUR"]) if os.getenv("TRENDING_MAX_COST_USD_PER_HOUR") else 2.0
+)
@@ -0,0 +1,215 @@
+"""
+Latency and cost comparison of two eval result files (run_harness.py --output), for regression gating.
+Per metric (request latency, TTFT, tokens, cost): distributions of both runs (n, mean, p50, p95, max), the relative
+change of each statistic with a bootstrap confidence interval of the difference, and per-item deltas for items present
+in both runs. Items are matched by id and post_url; matched items are resampled together (paired bootstrap), otherwise
+each run is resampled on its own. A statistic regresses when it got worse by more than its threshold
+(config.EVAL_COMPARE_THRESHOLDS) and the confidence interval of the difference lies above zero; metrics with fewer
+than config.EVAL_COMPARE_MIN_ITEMS values in either run are reported but not gated.
+"""
+import json
+import random
+from pathlib import Path
+
+import config
+
+# Metric name -> how to read it from a result item.
+METRICS = {
+    "request_elapsed_seconds": lambda r: r.get("request_elapsed_seconds"),
+    "time_to_first_token_seconds": lambda r: (r.get("usage") or {}).get("time_to_first_token_seconds"),
+    "input_tokens": lambda r: (r.get("usage") or {}).get("input_tokens"),
+    "output_tokens": lambda r: (r.get("usage") or {}).get("output_tokens"),
+    "total_tokens": lambda r: (r.get("usage") or {}).get("total_tokens"),
+    "cost": lambda r: (r.get("usage") or {}).get("cost"),
+}
+STATS = ("mean", "p50", "p95", "max")
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def statistic(values: list[float], stat: str) -> float | None:
+    if not values:
+        return None
+    if stat == "mean":
+        return sum(values) / len(values)
+    if stat == "max":
+        return max(values)
+    return percentile(sorted(values), {"p50": 0.5, "p95": 0.95}[stat])
+
+
+def distribution(values: list[float]) -> dict:
+    return {"n": len(values), **{stat: _round(statistic(values, stat)) for stat in STATS}}
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 4) if value is not None else None
+
+
+def load_results(path: str | Path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return report["results"] if isinstance(report, dict) else report
+
+
+def _key(item: dict) -> str:
+    return f"{item.get('id')}|{item.get('post_url')}"
+
+
+def bootstrap_ci(
+    base: list[float],
+    cand: list[float],
+    stat: str,
+    paired: bool,
+    samples: int = config.EVAL_COMPARE_BOOTSTRAP_SAMPLES,
+    confidence: float = config.EVAL_COMPARE_CONFIDENCE,
+    seed: int = 0,
+) -> tuple[float, float] | None:
+    """Confidence interval of statistic(cand) - statistic(base). paired: base[i] and cand[i] are the same item
+    and are resampled together. None with fewer than two values on either side."""
+    if len(base) < 2 or len(cand) < 2:
+        return None
+    rng = random.Random(seed)
+    diffs = []
+    for _ in range(samples):
+        if paired:
+            idx = [rng.randrange(len(base)) for _ in base]
+            diffs.append(statistic([cand[i] for i in idx], stat) - statistic([base[i] for i in idx], stat))
+        else:
+            b = [base[rng.randrange(len(base))] for _ in base]
+            c = [cand[rng.randrange(len(cand))] for _ in cand]
+            diffs.append(statistic(c, stat) - statistic(b, stat))
+    diffs.sort()
+    tail = (1 - confidence) / 2
+    return percentile(diffs, tail), percentile(diffs, 1 - tail)
+
+
+def compare(
+    base_results: list[dict],
+    cand_results: list[dict],
+    thresholds: dict[str, float] | None = None,
+    samples: int = config.EVAL_COMPARE_BOOTSTRAP_SAMPLES,
+    seed: int = 0,
+) -> dict:
+    """Comparison report: {"metrics", "errors", "items", "regressions", "paired_items"} (see module docstring).
+
+    thresholds: "<metric>.<stat>" -> allowed relative increase (0.1 = +10%); default config.EVAL_COMPARE_THRESHOLDS.
+    """
+    thresholds = config.EVAL_COMPARE_THRESHOLDS if thresholds is None else thresholds
+    base_ok = [r for r in base_results if not r.get("error")]
+    cand_ok = [r for r in cand_results if not r.get("error")]
+    base_by_key = {_key(r): r for r in base_ok}
+    matched = [(base_by_key[_key(r)], r) for r in cand_ok if _key(r) in base_by_key]
+
+    metrics: dict[str, dict] = {}
+    regressions: list[dict] = []
+    for name, read in METRICS.items():
+        pairs = [(read(b), read(c)) for b, c in matched if read(b) is not None and read(c) is not None]
+        # Paired when at least two items have the metric in both runs; otherwise compare the runs as samples.
+        paired = len(pairs) >= 2
+        if paired:
+            base_values, cand_values = [b for b, _ in pairs], [c for _, c in pairs]
+        else:
+            base_values = [v for v in map(read, base_ok) if v is not None]
+            cand_values = [v for v in map(read, cand_ok) if v is not None]
+        if not base_values and not cand_values:
+            continue
+        # Too few samples: reported, but never flagged as a regression.
+        enough = min(len(base_values), len(cand_values)) >= config.EVAL_COMPARE_MIN_ITEMS
+        entry = {
+            "paired": paired,
+            "gated": enough,
+            "baseline": distribution(base_values),
+            "candidate": distribution(cand_values),
+            "changes": {},
+        }
+        for stat in STATS:
+            b, c = statistic(base_values, stat), statistic(cand_values, stat)
+            if b is None or c is None:
+                continue
+            ci = bootstrap_ci(base_values, cand_values, stat, paired, samples=samples, seed=seed)
+            change = {
+                "delta": _round(c - b),
+                "relative": _round((c - b) / b) if b else None,
+                "ci": [_round(ci[0]), _round(ci[1])] if ci else None,
+            }
+            threshold = thresholds.get(f"{name}.{stat}")
+            if threshold is not None:
+                change["threshold"] = threshold
+                change["regressed"] = (
+                    enough and change["relative"] is not None and change["relative"] > threshold
+                    and ci is not None and ci[0] > 0
+                )
+                if change["regressed"]:
+                    regressions.append({"metric": f"{name}.{stat}", **change})
+            entry["changes"][stat] = change
+        metrics[name] = entry
+
+    base_rate = _error_rate(base_results)
+    cand_rate = _error_rate(cand_results)
+    errors = {"baseline": base_rate, "candidate": cand_rate, "max_increase": config.EVAL_COMPARE_MAX_ERROR_RATE_INCREASE}
+    if base_rate is not None and cand_rate is not None and cand_rate - base_rate > errors["max_increase"]:
+        regressions.append({"metric": "error_rate", "delta": round(cand_rate - base_rate, 4)})
+
+    items = []
+    for b, c in matched:
+        item = {"id": c.get("id"), "post_url": c.get("post_url")}
+        for name, read in METRICS.items():
+            if read(b) is not None and read(c) is not None:
+                item[name] = {"baseline": read(b), "candidate": read(c), "delta": _round(read(c) - read(b))}
+        items.append(item)
+    items.sort(key=lambda i: -abs((i.get("request_elapsed_seconds") or {}).get("delta") or 0))
+    return {
+        "baseline_n": len(base_results),
+        "candidate_n": len(cand_results),
+        "paired_items": len(matched),
+        "confidence": config.EVAL_COMPARE_CONFIDENCE,
+        "metrics": metrics,
+        "errors": errors,
+        "items": items,
+        "regressions": regressions,
+    }
+
+
+def _error_rate(results: list[dict]) -> float | None:
+    return round(sum(1 for r in results if r.get("error")) / len(results), 4) if results else None
+
+
+def format_report(report: dict, top_items: int = 10) -> str:
+    """Human-readable summary: one line per metric statistic, regressions, then the largest latency deltas."""
+    lines = [
+        f"Baseline {report['baseline_n']} items, candidate {report['candidate_n']} items, "
+        f"{report['paired_items']} in both"
+    ]
+    level = f"{report.get('confidence', config.EVAL_COMPARE_CONFIDENCE) * 100:g}%"
+    for name, entry in report["metrics"].items():
+        gated = "" if entry["gated"] else f", not gated: fewer than {config.EVAL_COMPARE_MIN_ITEMS} values"
+        lines.append(f"{name} ({'paired' if entry['paired'] else 'unpaired'}, "
+                     f"n={entry['baseline']['n']}/{entry['candidate']['n']}{gated}):")
+        for stat, change in entry["changes"].items():
+            rel = f"{change['relative']:+.1%}" if change["relative"] is not None else "n/a"
+            ci = f"[{change['ci'][0]:+g}, {change['ci'][1]:+g}]" if change["ci"] else "n/a"
+            flag = "  REGRESSION" if change.get("regressed") else ""
+            lines.append(
+                f"  {stat:>4}: {entry['baseline'][stat]:g} -> {entry['candidate'][stat]:g} "
+                f"({rel}, {level} CI of delta {ci}){flag}"
+            )
+    errors = report["errors"]
+    lines.append(f"error_rate: {errors['baseline']} -> {errors['candidate']}")
+    if report["items"]:
+        lines.append(f"Largest latency deltas (top {top_items}):")
+        for item in report["items"][:top_items]:
+            deltas = [
+                f"{name} {item[name]['delta']:+g}"
+                for name in ("request_elapsed_seconds", "time_to_first_token_seconds", "total_tokens", "cost")
+                if name in item
+            ]
+            lines.append(f"  {item['id']}: " + ", ".join(deltas))
+    if report["regressions"]:
+        lines.append("Regressions: " + ", ".join(r["metric"] for r in report["regressions"]))
+    else:
+        lines.append("No regressions")
+    return "\n".join(lines)
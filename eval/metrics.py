@@ -1,9 +1,16 @@
-"""Eval metrics: semantic similarity, LLM judge. Run from project root."""
-import config
-from sklearn.metrics.pairwise import cosine_similarity as sklearn_cosine_similarity
+"""Eval metrics: semantic similarity, LLM judge. Run from project root.
+Each helper has an async counterpart (a-prefixed) on the shared AsyncOpenAI client, for running many at once."""
+import asyncio
+import hashlib
+import math
+from pathlib import Path
+
+import numpy as np
 
+import config
 from eval.prompts import JUDGE_GOLDEN, JUDGE_RELEVANCE
-from helpers.openai_client import chat_completion_json, get_openai_client
+from helpers.kv_store import SQLiteKV
+from helpers.openai_client import achat_completion_json, aembed, chat_completion_json, get_openai_client
 
 JUDGE_RESPONSE_SCHEMA = {
     "type": "object",
@@ -16,19 +23,110 @@ JUDGE_RESPONSE_SCHEMA = {
 }
 
 
+# Embeddings by (model, sha256(text)); they never change, so golden references are embedded once ever.
+_embedding_cache: SQLiteKV | None = None
+
+
+def _get_embedding_cache() -> SQLiteKV:
+    global _embedding_cache
+    if _embedding_cache is None:
+        path = Path(config.EVAL_EMBEDDING_CACHE_PATH)
+        if not path.is_absolute():
+            path = Path(__file__).resolve().parent.parent / path
+        _embedding_cache = SQLiteKV(path, table="embeddings")
+    return _embedding_cache
+
+
+def _cache_key(model: str, text: str) -> str:
+    return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+def _cached_embeddings(texts: list[str], model: str) -> tuple[dict[str, list[float]], list[str]]:
+    """(vectors for cached texts, distinct texts still missing)."""
+    cache = _get_embedding_cache()
+    vectors: dict[str, list[float]] = {}
+    missing: list[str] = []
+    for text in dict.fromkeys(texts):
+        hit = cache.get(_cache_key(model, text))
+        if hit is not None:
+            vectors[text] = hit[0]
+        else:
+            missing.append(text)
+    return vectors, missing
+
+
+def embed_texts(texts: list[str], model: str | None = None) -> np.ndarray:
+    """Embeddings for texts as an (n, dim) array, in order. Cached texts are not re-embedded; the rest
+    are sent in batches of config.EVAL_EMBEDDING_BATCH_SIZE. Always calls the API for uncached text
+    (no special case for blank text)."""
+    model = model or config.EVAL_EMBEDDING_MODEL
+    cache = _get_embedding_cache()
+    vectors, missing = _cached_embeddings(texts, model)
+    if missing:
+        client = get_openai_client()
+        size = config.EVAL_EMBEDDING_BATCH_SIZE
+        for start in range(0, len(missing), size):
+            batch = missing[start : start + size]
+            r = client.embeddings.create(input=batch, model=model)
+            for item in r.data:
+                text = batch[item.index]
+                vectors[text] = item.embedding
+                cache.set(_cache_key(model, text), item.embedding, math.inf)
+    return np.array([vectors[t] for t in texts], dtype=np.float64)
+
+
+async def aembed_texts(texts: list[str], model: str | None = None) -> np.ndarray:
+    """Async embed_texts: uncached batches are sent concurrently."""
+    model = model or config.EVAL_EMBEDDING_MODEL
+    cache = _get_embedding_cache()
+    vectors, missing = _cached_embeddings(texts, model)
+    size = config.EVAL_EMBEDDING_BATCH_SIZE
+    batches = [missing[start : start + size] for start in range(0, len(missing), size)]
+    for batch, embedded in zip(batches, await asyncio.gather(*(aembed(b, model) for b in batches))):
+        for text, embedding in zip(batch, embedded):
+            vectors[text] = embedding
+            cache.set(_cache_key(model, text), embedding, math.inf)
+    return np.array([vectors[t] for t in texts], dtype=np.float64)
+
+
 def _embed(text: str) -> list[float]:
-    """Always call embedding API (no special case for blank text)."""
-    client = get_openai_client()
-    r = client.embeddings.create(input=[text], model=config.EVAL_EMBEDDING_MODEL)
-    return r.data[0].embedding
+    """Single-text embedding (through the batch helper and its cache)."""
+    return embed_texts([text])[0].tolist()
+
+
+def cosine_similarities(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity of two (n, dim) arrays in one vectorized pass. Zero vectors give 0
+    (same convention as sklearn's pairwise cosine_similarity)."""
+    a_norm = np.linalg.norm(a, axis=1)
+    b_norm = np.linalg.norm(b, axis=1)
+    a_norm[a_norm == 0] = 1.0
+    b_norm[b_norm == 0] = 1.0
+    return np.einsum("ij,ij->i", a, b) / (a_norm * b_norm)
+
+
+def semantic_similarities(pairs: list[tuple[str, str]]) -> list[float]:
+    """Cosine similarity for each (expected, actual) pair, with all texts embedded in batched calls. In [-1, 1]."""
+    if not pairs:
+        return []
+    n = len(pairs)
+    emb = embed_texts([e for e, _ in pairs] + [a for _, a in pairs])
+    sims = cosine_similarities(emb[:n], emb[n:])
+    return [round(float(s), 4) for s in sims]
+
+
+async def asemantic_similarities(pairs: list[tuple[str, str]]) -> list[float]:
+    """Async semantic_similarities."""
+    if not pairs:
+        return []
+    n = len(pairs)
+    emb = await aembed_texts([e for e, _ in pairs] + [a for _, a in pairs])
+    sims = cosine_similarities(emb[:n], emb[n:])
+    return [round(float(s), 4) for s in sims]
 
 
 def semantic_similarity(expected: str, actual: str) -> float:
-    """Cosine similarity between embeddings of expected and actual (sklearn pairwise). In [-1, 1]."""
-    e = _embed(expected)
-    a = _embed(actual)
-    sim = sklearn_cosine_similarity([e], [a])[0, 0]
-    return round(float(sim), 4)
+    """Cosine similarity between embeddings of expected and actual. In [-1, 1]."""
+    return semantic_similarities([(expected, actual)])[0]
 
 
 def llm_judge_golden(post_text: str, expected: str, agent_explanation: str) -> dict:
@@ -60,3 +158,34 @@ def llm_judge_relevance(post_text: str, agent_explanation: str) -> dict:
     )
     score = int(out.get("score", 0))
     return {"score": score, "reasoning": out.get("reasoning", "")}
+
+
+async def allm_judge_golden(post_text: str, expected: str, agent_explanation: str) -> dict:
+    """Async llm_judge_golden."""
+    prompt = JUDGE_GOLDEN.format(
+        post_text=post_text,
+        expected=expected,
+        agent_explanation=agent_explanation,
+    )
+    out = await achat_completion_json(
+        config.EVAL_JUDGE_MODEL,
+        [{"role": "user", "content": prompt}],
+        JUDGE_RESPONSE_SCHEMA,
+    )
+    score = int(out.get("score", 0))
+    return {"score": score, "reasoning": out.get("reasoning", "")}
+
+
+async def allm_judge_relevance(post_text: str, agent_explanation: str) -> dict:
+    """Async llm_judge_relevance."""
+    prompt = JUDGE_RELEVANCE.format(
+        post_text=post_text,
+        agent_explanation=agent_explanation,
+    )
+    out = await achat_completion_json(
+        config.EVAL_JUDGE_MODEL,
+        [{"role": "user", "content": prompt}],
+        JUDGE_RESPONSE_SCHEMA,
+    )
+    score = int(out.get("score", 0))
+    return {"score": score, "reasoning": out.get("reasoning", "")}
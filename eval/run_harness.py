@@ -1,12 +1,22 @@
 """
 Eval harness: run explainer on fixture items and compute metrics.
-Usage (from project root): python eval/run_harness.py [--fixture eval/fixtures/golden.json] [--output eval/results/out.json] [--skip-judge]
+Usage (from project root): python eval/run_harness.py [--fixture eval/fixtures/golden.json] [--output eval/results/out.json] [--skip-judge] [--mode agent|pipeline|cascade] [--concurrency N] [--checkpoint path.jsonl] [--fresh]
+Compare two runs (latency/cost regression gate): python eval/run_harness.py --compare BASELINE.json CANDIDATE.json [--threshold request_elapsed_seconds.p95=0.1] [--output report.json]
 
 Fixture type is auto-detected: if items have "expected_explanation" we run golden-dataset metrics (similarity, optional judge); otherwise LLM relevance judge only. For no-golden mode, --skip-judge is not allowed (judge is required).
+
+Items run on a thread pool (--concurrency) with per-upstream rate limits (config.EVAL_RATE_LIMITS). Every finished item is appended to a JSONL checkpoint; rerunning the same command resumes and only redoes items that are missing or errored. Scores are checkpointed too, so a resumed run only scores items that have none yet. Results are reported in fixture order.
+
+--compare runs nothing: it reports latency, TTFT, token and cost distributions of two result files with per-item deltas and bootstrap confidence intervals (eval/compare.py), and exits with status 1 when a statistic regresses past its threshold (config.EVAL_COMPARE_THRESHOLDS, overridden per --threshold).
+
+Scoring happens after all items ran: embeddings and LLM judge calls go out concurrently on the async OpenAI client (config.EVAL_JUDGE_CONCURRENCY in flight, retries on 429, per-model TPM budget).
 """
 import argparse
+import asyncio
 import json
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Ensure project root on path when run as python eval/run_harness.py
@@ -16,9 +26,20 @@ if str(_root) not in sys.path:
 
 import config
 from agent import explain_with_stats
+from cascade import explain_cascade
+from helpers.rate_limit import RateLimiter
+from pipeline import explain_pipeline
 from tools import fetch_bluesky_post
 
-from eval.metrics import llm_judge_golden, llm_judge_relevance, semantic_similarity
+from eval.compare import METRICS, STATS, compare, format_report, load_results
+from eval.metrics import (
+    allm_judge_golden,
+    allm_judge_relevance,
+    asemantic_similarities,
+    llm_judge_golden,
+    llm_judge_relevance,
+    semantic_similarity,
+)
 
 
 def load_fixture(path: Path) -> dict:
@@ -31,7 +52,25 @@ def is_golden(fixture: dict) -> bool:
     return bool(items and items[0].get("expected_explanation") is not None)
 
 
-def run_item(item: dict, golden: bool, skip_judge: bool = False) -> dict:
+def _acquire(limits: dict[str, RateLimiter] | None, upstream: str) -> None:
+    if limits and upstream in limits:
+        limits[upstream].acquire()
+
+
+def run_item(
+    item: dict,
+    golden: bool,
+    skip_judge: bool = False,
+    explain_mode: str = "agent",
+    limits: dict[str, RateLimiter] | None = None,
+    defer_similarity: bool = False,
+    defer_judge: bool = False,
+) -> dict:
+    """Evaluate one fixture item. limits: upstream name (bluesky, agent, openai) -> RateLimiter.
+
+    defer_similarity: leave "similarity" unset so ascore_results() can embed all items in one batch.
+    defer_judge: skip the judge and keep "post_text" so ascore_results() can judge all items concurrently.
+    """
     post_url = item.get("post_url") or item.get("post_id")
     if not post_url:
         return {"id": item.get("id"), "error": "missing post_url/post_id"}
@@ -39,6 +78,7 @@ def run_item(item: dict, golden: bool, skip_judge: bool = False) -> dict:
 
     # Fetch post text (for judge)
     try:
+        _acquire(limits, "bluesky")
         post_text = fetch_bluesky_post(post_url)
         if not post_text or post_text.startswith("["):
             post_text = "(post fetch returned no text or error)"
@@ -48,29 +88,46 @@ def run_item(item: dict, golden: bool, skip_judge: bool = False) -> dict:
 
     # Run explainer
     try:
-        result = explain_with_stats(post_url)
+        _acquire(limits, "agent")
+        if explain_mode == "pipeline":
+            result = explain_pipeline(post_url)
+        elif explain_mode == "cascade":
+            result = explain_cascade(post_url)
+        else:
+            result = explain_with_stats(post_url)
         explanation = (result.get("explanation") or "").strip()
         out["explanation"] = explanation
         out["usage"] = result.get("usage")
         out["request_elapsed_seconds"] = result.get("request_elapsed_seconds")
+        out["model"] = result.get("model")
+        if result.get("compaction"):
+            out["compaction"] = result["compaction"]
+        if result.get("cascade"):
+            out["cascade"] = result["cascade"]
     except Exception as e:
         out["error"] = f"agent: {e}"
         return out
 
+    if defer_judge and not skip_judge:
+        out["post_text"] = post_text
     if golden:
         expected = (item.get("expected_explanation") or "").strip()
         out["expected_explanation"] = expected
-        out["similarity"] = semantic_similarity(expected, explanation)
-        if not skip_judge:
+        if not defer_similarity:
+            _acquire(limits, "openai")
+            out["similarity"] = semantic_similarity(expected, explanation)
+        if not skip_judge and not defer_judge:
             try:
+                _acquire(limits, "openai")
                 judge = llm_judge_golden(post_text, expected, explanation)
                 out["judge_score"] = judge["score"]
                 out["judge_reasoning"] = judge.get("reasoning", "")
             except Exception as e:
                 out["judge_error"] = str(e)
     else:
-        if not skip_judge:
+        if not skip_judge and not defer_judge:
             try:
+                _acquire(limits, "openai")
                 judge = llm_judge_relevance(post_text, explanation)
                 out["relevance_score"] = judge["score"]
                 out["relevance_reasoning"] = judge.get("reasoning", "")
@@ -80,6 +137,137 @@ def run_item(item: dict, golden: bool, skip_judge: bool = False) -> dict:
     return out
 
 
+def _item_key(item: dict) -> str:
+    return f"{item.get('id')}|{item.get('post_url') or item.get('post_id')}"
+
+
+def load_checkpoint(path: Path, items: list[dict]) -> dict[int, dict]:
+    """Finished results by fixture index from a JSONL checkpoint. Errored items and lines that no
+    longer match the fixture item at that index are dropped so they run again."""
+    done: dict[int, dict] = {}
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial last line from a crash
+            i, result = rec.get("index"), rec.get("result")
+            if not isinstance(i, int) or i >= len(items) or rec.get("key") != _item_key(items[i]):
+                continue
+            if not isinstance(result, dict):
+                continue
+            if result.get("error"):
+                done.pop(i, None)
+            else:
+                done[i] = result  # a later line for the same item (its scores) replaces the earlier one
+    return done
+
+
+def append_checkpoint(path: Path, items: list[dict], results: dict[int, dict]) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        for i, res in results.items():
+            f.write(json.dumps({"index": i, "key": _item_key(items[i]), "result": res}, ensure_ascii=False) + "\n")
+
+
+def run_items(
+    items: list[dict],
+    golden: bool,
+    skip_judge: bool,
+    explain_mode: str,
+    concurrency: int,
+    checkpoint: Path,
+    done: dict[int, dict],
+) -> list[dict]:
+    """Run the items not in `done` on `concurrency` threads; append each result to the checkpoint. Fixture order."""
+    limits = {name: RateLimiter(rps) for name, rps in config.EVAL_RATE_LIMITS.items()}
+    results: dict[int, dict] = dict(done)
+    write_lock = threading.Lock()
+
+    def work(i: int) -> tuple[int, dict]:
+        res = run_item(
+            items[i], golden, skip_judge=skip_judge, explain_mode=explain_mode,
+            limits=limits, defer_similarity=True, defer_judge=True,
+        )
+        with write_lock:
+            append_checkpoint(checkpoint, items, {i: res})
+        return i, res
+
+    pending = [i for i in range(len(items)) if i not in done]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(work, i) for i in pending]
+        for fut in as_completed(futures):
+            i, res = fut.result()
+            label = items[i].get("id", items[i].get("post_url", "?"))
+            status = f"ERROR: {res['error']}" if res.get("error") else "ok"
+            print(f"  [{i+1}] {label} ... {status}", flush=True)
+            results[i] = res
+    return [results[i] for i in range(len(items))]
+
+
+async def _ajudge(result: dict, golden: bool, semaphore: asyncio.Semaphore) -> None:
+    async with semaphore:
+        try:
+            if golden:
+                judge = await allm_judge_golden(result["post_text"], result["expected_explanation"], result["explanation"])
+                result["judge_score"] = judge["score"]
+                result["judge_reasoning"] = judge.get("reasoning", "")
+            else:
+                judge = await allm_judge_relevance(result["post_text"], result["explanation"])
+                result["relevance_score"] = judge["score"]
+                result["relevance_reasoning"] = judge.get("reasoning", "")
+        except Exception as e:
+            result["judge_error"] = str(e)
+
+
+async def ascore_results(results: list[dict], golden: bool, skip_judge: bool) -> None:
+    """Fill similarity (golden) and judge scores for deferred results; embeddings and judge calls run concurrently."""
+    score_key = "judge_score" if golden else "relevance_score"
+    to_judge = [] if skip_judge else [
+        r for r in results
+        if not r.get("error") and r.get("post_text") is not None and r.get(score_key) is None and not r.get("judge_error")
+    ]
+    semaphore = asyncio.Semaphore(config.EVAL_JUDGE_CONCURRENCY)
+    jobs = [_ajudge(r, golden, semaphore) for r in to_judge]
+    if golden:
+        todo = [
+            r for r in results
+            if not r.get("error") and r.get("similarity") is None and r.get("expected_explanation") is not None
+        ]
+
+        async def similarities():
+            sims = await asemantic_similarities([(r["expected_explanation"], r.get("explanation", "")) for r in todo])
+            for r, sim in zip(todo, sims):
+                r["similarity"] = sim
+
+        jobs.append(similarities())
+    await asyncio.gather(*jobs)
+
+
+def run_compare(baseline: Path, candidate: Path, thresholds: dict[str, float], output: Path | None) -> int:
+    """Print the comparison of two result files (and write it to output); 1 if anything regressed, 2 on bad input."""
+    paths = [p if p.is_absolute() else _root / p for p in (baseline, candidate)]
+    for path in paths:
+        if not path.exists():
+            print(f"Result file not found: {path}", file=sys.stderr)
+            return 2
+    report = compare(load_results(paths[0]), load_results(paths[1]), thresholds)
+    print(f"Baseline: {paths[0]}\nCandidate: {paths[1]}")
+    print("-" * 50)
+    print(format_report(report))
+    if output is not None:
+        out_path = output if output.is_absolute() else _root / output
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote {out_path}")
+    return 1 if report["regressions"] else 0
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run eval harness on a fixture file")
     parser.add_argument(
@@ -99,8 +287,63 @@ def main():
         action="store_true",
         help="Skip LLM judge (golden only; in no-golden mode judge is required)",
     )
+    parser.add_argument(
+        "--mode",
+        choices=["agent", "pipeline", "cascade"],
+        default=config.EXPLAIN_MODE,
+        help="Explainer execution mode: agent (tool-calling loop), pipeline (one completion) or cascade (cheap model first)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Items evaluated in parallel (rate limits per upstream: config.EVAL_RATE_LIMITS)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help=f"JSONL checkpoint for resuming (default: {config.EVAL_RESULTS_DIR}/<fixture>.<mode>.checkpoint.jsonl)",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Ignore and overwrite an existing checkpoint instead of resuming",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        type=Path,
+        metavar=("BASELINE", "CANDIDATE"),
+        default=None,
+        help="Compare two result files (latency, TTFT, tokens, cost) instead of running; exit 1 on regression",
+    )
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        metavar="METRIC.STAT=REL",
+        help="With --compare: allowed relative increase, e.g. request_elapsed_seconds.p95=0.1 (repeatable; "
+        "overrides config.EVAL_COMPARE_THRESHOLDS for that key)",
+    )
     args = parser.parse_args()
 
+    if args.compare is not None:
+        thresholds = dict(config.EVAL_COMPARE_THRESHOLDS)
+        for spec in args.threshold:
+            key, _, value = spec.partition("=")
+            metric, _, stat = key.strip().partition(".")
+            try:
+                if metric not in METRICS or stat not in STATS:
+                    raise ValueError(key)
+                thresholds[key.strip()] = float(value)
+            except ValueError:
+                parser.error(
+                    f"--threshold must look like METRIC.STAT=REL (metrics: {', '.join(METRICS)}; "
+                    f"stats: {', '.join(STATS)}), got {spec!r}"
+                )
+        sys.exit(run_compare(*args.compare, thresholds, args.output))
+
     fixture_path = args.fixture if args.fixture.is_absolute() else _root / args.fixture
     if not fixture_path.exists():
         print(f"Fixture not found: {fixture_path}", file=sys.stderr)
@@ -114,21 +357,48 @@ def main():
         print("Error: In no-golden mode the LLM judge is required; there is no other evaluation. Do not use --skip-judge.", file=sys.stderr)
         sys.exit(1)
 
-    print(f"Mode: {mode} (fixture: {fixture_path})")
+    items = fixture.get("items") or []
+    if args.checkpoint is not None:
+        checkpoint = args.checkpoint if args.checkpoint.is_absolute() else _root / args.checkpoint
+    else:
+        checkpoint = _root / config.EVAL_RESULTS_DIR / f"{fixture_path.stem}.{args.mode}.checkpoint.jsonl"
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    if args.fresh and checkpoint.exists():
+        checkpoint.unlink()
+    done = load_checkpoint(checkpoint, items)
+
+    print(f"Mode: {mode}, explainer: {args.mode} (fixture: {fixture_path})")
+    if done:
+        print(f"Resuming from {checkpoint}: {len(done)}/{len(items)} items already done")
     print("-" * 50)
 
-    results = []
-    for i, item in enumerate(fixture.get("items") or []):
-        print(f"  [{i+1}] {item.get('id', item.get('post_url', '?'))} ... ", end="", flush=True)
-        res = run_item(item, golden, skip_judge=args.skip_judge)
-        if res.get("error"):
-            print(f"ERROR: {res['error']}")
-        else:
-            print("ok")
-        results.append(res)
+    results = run_items(items, golden, args.skip_judge, args.mode, args.concurrency, checkpoint, done)
+    unscored = {i: dict(r) for i, r in enumerate(results)}
+    asyncio.run(ascore_results(results, golden, args.skip_judge))
+    # Checkpoint the new scores so a resumed run does not pay for the same judge and embedding calls again;
+    # judge errors are left out so those items are judged again.
+    scored = {
+        i: {k: v for k, v in r.items() if k != "judge_error"}
+        for i, r in enumerate(results)
+        if r != unscored[i] and any(r.get(k) is not None for k in ("similarity", "judge_score", "relevance_score"))
+    }
+    if scored:
+        append_checkpoint(checkpoint, items, scored)
 
     # Aggregate
-    summary = {"mode": mode, "n": len(results), "errors": sum(1 for r in results if r.get("error"))}
+    summary = {"mode": mode, "explain_mode": args.mode, "n": len(results), "errors": sum(1 for r in results if r.get("error"))}
+    costs = [(r.get("usage") or {}).get("cost") for r in results]
+    costs = [c for c in costs if c is not None]
+    summary["total_cost"] = round(sum(costs), 4) if costs else None
+    input_tokens = [(r.get("usage") or {}).get("input_tokens") for r in results]
+    input_tokens = [t for t in input_tokens if t is not None]
+    summary["total_input_tokens"] = sum(input_tokens) if input_tokens else None
+    summary["search_compaction"] = config.SEARCH_COMPACTION
+    saved = [r["compaction"]["tokens_saved"] for r in results if r.get("compaction")]
+    summary["search_tokens_saved"] = sum(saved) if saved else None
+    if args.mode == "cascade":
+        ran = [r for r in results if r.get("cascade")]
+        summary["escalation_rate"] = round(sum(1 for r in ran if r["cascade"]["escalated"]) / len(ran), 3) if ran else None
     if golden:
         sims = [r["similarity"] for r in results if r.get("similarity") is not None]
         summary["mean_similarity"] = round(sum(sims) / len(sims), 4) if sims else None
@@ -0,0 +1,402 @@
+"""
+Admission control and per-upstream concurrency limits.
+AdmissionController caps concurrent explain runs; excess requests wait in a bounded queue for at most
+max_wait_seconds and are otherwise rejected (Overloaded: 429 when the queue is full, 503 on timeout) with a
+Retry-After estimate. Bulkhead caps concurrent calls to one upstream (OpenAI, search, Bluesky) for both
+threads and coroutines; LimitedTransport / AsyncLimitedTransport apply it to every request of an httpx client.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator
+
+import httpx
+
+import config
+from helpers.telemetry import ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS, register_admission
+
+
+class Overloaded(Exception):
+    """The request could not be admitted in time. status_code: 429 (queue full) or 503 (wait timed out)."""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class UpstreamBusyError(RuntimeError):
+    """No slot for an upstream call within the bulkhead's max wait."""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(f"Upstream {upstream} is saturated")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def _percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class _Counters:
+    """Wait-time samples, service-time average and rejection counts shared by both limiters."""
+
+    _WAIT_SAMPLES = 1000
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected: dict[str, int] = {}
+        self._waits: deque[float] = deque(maxlen=self._WAIT_SAMPLES)
+        self._service_ewma: float | None = None
+        self._counter_lock = threading.Lock()
+        self._semaphore = None  # set by subclasses; anything with release()
+
+    def _admitted(self, waited: float) -> None:
+        with self._counter_lock:
+            self.in_flight += 1
+            self.admitted += 1
+            self._waits.append(waited)
+        ADMISSION_WAIT_SECONDS.labels(queue=self.name).observe(waited)
+
+    def _released(self, held: float) -> None:
+        with self._counter_lock:
+            self.in_flight -= 1
+            self._service_ewma = held if self._service_ewma is None else 0.8 * self._service_ewma + 0.2 * held
+
+    def _rejected(self, reason: str) -> None:
+        with self._counter_lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTED.labels(queue=self.name, reason=reason).inc()
+
+    def _hold(self, start: float) -> Callable[[], None]:
+        """Record a slot taken after waiting since `start`; return its idempotent release function."""
+        acquired = time.perf_counter()
+        self._admitted(acquired - start)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._semaphore.release()
+                self._released(time.perf_counter() - acquired)
+
+        return release
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained (1..60)."""
+        service = self._service_ewma or 1.0
+        return int(min(60, max(1, math.ceil(service * (self.waiting + 1) / self.limit))))
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            waits = sorted(self._waits)
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "wait_p50_seconds": _percentile(waits, 0.50),
+                "wait_p95_seconds": _percentile(waits, 0.95),
+                "wait_max_seconds": waits[-1] if waits else None,
+                "service_ewma_seconds": round(self._service_ewma, 3) if self._service_ewma is not None else None,
+            }
+
+
+class AdmissionController(_Counters):
+    """Global cap on concurrent explain runs with a bounded wait queue (event loop only)."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait_seconds: float):
+        super().__init__(name, max_concurrent)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    async def acquire(self) -> Callable[[], None]:
+        """Wait for a slot; return an idempotent release function. Raises Overloaded."""
+        start = time.perf_counter()
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self._rejected("queue_full")
+                raise Overloaded(429, self.retry_after(), "Too many requests queued; retry later")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                self._rejected("timeout")
+                raise Overloaded(503, self.retry_after(), "Timed out waiting for capacity; retry later") from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        return self._hold(start)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        release = await self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+
+class _Waiter:
+    """One queued acquire: wake() is called (outside the lock) once granted is set."""
+
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+
+
+class _FifoSlots:
+    """Bounded counting semaphore for threads and coroutines with a single FIFO wait queue: release() hands
+    the slot straight to the longest waiter, so neither kind of caller can overtake the other."""
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._free = limit
+        self._waiters: deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return True
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                if self._free >= self._limit:
+                    raise ValueError("slot released too many times")
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        try:
+            waiter.wake()
+        except RuntimeError:  # the waiter's event loop is gone; pass the slot on
+            self.release()
+
+    def _enqueue(self, wake: Callable[[], None]) -> _Waiter | None:
+        """A queued waiter, or None if a slot was free (and is now taken)."""
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return None
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """Leave the queue; True if the slot was granted meanwhile (the caller now holds it)."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout: float) -> bool:
+        event = threading.Event()
+        waiter = self._enqueue(event.set)
+        if waiter is None or event.wait(timeout):
+            return True
+        return self._give_up(waiter)
+
+    async def acquire_async(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def grant() -> None:
+            if not granted.done():
+                granted.set_result(None)
+
+        waiter = self._enqueue(lambda: loop.call_soon_threadsafe(grant))
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(granted, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._give_up(waiter)
+        except asyncio.CancelledError:
+            if self._give_up(waiter):
+                self.release()
+            raise
+
+
+class Bulkhead(_Counters):
+    """At most `limit` concurrent calls to one upstream, shared by threads and coroutines.
+
+    Waiting longer than max_wait_seconds raises UpstreamBusyError. Threads and coroutines queue in one FIFO
+    order; coroutines wait on a future, so the event loop is never blocked.
+    """
+
+    def __init__(self, name: str, limit: int, max_wait_seconds: float):
+        super().__init__(name, limit)
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = _FifoSlots(self.limit)
+        self._wait_lock = threading.Lock()
+
+    def _queued(self, delta: int) -> None:
+        with self._wait_lock:
+            self.waiting += delta
+
+    def _timed_out(self) -> UpstreamBusyError:
+        self._rejected("timeout")
+        return UpstreamBusyError(self.name, self.retry_after())
+
+    def acquire_sync(self) -> Callable[[], None]:
+        """Block for a slot; return an idempotent release function. Raises UpstreamBusyError."""
+        start = time.perf_counter()
+        if not self._semaphore.try_acquire():
+            self._queued(1)
+            try:
+                if not self._semaphore.acquire(self.max_wait_seconds):
+                    raise self._timed_out()
+            finally:
+                self._queued(-1)
+        return self._hold(start)
+
+    async def acquire_async(self) -> Callable[[], None]:
+        """Wait (without blocking the event loop) for a slot; return an idempotent release function."""
+        start = time.perf_counter()
+        if not self._semaphore.try_acquire():
+            self._queued(1)
+            try:
+                if not await self._semaphore.acquire_async(self.max_wait_seconds):
+                    raise self._timed_out()
+            finally:
+                self._queued(-1)
+        return self._hold(start)
+
+    @contextmanager
+    def limit_sync(self) -> Iterator[None]:
+        release = self.acquire_sync()
+        try:
+            yield
+        finally:
+            release()
+
+    @asynccontextmanager
+    async def limit_async(self) -> AsyncIterator[None]:
+        release = await self.acquire_async()
+        try:
+            yield
+        finally:
+            release()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, inner: httpx.SyncByteStream, release: Callable[[], None]):
+        self._inner = inner
+        self._release = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._inner
+
+    def close(self) -> None:
+        try:
+            self._inner.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, inner: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._inner = inner
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._inner:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._inner.aclose()
+        finally:
+            self._release()
+
+
+class LimitedTransport(httpx.BaseTransport):
+    """httpx transport that holds a bulkhead slot from sending a request until its response is closed
+    (so streamed completions count for their whole duration)."""
+
+    def __init__(self, bulkhead: Bulkhead, inner: httpx.BaseTransport | None = None):
+        self._bulkhead = bulkhead
+        self._inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        release = self._bulkhead.acquire_sync()
+        try:
+            response = self._inner.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+
+class AsyncLimitedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of LimitedTransport."""
+
+    def __init__(self, bulkhead: Bulkhead, inner: httpx.AsyncBaseTransport | None = None):
+        self._bulkhead = bulkhead
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        release = await self._bulkhead.acquire_async()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+
+# One bulkhead per upstream, shared by everything in the process.
+upstreams: dict[str, Bulkhead] = {
+    name: Bulkhead(name, limit, config.UPSTREAM_MAX_WAIT_SECONDS)
+    for name, limit in config.UPSTREAM_CONCURRENCY.items()
+}
+for _name, _bulkhead in upstreams.items():
+    register_admission(f"upstream_{_name}", _bulkhead.stats)
+
+
+def upstream_stats() -> dict:
+    """In-flight, queue depth, wait percentiles and rejections per upstream."""
+    return {name: bulkhead.stats() for name, bulkhead in upstreams.items()}
+
+
+def busy_cause(exc: BaseException) -> UpstreamBusyError | None:
+    """The UpstreamBusyError behind exc (possibly wrapped by the OpenAI SDK or agno), if any."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, UpstreamBusyError):
+            return exc
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return None
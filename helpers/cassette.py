@@ -0,0 +1,218 @@
+"""
+Record/replay of upstream calls (Bluesky fetch, web search, OpenAI HTTP) for offline, deterministic runs.
+CASSETTE_MODE=record stores every response in CASSETTE_DIR/<kind>.json; CASSETTE_MODE=replay serves them back
+without network, optionally sleeping for the recorded latency times CASSETTE_LATENCY_SCALE.
+Function-level calls go through Cassette.call / acall; OpenAI goes through the httpx transports below.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+import config
+from helpers.admission import AsyncLimitedTransport, LimitedTransport, upstreams
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(LookupError):
+    """Replay mode found no recorded response for a request."""
+
+
+class Cassette:
+    """One JSON tape per kind: {request_key: {"request", "response", "elapsed"}}."""
+
+    def __init__(self, directory: str | Path, mode: str = "off", latency_scale: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"CASSETTE_MODE must be one of {MODES}, got {mode!r}")
+        directory = Path(directory)
+        if not directory.is_absolute():
+            directory = Path(__file__).resolve().parent.parent / directory
+        self.directory = directory
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._tapes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.replayed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @staticmethod
+    def key(request: Any) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _tape(self, kind: str) -> dict:
+        tape = self._tapes.get(kind)
+        if tape is None:
+            path = self.directory / f"{kind}.json"
+            tape = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+            self._tapes[kind] = tape
+        return tape
+
+    def lookup(self, kind: str, request: Any) -> dict:
+        with self._lock:
+            entry = self._tape(kind).get(self.key(request))
+            if entry is None:
+                raise CassetteMissError(f"No recorded {kind} response for {json.dumps(request)[:200]}")
+            self.replayed += 1
+            return entry
+
+    def record(self, kind: str, request: Any, response: Any, elapsed: float) -> None:
+        with self._lock:
+            tape = self._tape(kind)
+            tape[self.key(request)] = {"request": request, "response": response, "elapsed": round(elapsed, 4)}
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{kind}.json"
+            tmp = path.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(tape, indent=1, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+            self.recorded += 1
+
+    def replay_delay(self, entry: dict) -> float:
+        return entry.get("elapsed", 0.0) * self.latency_scale
+
+    def call(self, kind: str, request: Any, fn: Callable[[], Any]) -> Any:
+        """fn() in off mode; recorded response in replay mode; fn() plus recording in record mode."""
+        if self.mode == "off":
+            return fn()
+        if self.mode == "replay":
+            entry = self.lookup(kind, request)
+            delay = self.replay_delay(entry)
+            if delay > 0:
+                time.sleep(delay)
+            return entry["response"]
+        start = time.perf_counter()
+        result = fn()
+        self.record(kind, request, result, time.perf_counter() - start)
+        return result
+
+    async def acall(self, kind: str, request: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of call()."""
+        if self.mode == "off":
+            return await fn()
+        if self.mode == "replay":
+            entry = self.lookup(kind, request)
+            delay = self.replay_delay(entry)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return entry["response"]
+        start = time.perf_counter()
+        result = await fn()
+        self.record(kind, request, result, time.perf_counter() - start)
+        return result
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "recorded": self.recorded, "replayed": self.replayed}
+
+
+cassette = Cassette(config.CASSETTE_DIR, config.CASSETTE_MODE, config.CASSETTE_LATENCY_SCALE)
+
+
+def _http_request_key(request: httpx.Request) -> dict:
+    body = request.content.decode("utf-8", errors="replace")
+    try:
+        body = json.loads(body) if body else None
+    except json.JSONDecodeError:
+        pass
+    return {"method": request.method, "path": request.url.path, "body": body}
+
+
+def _http_response_record(response: httpx.Response) -> dict:
+    return {
+        "status": response.status_code,
+        "content_type": response.headers.get("content-type", "application/json"),
+        "body": response.content.decode("utf-8", errors="replace"),
+    }
+
+
+def _http_response(record: dict, request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        record["status"],
+        headers={"content-type": record["content_type"]},
+        content=record["body"].encode("utf-8"),
+        request=request,
+    )
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records or replays every request through `cassette` under `kind`."""
+
+    def __init__(self, cassette: Cassette, kind: str, inner: httpx.BaseTransport | None = None):
+        self._cassette = cassette
+        self._kind = kind
+        self._inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        key = _http_request_key(request)
+
+        def send() -> dict:
+            response = self._inner.handle_request(request)
+            response.read()
+            return _http_response_record(response)
+
+        return _http_response(self._cassette.call(self._kind, key, send), request)
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of CassetteTransport."""
+
+    def __init__(self, cassette: Cassette, kind: str, inner: httpx.AsyncBaseTransport | None = None):
+        self._cassette = cassette
+        self._kind = kind
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = _http_request_key(request)
+
+        async def send() -> dict:
+            response = await self._inner.handle_async_request(request)
+            await response.aread()
+            return _http_response_record(response)
+
+        return _http_response(await self._cassette.acall(self._kind, key, send), request)
+
+
+_openai_http_clients: dict[bool, httpx.Client | httpx.AsyncClient] = {}
+
+
+def openai_http_client(async_client: bool = False) -> httpx.Client | httpx.AsyncClient:
+    """Process-wide httpx client for OpenAI SDK clients (one connection pool shared by every agent): every
+    request holds a slot of the "openai" upstream limit and is recorded/replayed when CASSETTE_MODE is set."""
+    if async_client not in _openai_http_clients:
+        _openai_http_clients[async_client] = _new_openai_http_client(async_client)
+    return _openai_http_clients[async_client]
+
+
+def _pool_options() -> dict:
+    """Connection limits, keep-alive and HTTP/2 (when h2 is installed) for the OpenAI transports."""
+    return {
+        "http2": config.OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None,
+        "limits": httpx.Limits(
+            max_connections=config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+def _new_openai_http_client(async_client: bool) -> httpx.Client | httpx.AsyncClient:
+    if async_client:
+        inner = httpx.AsyncHTTPTransport(**_pool_options())
+        if cassette.enabled:
+            inner = AsyncCassetteTransport(cassette, "openai", inner)
+        return httpx.AsyncClient(transport=AsyncLimitedTransport(upstreams["openai"], inner), timeout=600)
+    inner = httpx.HTTPTransport(**_pool_options())
+    if cassette.enabled:
+        inner = CassetteTransport(cassette, "openai", inner)
+    return httpx.Client(transport=LimitedTransport(upstreams["openai"], inner), timeout=600)
@@ -1,4 +1,4 @@
-"""Cost estimation using config model costs."""
+"""Cost estimation using config model costs, and a rough token count for budgeting."""
 import config
 
 
@@ -20,3 +20,8 @@ def estimate_openai_cost(
     inp_per_m, out_per_m = costs[model_id]
     cost = (input_tokens * inp_per_m + output_tokens * out_per_m) / 1_000_000
     return round(cost, 4)
+
+
+def estimate_tokens(texts: list[str]) -> int:
+    """Rough token count (about 4 characters per token) for budgeting before a call."""
+    return sum(len(t) for t in texts) // 4 + 1
@@ -0,0 +1,264 @@
+"""
+Deadline budgets and hedged calls for tool I/O, so one stuck upstream call does not set a request's latency.
+An explain run sets a request deadline (request_deadline(); contextvars, so it reaches tools run in threads by
+asyncio.to_thread and agno). Each tool call gets min(its own timeout, time left before the deadline minus the
+reserve kept for the model's final answer). A call still running after hedge_after seconds gets a duplicate,
+and whichever answers first wins; hedges are capped at a share of calls so a slow upstream is not hit with
+twice the load. A call that runs out of budget raises ToolTimeout, which the tools turn into a short
+"timed out" result the model can answer around; the run records it in the scope's timed_out list.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, TypeVar
+
+import config
+from helpers.profiling import traced_thread
+from helpers.telemetry import HEDGED_CALLS, TOOL_TIMEOUTS
+
+T = TypeVar("T")
+
+
+class ToolTimeout(TimeoutError):
+    """A tool call got no answer within its budget (seconds == 0: not attempted, because the request deadline had
+    already passed or the tool has config.HEDGE_MAX_ABANDONED calls still hanging)."""
+
+    def __init__(self, name: str, seconds: float):
+        super().__init__(f"{name} timed out after {seconds:g}s" if seconds else f"{name} skipped: deadline reached")
+        self.name = name
+        self.seconds = seconds
+
+
+class DeadlineExceeded(TimeoutError):
+    """The whole run overran its request deadline plus grace."""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"Explain run exceeded its {seconds:g}s deadline")
+        self.seconds = seconds
+
+
+class DeadlineScope:
+    """One request's deadline (time.monotonic) and the tools that timed out under it."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.timed_out: list[str] = []
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+_scope: contextvars.ContextVar[DeadlineScope | None] = contextvars.ContextVar("deadline_scope", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[DeadlineScope]:
+    """Set the deadline for tool calls made in this context (nested scopes keep the earlier deadline)."""
+    scope = DeadlineScope(seconds)
+    outer = _scope.get()
+    if outer is not None and outer.expires_at < scope.expires_at:
+        scope.expires_at = outer.expires_at
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def set_request_deadline(seconds: float) -> DeadlineScope:
+    """request_deadline() for the rest of the current context, without a with-block. For async generators (a
+    streaming response), whose cleanup may run in another context where the contextvar could not be reset."""
+    scope = DeadlineScope(seconds)
+    _scope.set(scope)
+    return scope
+
+
+def timed_out_tools() -> list[str]:
+    """Tools that timed out in the current request so far (empty outside a request deadline)."""
+    scope = _scope.get()
+    return list(scope.timed_out) if scope is not None else []
+
+
+def tool_budget(timeout: float) -> float:
+    """Seconds a tool call may take: timeout, capped by the time left before the request deadline
+    minus config.DEADLINE_ANSWER_RESERVE_SECONDS."""
+    scope = _scope.get()
+    if scope is None:
+        return timeout
+    return max(0.0, min(timeout, scope.remaining() - config.DEADLINE_ANSWER_RESERVE_SECONDS))
+
+
+class _CallStats:
+    """Per-tool call/hedge/timeout counters; also the hedge budget (at most ratio * calls + burst hedges)."""
+
+    def __init__(self, ratio: float, burst: int):
+        self.ratio = ratio
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._counts: dict[str, dict[str, int]] = {}
+
+    def _entry(self, name: str) -> dict[str, int]:
+        return self._counts.setdefault(
+            name, {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "skipped": 0, "shed": 0, "abandoned": 0}
+        )
+
+    def count(self, name: str, field: str, n: int = 1) -> None:
+        with self._lock:
+            self._entry(name)[field] += n
+
+    def abandoned(self, name: str) -> int:
+        with self._lock:
+            return self._entry(name)["abandoned"]
+
+    def allow_hedge(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entry(name)
+            if entry["hedged"] >= self.ratio * entry["calls"] + self.burst:
+                return False
+            entry["hedged"] += 1
+            return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._counts.items()}
+
+
+_stats = _CallStats(config.HEDGE_MAX_RATIO, config.HEDGE_BURST)
+
+# Sync calls run here so the caller can stop waiting; a call that never returns keeps its thread until it does.
+_pool = ThreadPoolExecutor(max_workers=config.HEDGE_MAX_THREADS, thread_name_prefix="tool-call")
+
+
+def _traced(fn: Callable[[], T]) -> T:
+    with traced_thread():
+        return fn()
+
+
+def _timed_out(name: str, budget: float, field: str | None = None) -> ToolTimeout:
+    _stats.count(name, field or ("timeouts" if budget else "skipped"))
+    TOOL_TIMEOUTS.labels(tool=name).inc()
+    scope = _scope.get()
+    if scope is not None:
+        scope.timed_out.append(name)
+    return ToolTimeout(name, round(budget, 1) or budget)
+
+
+def _hedge_won(name: str) -> None:
+    _stats.count(name, "hedge_wins")
+    HEDGED_CALLS.labels(tool=name, winner="hedge").inc()
+
+
+def _abandon(name: str, attempts: set) -> None:
+    """Count attempts left running in the pool until each of them finishes."""
+    for future in attempts:
+        _stats.count(name, "abandoned")
+        future.add_done_callback(lambda _: _stats.count(name, "abandoned", -1))
+
+
+def call_with_deadline(name: str, fn: Callable[[], T], timeout: float, hedge_after: float | None = None) -> T:
+    """fn() within tool_budget(timeout) seconds, duplicated after hedge_after seconds (None = no hedging).
+
+    Returns the first successful answer; raises the error if every attempt failed, ToolTimeout if none
+    answered in time (the attempts are left to finish in the background, counted as "abandoned") or
+    the tool already has config.HEDGE_MAX_ABANDONED of those.
+    """
+    budget = tool_budget(timeout)
+    _stats.count(name, "calls")
+    if budget <= 0:
+        raise _timed_out(name, 0)
+    if _stats.abandoned(name) >= config.HEDGE_MAX_ABANDONED:
+        raise _timed_out(name, 0, "shed")
+    expires_at = time.monotonic() + budget
+    # One context copy per attempt: a Context cannot be entered by two threads at once.
+    attempts = [_pool.submit(contextvars.copy_context().run, _traced, fn)]
+    if hedge_after is not None and hedge_after < budget:
+        wait(attempts, timeout=hedge_after)
+        if not attempts[0].done() and _stats.allow_hedge(name):
+            attempts.append(_pool.submit(contextvars.copy_context().run, _traced, fn))
+    pending, error = set(attempts), None
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, expires_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                if len(attempts) > 1:
+                    if future is attempts[1]:
+                        _hedge_won(name)
+                    else:
+                        HEDGED_CALLS.labels(tool=name, winner="original").inc()
+                return future.result()
+            error = future.exception()
+    if error is not None and not pending:
+        raise error
+    _abandon(name, pending)
+    raise _timed_out(name, budget)
+
+
+async def acall_with_deadline(
+    name: str, make_coro: Callable[[], Awaitable[T]], timeout: float, hedge_after: float | None = None
+) -> T:
+    """Async variant of call_with_deadline; attempts still running when it returns are cancelled."""
+    budget = tool_budget(timeout)
+    _stats.count(name, "calls")
+    if budget <= 0:
+        raise _timed_out(name, 0)
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + budget
+    attempts = [asyncio.ensure_future(make_coro())]
+    try:
+        if hedge_after is not None and hedge_after < budget:
+            await asyncio.wait(attempts, timeout=hedge_after)
+            if not attempts[0].done() and _stats.allow_hedge(name):
+                attempts.append(asyncio.ensure_future(make_coro()))
+        pending, error = set(attempts), None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, expires_at - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                if task.exception() is None:
+                    if len(attempts) > 1:
+                        if task is attempts[1]:
+                            _hedge_won(name)
+                        else:
+                            HEDGED_CALLS.labels(tool=name, winner="original").inc()
+                    return task.result()
+                error = task.exception()
+        if error is not None and not pending:
+            raise error
+        raise _timed_out(name, budget)
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+async def run_with_deadline(coro: Awaitable[T], seconds: float, grace: float = 0.0) -> tuple[T, list[str]]:
+    """(result, timed-out tool names) of coro run under request_deadline(seconds).
+
+    Tools stop early enough for the model to answer; if the run still goes past seconds + grace it is
+    cancelled and DeadlineExceeded is raised. Timeouts raised by the run itself (an HTTP client's, a tool's)
+    propagate unchanged.
+    """
+    with request_deadline(seconds) as scope:
+        try:
+            async with asyncio.timeout(scope.remaining() + grace) as limit:
+                result = await coro
+        except TimeoutError as e:
+            if limit.expired():
+                raise DeadlineExceeded(seconds) from e
+            raise
+    return result, list(scope.timed_out)
+
+
+def deadline_stats() -> dict:
+    """Per-tool calls, hedges sent, hedges that answered first, timeouts, calls skipped at the deadline or shed
+    because of abandoned threads, and threads currently abandoned (still running after their call gave up)."""
+    return _stats.snapshot()
@@ -0,0 +1,136 @@
+"""
+Explanation result cache keyed by canonical AT URI, with single-flight request coalescing.
+LRU + TTL in memory, optional SQLite persistence; concurrent misses for the same key share one computation,
+including a run streamed by /explain/stream (begin_external / end_external).
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from helpers.kv_store import SQLiteKV
+from helpers.ttl_cache import TTLCache
+
+
+class RunAbandoned(Exception):
+    """An external (streamed) run ended without a result because its client went away; joined callers retry."""
+
+
+class ExplanationCache:
+    """Finished explanations (result dicts from explain_with_stats_async) by AT URI.
+
+    get_or_compute() returns (result, cache_hit). While a key is being computed, other callers
+    await the same task instead of starting another agent run (counted as `coalesced`). Partial results
+    (with "timed_out_tools") are kept for partial_ttl seconds instead of ttl. A run driven elsewhere (a
+    streamed one) is registered with begin_external() so callers join it the same way.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, path: str | Path | None = None, partial_ttl: float | None = None):
+        self.ttl = ttl
+        self.partial_ttl = ttl if partial_ttl is None else partial_ttl
+        self._cache = TTLCache(maxsize, ttl)
+        self._store = SQLiteKV(path, table="explanations") if path else None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+        self.computed = 0
+
+    def get(self, key: str) -> dict | None:
+        value = self._cache.get(key)
+        if value is None and self._store is not None:
+            row = self._store.get(key)
+            if row is not None:
+                value, expires_at = row
+                self._cache.set(key, value, expires_at=expires_at)
+        return value
+
+    def preload(self) -> int:
+        """Load unexpired entries from the SQLite store into memory (startup warm-up); returns how many."""
+        if self._store is None:
+            return 0
+        count = 0
+        for key, value, expires_at in self._store.items():
+            self._cache.set(key, value, expires_at=expires_at)
+            count += 1
+        return count
+
+    def purge_store(self) -> int:
+        """Delete expired rows from the SQLite store; returns how many."""
+        return self._store.purge_expired() if self._store is not None else 0
+
+    def set(self, key: str, value: dict) -> None:
+        expires_at = time.time() + (self.partial_ttl if value.get("timed_out_tools") else self.ttl)
+        self._cache.set(key, value, expires_at=expires_at)
+        if self._store is not None:
+            self._store.set(key, value, expires_at)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        try:
+            value = await compute()
+            self.computed += 1
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict]],
+        refresh: bool = False,
+    ) -> tuple[dict, bool]:
+        """Cached value for key, or the result of compute() (shared with concurrent callers).
+
+        refresh=True skips the cache lookup (an in-flight computation is still joined, it is fresh).
+        Errors are not cached. A caller that is cancelled does not cancel the shared computation.
+        """
+        if not refresh:
+            cached = self.get(key)
+            if cached is not None:
+                return cached, True
+        while True:
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._compute(key, compute))
+                self._inflight[key] = task
+            else:
+                self.coalesced += 1
+            try:
+                return await asyncio.shield(task), False
+            except RunAbandoned:
+                continue  # the streamed run we joined was dropped; run (or join) another
+
+    def in_flight(self, key: str) -> asyncio.Future | None:
+        """The computation currently running for key, if any (await it shielded to join)."""
+        return self._inflight.get(key)
+
+    def begin_external(self, key: str) -> asyncio.Future:
+        """Register a run for key that the caller drives itself (a streamed run), so get_or_compute() callers
+        join it instead of starting their own. Must be ended with end_external()."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    def end_external(
+        self, key: str, future: asyncio.Future, value: dict | None = None, error: BaseException | None = None
+    ) -> None:
+        """Finish a begin_external() run: cache value and hand it to the joined callers, or fail them with error
+        (neither: RunAbandoned, so they compute it themselves). Later calls for the same future are ignored."""
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.done():
+            return
+        if value is not None:
+            self.computed += 1
+            self.set(key, value)
+            future.set_result(value)
+        else:
+            future.set_exception(error if error is not None else RunAbandoned())
+            future.exception()  # retrieved: nobody may have joined
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats["in_flight"] = len(self._inflight)
+        stats["coalesced"] = self.coalesced
+        stats["computed"] = self.computed
+        stats["persistent"] = self._store is not None
+        return stats
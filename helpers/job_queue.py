@@ -0,0 +1,215 @@
+"""
+Durable explain job queue in SQLite (WAL), shared by every worker process that opens the same file.
+A worker claims the oldest ready job inside one write transaction, so two workers never take the same job; the claim
+holds a lease, and a job whose worker died is claimed again once the lease expires. Submitting an AT URI that already
+has a queued, running or recently finished job returns that job instead of queueing another (WebhookConflict if
+it was submitted with a different webhook_url). A worker ends its job (finish, fail, retry) only while it still
+holds the lease it claimed the job with, so a worker whose lease expired cannot overwrite the result of the worker
+that took the job over.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+STATUSES = ("queued", "running", "done", "failed")
+
+_COLUMNS = (
+    "id", "at_uri", "post_url", "params", "webhook_url", "status", "attempts", "result", "error", "webhook",
+    "created_at", "available_at", "started_at", "finished_at", "lease_expires_at",
+)
+_JSON_COLUMNS = ("params", "result", "webhook")
+
+
+class WebhookConflict(Exception):
+    """The AT URI already has a job (job) that reports to a different webhook_url."""
+
+    def __init__(self, job: dict):
+        super().__init__(f"Post already has job {job['id']} with a different webhook_url")
+        self.job = job
+
+
+class JobQueue:
+    """Jobs table: {id, at_uri, post_url, params, webhook_url, status, attempts, result, error, webhook,
+    created_at, available_at, started_at, finished_at, lease_expires_at} per job (times are epoch seconds).
+
+    One connection per queue, guarded by a lock; safe to use from multiple threads.
+    """
+
+    def __init__(self, path: str | Path, table: str = "jobs"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are explicit (BEGIN IMMEDIATE) where reads and writes must be atomic.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "id TEXT PRIMARY KEY, at_uri TEXT NOT NULL, post_url TEXT NOT NULL, params TEXT NOT NULL, "
+            "webhook_url TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+            "webhook TEXT, created_at REAL NOT NULL, available_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "lease_expires_at REAL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_at_uri ON {table} (at_uri, created_at)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_ready ON {table} (status, available_at)")
+
+    def _job(self, row: tuple | None) -> dict | None:
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        for key in _JSON_COLUMNS:
+            job[key] = json.loads(job[key]) if job[key] is not None else None
+        return job
+
+    def _select(self, where: str, params: tuple) -> dict | None:
+        row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM {self.table} WHERE {where}", params).fetchone()
+        return self._job(row)
+
+    def submit(
+        self,
+        at_uri: str,
+        post_url: str,
+        params: dict,
+        webhook_url: str | None = None,
+        dedupe_seconds: float = 0,
+        refresh: bool = False,
+    ) -> tuple[dict, bool]:
+        """(job, created). Returns the AT URI's queued or running job, or (unless refresh) its job finished
+        successfully within dedupe_seconds, instead of creating a new one. Raises WebhookConflict if that job
+        reports to another webhook_url than the one given (the new caller would never get its callback)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._select(
+                    "at_uri = ? AND (status IN ('queued', 'running') OR (status = 'done' AND finished_at > ?)) "
+                    "ORDER BY created_at DESC LIMIT 1",
+                    (at_uri, float("inf") if refresh else now - dedupe_seconds),
+                )
+                if existing is None:
+                    job_id = uuid.uuid4().hex
+                    self._conn.execute(
+                        f"INSERT INTO {self.table} (id, at_uri, post_url, params, webhook_url, status, created_at, "
+                        "available_at) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                        (job_id, at_uri, post_url, json.dumps(params), webhook_url, now, now),
+                    )
+                    job = self._select("id = ?", (job_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if existing is None:
+            return job, True
+        if webhook_url is not None and existing["webhook_url"] != webhook_url:
+            raise WebhookConflict(existing)
+        return existing, False
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            return self._select("id = ?", (job_id,))
+
+    def claim(self, lease_seconds: float, max_attempts: int) -> dict | None:
+        """Mark the oldest ready job running (attempts + 1, leased for lease_seconds) and return it; None if none.
+        Jobs whose lease expired are ready again, or failed once they have used max_attempts."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET status = 'failed', error = 'worker lost (lease expired)', "
+                    "finished_at = ? WHERE status = 'running' AND lease_expires_at <= ? AND attempts >= ?",
+                    (now, now, max_attempts),
+                )
+                job = self._select(
+                    "(status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_expires_at <= ?) "
+                    "ORDER BY available_at LIMIT 1",
+                    (now, now),
+                )
+                if job is not None:
+                    self._conn.execute(
+                        f"UPDATE {self.table} SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                        "lease_expires_at = ? WHERE id = ?",
+                        (now, now + lease_seconds, job["id"]),
+                    )
+                    job.update(status="running", attempts=job["attempts"] + 1, started_at=now,
+                               lease_expires_at=now + lease_seconds)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job
+
+    def _update(self, job_id: str, assignments: str, params: tuple) -> dict | None:
+        with self._lock:
+            self._conn.execute(f"UPDATE {self.table} SET {assignments} WHERE id = ?", (*params, job_id))
+            return self._select("id = ?", (job_id,))
+
+    def _update_leased(self, job_id: str, lease: float, assignments: str, params: tuple) -> dict | None:
+        """_update() only if the job is still running under lease (its lease_expires_at when claimed);
+        None if the lease was lost (expired and the job claimed again, or finished by another worker)."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"UPDATE {self.table} SET {assignments} WHERE id = ? AND status = 'running' AND lease_expires_at = ?",
+                (*params, job_id, lease),
+            )
+            if cur.rowcount == 0:
+                return None
+            return self._select("id = ?", (job_id,))
+
+    def finish(self, job_id: str, lease: float, result: dict) -> dict | None:
+        return self._update_leased(
+            job_id, lease, "status = 'done', result = ?, error = NULL, finished_at = ?, lease_expires_at = NULL",
+            (json.dumps(result, ensure_ascii=False), time.time()),
+        )
+
+    def fail(self, job_id: str, lease: float, error: str) -> dict | None:
+        return self._update_leased(
+            job_id, lease, "status = 'failed', error = ?, finished_at = ?, lease_expires_at = NULL",
+            (error, time.time()),
+        )
+
+    def retry(
+        self, job_id: str, lease: float, delay: float, error: str | None = None, refund_attempt: bool = False
+    ) -> dict | None:
+        """Back to queued, ready after delay seconds. refund_attempt: the run never started (e.g. overloaded)."""
+        return self._update_leased(
+            job_id,
+            lease,
+            "status = 'queued', available_at = ?, error = ?, lease_expires_at = NULL, attempts = attempts - ?",
+            (time.time() + delay, error, 1 if refund_attempt else 0),
+        )
+
+    def set_webhook(self, job_id: str, state: dict) -> None:
+        self._update(job_id, "webhook = ?", (json.dumps(state),))
+
+    def counts(self) -> dict:
+        """Jobs per status, and the age in seconds of the oldest ready queued job."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(f"SELECT status, COUNT(*) FROM {self.table} GROUP BY status").fetchall()
+            oldest = self._conn.execute(
+                f"SELECT MIN(available_at) FROM {self.table} WHERE status = 'queued' AND available_at <= ?", (now,)
+            ).fetchone()[0]
+        counts = {status: 0 for status in STATUSES}
+        counts.update(dict(rows))
+        counts["oldest_queued_seconds"] = round(now - oldest, 3) if oldest is not None else None
+        return counts
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished (done or failed) jobs older than older_than_seconds."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE status IN ('done', 'failed') AND finished_at <= ?",
+                (time.time() - older_than_seconds,),
+            )
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,97 @@
+"""Small SQLite-backed key/value store (JSON values with expiry) used to persist caches."""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+
+class SQLiteKV:
+    """Persistent key -> (JSON value, expires_at) table. WAL mode so several processes can share one file.
+
+    One connection per store, guarded by a lock; safe to use from multiple threads.
+    """
+
+    def __init__(self, path: str | Path, table: str = "kv"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, allow_stale: bool = False) -> tuple[Any, float] | None:
+        """Return (value, expires_at), or None if missing (or expired, unless allow_stale)."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (not allow_stale and row[1] <= time.time()):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str, value: Any = None) -> None:
+        """Delete key; with value, only if it still holds that value (another process may have replaced it)."""
+        with self._lock:
+            if value is None:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            else:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key = ? AND value = ?",
+                    (key, json.dumps(value, ensure_ascii=False)),
+                )
+            self._conn.commit()
+
+    def items(self, include_expired: bool = False, limit: int | None = None) -> Iterator[tuple[str, Any, float]]:
+        """Yield (key, value, expires_at), most recently expiring last; with limit, only the last `limit` rows."""
+        query = f"SELECT key, value, expires_at FROM {self.table}"
+        params: tuple = ()
+        if not include_expired:
+            query += " WHERE expires_at > ?"
+            params = (time.time(),)
+        if limit is not None:
+            query = f"SELECT * FROM ({query} ORDER BY expires_at DESC LIMIT ?)"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY expires_at", params).fetchall()
+        for key, value, expires_at in rows:
+            yield key, json.loads(value), expires_at
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return cur.rowcount
+
+    def prune(self, max_rows: int) -> int:
+        """Delete all but the max_rows latest-expiring rows; returns how many were deleted."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key NOT IN "
+                f"(SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT ?)",
+                (max_rows,),
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
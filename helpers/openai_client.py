@@ -1,26 +1,108 @@
-"""Shared OpenAI client and chat completion with structured JSON output."""
+"""Shared OpenAI clients (sync and async) and chat completion with structured JSON output.
+
+The async helpers (achat_completion_json, aembed) share one pooled httpx client, retry 429s and 5xx
+with full-jitter exponential backoff (honouring Retry-After), and wait on a per-model tokens-per-minute
+budget (config.OPENAI_TPM_LIMITS) before sending, so hundreds of calls can be in flight at once.
+"""
+import asyncio
 import json
+import random
 from pathlib import Path
+from typing import Awaitable, Callable, TypeVar
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, OpenAI, RateLimitError
+
+import config
+from helpers.cassette import openai_http_client
+from helpers.cost import estimate_tokens
+from helpers.rate_limit import RateLimiter
+
+T = TypeVar("T")
 
-# Lazy singleton: one client per process.
+# Lazy singletons: one client of each kind per process.
 _openai_client: OpenAI | None = None
+_async_openai_client: AsyncOpenAI | None = None
+_tpm_limiters: dict[str, RateLimiter] = {}
+
+
+def _load_env() -> None:
+    _env_path = Path(__file__).resolve().parent.parent / ".env"
+    if _env_path.exists():
+        load_dotenv(_env_path)
+    else:
+        load_dotenv(Path.cwd() / ".env")
 
 
 def get_openai_client() -> OpenAI:
     global _openai_client
     if _openai_client is None:
-        _env_path = Path(__file__).resolve().parent.parent / ".env"
-        if _env_path.exists():
-            load_dotenv(_env_path)
-        else:
-            load_dotenv(Path.cwd() / ".env")
-        _openai_client = OpenAI()
+        _load_env()
+        # Upstream concurrency limit, plus record/replay when CASSETTE_MODE is set.
+        _openai_client = OpenAI(http_client=openai_http_client())
     return _openai_client
 
 
+def get_async_openai_client() -> AsyncOpenAI:
+    """AsyncOpenAI on the shared pooled httpx client. SDK retries are off; _with_retries handles them."""
+    global _async_openai_client
+    if _async_openai_client is None:
+        _load_env()
+        _async_openai_client = AsyncOpenAI(http_client=openai_http_client(async_client=True), max_retries=0)
+    return _async_openai_client
+
+
+def _tpm_limiter(model: str) -> RateLimiter:
+    if model not in _tpm_limiters:
+        tpm = config.OPENAI_TPM_LIMITS.get(model)
+        _tpm_limiters[model] = RateLimiter(tpm / 60 if tpm else None, burst=tpm or 1)
+    return _tpm_limiters[model]
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    """Retry-After from a 429/503 when the server sent one, else full-jitter exponential backoff."""
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), config.OPENAI_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    cap = min(config.OPENAI_BACKOFF_MAX_SECONDS, config.OPENAI_BACKOFF_BASE_SECONDS * 2**attempt)
+    return random.uniform(0, cap)
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(exc, APIStatusError) and exc.status_code >= 500
+
+
+async def _with_retries(
+    model: str,
+    estimated_tokens: int,
+    call: Callable[[], Awaitable[T]],
+    used_tokens: Callable[[T], int | None],
+) -> T:
+    """Wait for the model's TPM budget, then call(); retry retryable errors up to config.OPENAI_MAX_RETRIES.
+    The estimate is corrected with the actual usage from the response."""
+    limiter = _tpm_limiter(model)
+    await limiter.acquire_async(estimated_tokens)
+    for attempt in range(config.OPENAI_MAX_RETRIES + 1):
+        try:
+            result = await call()
+        except Exception as e:
+            if attempt == config.OPENAI_MAX_RETRIES or not _retryable(e):
+                raise
+            await asyncio.sleep(_retry_delay(e, attempt))
+            continue
+        used = used_tokens(result)
+        if used is not None:
+            limiter.adjust(used - estimated_tokens)
+        return result
+    raise AssertionError("unreachable")
+
+
 def chat_completion_json(
     model: str,
     messages: list[dict],
@@ -44,3 +126,49 @@ def chat_completion_json(
     )
     content = (resp.choices[0].message.content or "{}").strip()
     return json.loads(content)
+
+
+async def achat_completion_json(
+    model: str,
+    messages: list[dict],
+    schema: dict,
+    max_tokens: int = 512,
+) -> dict:
+    """Async chat_completion_json with retries and the TPM limiter. Returns parsed dict."""
+    client = get_async_openai_client()
+    estimated = estimate_tokens([str(m.get("content", "")) for m in messages]) + max_tokens
+
+    async def call():
+        return await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "response",
+                    "strict": True,
+                    "schema": schema,
+                },
+            },
+        )
+
+    resp = await _with_retries(model, estimated, call, lambda r: r.usage.total_tokens if r.usage else None)
+    content = (resp.choices[0].message.content or "{}").strip()
+    return json.loads(content)
+
+
+async def aembed(texts: list[str], model: str) -> list[list[float]]:
+    """Embeddings for texts (one request, in order) with retries and the TPM limiter."""
+    client = get_async_openai_client()
+
+    async def call():
+        return await client.embeddings.create(input=texts, model=model)
+
+    resp = await _with_retries(
+        model, estimate_tokens(texts), call, lambda r: r.usage.total_tokens if r.usage else None
+    )
+    vectors: list[list[float] | None] = [None] * len(texts)
+    for item in resp.data:
+        vectors[item.index] = item.embedding
+    return vectors
@@ -0,0 +1,263 @@
+"""
+Opt-in profiling for slow explain runs.
+Every profiled run gets a RequestTrace (per-stage span timeline: Bluesky calls, searches, model turns).
+A low-overhead stack sampler runs for a random PROFILE_SAMPLE_RATE share of runs, or starts once a run
+passes PROFILE_SLOW_SECONDS. It samples the event loop thread (shared with other requests) and the worker threads
+currently running the run's tool calls (traced_thread()); stacks are rooted at "loop" or "worker". Sampled/slow
+runs are written to a rotating PROFILE_DIR by a background thread (JSON with spans and collapsed stacks,
+flamegraph-compatible); the slowest recent traces are listed by GET /debug/slow.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import config
+
+_current_trace: contextvars.ContextVar["RequestTrace | None"] = contextvars.ContextVar("current_trace", default=None)
+
+
+class RequestTrace:
+    """Span timeline (offsets from the run start, seconds) and optional stack samples for one run."""
+
+    def __init__(self, name: str, post_url: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.post_url = post_url
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.elapsed: float | None = None
+        self.spans: list[dict] = []
+        self.samples: Counter[str] = Counter()
+        self.threads: Counter[int] = Counter()  # worker thread id -> open traced_thread() blocks
+        self._threads_lock = threading.Lock()
+        self.sampled_reason: str | None = None
+        self.profile_path: str | None = None
+
+    def add_span(self, name: str, start: float, duration: float, error: bool = False) -> None:
+        """start: time.perf_counter() at span start."""
+        self.spans.append({
+            "name": name,
+            "start": round(start - self._t0, 4),
+            "duration": round(duration, 4),
+            **({"error": True} if error else {}),
+        })
+
+    def breakdown(self) -> dict[str, float]:
+        """Total seconds per span name (spans may overlap when stages run concurrently)."""
+        totals: dict[str, float] = {}
+        for span in self.spans:
+            totals[span["name"]] = round(totals.get(span["name"], 0.0) + span["duration"], 4)
+        return totals
+
+    def to_dict(self, with_samples: bool = False) -> dict:
+        out = {
+            "id": self.id,
+            "name": self.name,
+            "post_url": self.post_url,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(self.elapsed, 3) if self.elapsed is not None else None,
+            "breakdown": self.breakdown(),
+            "spans": sorted(self.spans, key=lambda s: s["start"]),
+            "sampled": self.sampled_reason,
+            "profile_path": self.profile_path,
+        }
+        if with_samples:
+            out["collapsed_stacks"] = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        return out
+
+
+def add_span(name: str, start: float, duration: float, error: bool = False) -> None:
+    """Append a span to the current run's trace, if any (no-op outside a profiled run)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, duration, error)
+
+
+@contextmanager
+def traced_thread() -> Iterator[None]:
+    """Have the current run's stack sampler also sample this (worker) thread while the block runs."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    ident = threading.get_ident()
+    with trace._threads_lock:
+        trace.threads[ident] += 1
+    try:
+        yield
+    finally:
+        with trace._threads_lock:
+            trace.threads[ident] -= 1
+            if not trace.threads[ident]:
+                del trace.threads[ident]
+
+
+def record_model_turns(response) -> None:
+    """Add model-turn and tool-call spans from an agno run response (message metrics), best effort."""
+    trace = _current_trace.get()
+    messages = getattr(response, "messages", None) if response else None
+    if trace is None or not messages:
+        return
+    for m in messages:
+        metrics = getattr(m, "metrics", None)
+        duration = getattr(metrics, "duration", None) if metrics else None
+        if duration is None:
+            continue
+        role = getattr(m, "role", None)
+        if role == "assistant":
+            name = "model_turn"
+        elif role == "tool":
+            name = f"tool:{getattr(m, 'tool_name', None) or 'unknown'}"
+        else:
+            continue
+        created = getattr(m, "created_at", None)
+        start = trace._t0 + (created - trace.started_at) if created else trace._t0
+        trace.add_span(name, start, float(duration))
+
+
+class StackSampler:
+    """Samples the Python stacks of the event loop thread and of the run's worker threads (trace.threads)
+    every `interval` seconds from a daemon thread into trace.samples."""
+
+    def __init__(self, trace: RequestTrace, loop_thread_id: int, interval: float):
+        self._trace = trace
+        self._loop_thread_id = loop_thread_id
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            frames = sys._current_frames()
+            with self._trace._threads_lock:
+                workers = [ident for ident in self._trace.threads if ident != self._loop_thread_id]
+            for root, ident in [("loop", self._loop_thread_id)] + [("worker", ident) for ident in workers]:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    self._trace.samples[";".join([root, *reversed(stack)])] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop sampling; returns once the last sample is in (a sample takes well under a millisecond)."""
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+
+class Profiler:
+    """Decides which runs to sample, keeps recent traces and writes profiles to a rotating directory."""
+
+    def __init__(
+        self,
+        sample_rate: float,
+        slow_seconds: float | None,
+        directory: str | Path,
+        max_files: int,
+        interval: float,
+        keep_recent: int,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        directory = Path(directory)
+        self.directory = directory if directory.is_absolute() else Path(__file__).resolve().parent.parent / directory
+        self.max_files = max_files
+        self.interval = interval
+        self._recent: deque[RequestTrace] = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+        # Profile files are written here, not on the event loop that finishes the run.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+    @property
+    def sampling_enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_seconds is not None
+
+    def _write(self, trace: RequestTrace) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.id}.json"
+            path.write_text(json.dumps(trace.to_dict(with_samples=True), indent=1), encoding="utf-8")
+            trace.profile_path = str(path)
+            files = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+            for old in files[: max(0, len(files) - self.max_files)]:
+                old.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def finish(self, trace: RequestTrace) -> None:
+        """Keep the trace for /debug/slow; queue its profile file when it was sampled (profile_path is set once
+        the file is written)."""
+        if self.slow_seconds is not None and trace.elapsed >= self.slow_seconds and trace.sampled_reason is None:
+            trace.sampled_reason = "slow"
+        if trace.sampled_reason is not None:
+            self._writer.submit(self._write, trace)
+        with self._lock:
+            self._recent.append(trace)
+
+    def slowest(self, n: int) -> list[dict]:
+        with self._lock:
+            traces = sorted(self._recent, key=lambda t: t.elapsed or 0.0, reverse=True)[:n]
+        return [t.to_dict() for t in traces]
+
+    def profiled(self, name: str):
+        """Decorator for async `fn(post_url, ...)`: trace the run, sample stacks when selected."""
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(post_url: str, *args, **kwargs):
+                trace = RequestTrace(name, post_url)
+                token = _current_trace.set(trace)
+                samplers: list[StackSampler] = []
+                timer = None
+                if self.sampling_enabled:
+                    loop_thread_id = threading.get_ident()
+
+                    def start_sampling(reason: str) -> None:
+                        trace.sampled_reason = reason
+                        samplers.append(StackSampler(trace, loop_thread_id, self.interval).start())
+
+                    if random.random() < self.sample_rate:
+                        start_sampling("sampled")
+                    elif self.slow_seconds is not None:
+                        timer = asyncio.get_running_loop().call_later(self.slow_seconds, start_sampling, "slow")
+                try:
+                    return await fn(post_url, *args, **kwargs)
+                finally:
+                    trace.elapsed = time.perf_counter() - trace._t0
+                    if timer is not None:
+                        timer.cancel()
+                    for sampler in samplers:
+                        sampler.stop()
+                    _current_trace.reset(token)
+                    self.finish(trace)
+
+            return wrapper
+
+        return decorator
+
+
+profiler = Profiler(
+    sample_rate=config.PROFILE_SAMPLE_RATE,
+    slow_seconds=config.PROFILE_SLOW_SECONDS,
+    directory=config.PROFILE_DIR,
+    max_files=config.PROFILE_MAX_FILES,
+    interval=config.PROFILE_INTERVAL_SECONDS,
+    keep_recent=config.PROFILE_KEEP_RECENT,
+)
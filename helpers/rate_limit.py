@@ -0,0 +1,59 @@
+"""Thread-safe token-bucket rate limiter for calls to an upstream (Bluesky, OpenAI, ...)."""
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """Allow at most `rate` calls per second on average, with bursts up to `burst`.
+
+    rate=None (or <= 0) disables limiting. acquire() blocks the calling thread until a token is free;
+    acquire_async() awaits instead. Both take a cost (e.g. tokens for a tokens-per-minute limit).
+    """
+
+    def __init__(self, rate: float | None, burst: int = 1):
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _reserve(self, cost: float = 1) -> float:
+        """Take `cost` tokens (possibly going negative) and return how long the caller must wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(cost, self.burst)
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self, cost: float = 1) -> None:
+        if self.rate is None:
+            return
+        wait = self._reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, cost: float = 1) -> None:
+        if self.rate is None:
+            return
+        wait = self._reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def adjust(self, delta: float) -> None:
+        """Charge (delta > 0) or refund (delta < 0) tokens after the fact, e.g. actual vs estimated usage."""
+        if self.rate is None or not delta:
+            return
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens - delta)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        return False
@@ -0,0 +1,138 @@
+"""
+Embedding index of explained posts, for reusing work across posts that say nearly the same thing.
+Vectors live in one preallocated NumPy matrix (unit-normalized float32), so a lookup is a single
+matrix-vector product. Capacity-bounded: when full, an expired entry or else the least recently used one
+is replaced. Persisted to one .npz file (vectors, timestamps and the JSON payloads; no pickling).
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+class SemanticCache:
+    """Payloads (dicts) keyed by embedding; lookup() returns the most similar live entry above `threshold`.
+
+    Entries older than ttl seconds are ignored by lookups and replaced first. Thread-safe.
+    """
+
+    def __init__(self, capacity: int, threshold: float, ttl: float, path: str | Path | None = None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self._vectors: np.ndarray | None = None  # (capacity, dim), allocated on first add / load
+        self._created = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._payloads: list[dict | None] = [None] * capacity
+        self._size = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.unsaved = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def lookup(self, vector) -> tuple[dict, float] | None:
+        """(payload, cosine similarity) of the nearest live entry if it reaches the threshold, else None."""
+        query = self._unit(vector)
+        with self._lock:
+            self.lookups += 1
+            if self._size == 0 or self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            sims = self._vectors[: self._size] @ query
+            sims[self._created[: self._size] < time.time() - self.ttl] = -1.0
+            best = int(np.argmax(sims))
+            similarity = float(sims[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = time.time()
+            return self._payloads[best], similarity
+
+    def add(self, vector, payload: dict) -> None:
+        """Store payload under vector, replacing an expired or the least recently used entry when full."""
+        v = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != v.shape[0]:
+                self._vectors = np.zeros((self.capacity, v.shape[0]), dtype=np.float32)
+                self._size = 0
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                expired = np.flatnonzero(self._created < now - self.ttl)
+                slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = v
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._payloads[slot] = payload
+            self.unsaved += 1
+
+    def save(self) -> bool:
+        """Write the index to `path` (atomically); False if there is no path or nothing changed."""
+        if self.path is None:
+            return False
+        with self._lock:
+            if not self.unsaved or self._vectors is None:
+                return False
+            n = self._size
+            arrays = {
+                "vectors": self._vectors[:n].copy(),
+                "created": self._created[:n].copy(),
+                "last_used": self._last_used[:n].copy(),
+                "payloads": np.frombuffer(json.dumps(self._payloads[:n]).encode("utf-8"), dtype=np.uint8),
+            }
+            self.unsaved = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self.path)
+        return True
+
+    def load(self) -> int:
+        """Load unexpired entries saved by save() (newest kept if over capacity); returns how many."""
+        if self.path is None or not self.path.exists():
+            return 0
+        with np.load(self.path, allow_pickle=False) as data:
+            vectors, created, last_used = data["vectors"], data["created"], data["last_used"]
+            payloads = json.loads(data["payloads"].tobytes().decode("utf-8"))
+        live = np.flatnonzero(created >= time.time() - self.ttl)
+        live = live[np.argsort(-last_used[live])][: self.capacity]
+        with self._lock:
+            if live.size:
+                self._vectors = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float32)
+                self._vectors[: live.size] = vectors[live]
+            self._created[: live.size] = created[live]
+            self._last_used[: live.size] = last_used[live]
+            self._payloads[: live.size] = [payloads[i] for i in live]
+            self._size = int(live.size)
+        return int(live.size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self._size,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+                "evictions": self.evictions,
+                "persistent": self.path is not None,
+            }
@@ -0,0 +1,94 @@
+"""Memory-bounded streaming counters: count-min sketch with decay, and a top-k tracker on top of it."""
+import hashlib
+import math
+import threading
+from array import array
+from typing import Hashable
+
+
+class CountMinSketch:
+    """Approximate weighted counts per key in width * depth float counters, whatever the number of keys.
+
+    Estimates never undercount; they overcount by at most e/width of the total weight with probability
+    1 - exp(-depth). decay(factor) scales every counter, so with a regular decay the counts behave like
+    an exponentially weighted rate (engagement velocity) instead of an all-time total.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [array("d", bytes(8 * width)) for _ in range(depth)]
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_error(cls, epsilon: float, delta: float) -> "CountMinSketch":
+        """Sketch whose overcount is at most epsilon * total with probability 1 - delta."""
+        return cls(width=math.ceil(math.e / epsilon), depth=math.ceil(math.log(1 / delta)))
+
+    def _columns(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[8 * i:8 * i + 8], "little") % self.width for i in range(self.depth)]
+
+    def add(self, key: str, weight: float = 1.0) -> float:
+        """Add weight to key; return the key's new estimate."""
+        columns = self._columns(key)
+        with self._lock:
+            self.total += weight
+            estimate = math.inf
+            for row, col in zip(self._rows, columns):
+                row[col] += weight
+                estimate = min(estimate, row[col])
+        return estimate
+
+    def estimate(self, key: str) -> float:
+        columns = self._columns(key)
+        with self._lock:
+            return min(row[col] for row, col in zip(self._rows, columns))
+
+    def decay(self, factor: float) -> None:
+        """Multiply every counter by factor (0 < factor < 1)."""
+        with self._lock:
+            for row in self._rows:
+                for i, value in enumerate(row):
+                    if value:
+                        row[i] = value * factor
+            self.total *= factor
+
+    def memory_bytes(self) -> int:
+        return self.width * self.depth * 8
+
+
+class TopK:
+    """The k keys with the highest estimates seen so far (estimates supplied by the caller, e.g. a sketch).
+
+    Holds at most k entries; a new key replaces the current minimum only if its estimate is higher.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._counts: dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: Hashable, estimate: float) -> None:
+        with self._lock:
+            if key in self._counts or len(self._counts) < self.k:
+                self._counts[key] = estimate
+                return
+            smallest = min(self._counts, key=self._counts.__getitem__)
+            if estimate > self._counts[smallest]:
+                del self._counts[smallest]
+                self._counts[key] = estimate
+
+    def decay(self, factor: float) -> None:
+        with self._lock:
+            for key in self._counts:
+                self._counts[key] *= factor
+
+    def items(self) -> list[tuple[Hashable, float]]:
+        """(key, estimate), highest first."""
+        with self._lock:
+            return sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._counts)
@@ -0,0 +1,104 @@
+"""
+Startup state and warm-up for the API.
+The heavy modules (agent, pipeline, cascade, semantic, tools: agno, atproto, openai, ddgs, numpy) are imported
+off the event loop, so the process answers GET /health (liveness) as soon as uvicorn is up. The lifespan hook
+then runs warm_up() in the background: Bluesky pre-login, the shared OpenAI HTTP pool (with one pre-connect), and
+cache preload from disk. GET /ready (readiness) turns 200 once the imports and warm-up are done.
+Phase timings are reported by /ready and measured by bench/startup.py.
+"""
+import asyncio
+import importlib
+import os
+import time
+from typing import Awaitable, Callable
+
+import config
+
+HEAVY_MODULES = ("tools", "agent", "pipeline", "cascade", "semantic")
+
+
+def _import_heavy() -> None:
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+class Startup:
+    """Warm-up phases ({name: {"seconds", "status", "error"?}}) and the readiness flag."""
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        self.phases: dict[str, dict] = {}
+        self.ready = False
+        self.ready_after_seconds: float | None = None
+        self._import_task: asyncio.Task | None = None
+
+    async def _phase(self, name: str, run: Callable[[], Awaitable[object]]) -> bool:
+        start = time.perf_counter()
+        try:
+            detail = await run()
+        except Exception as e:
+            self.phases[name] = {"seconds": round(time.perf_counter() - start, 3), "status": "error", "error": str(e)}
+            return False
+        self.phases[name] = {"seconds": round(time.perf_counter() - start, 3), "status": "ok"}
+        if detail is not None:
+            self.phases[name]["detail"] = detail
+        return True
+
+    def ensure_imported(self) -> Awaitable[None]:
+        """Import the heavy modules in a worker thread (once); await before using them from the event loop."""
+        if self._import_task is None:
+            self._import_task = asyncio.create_task(self._phase_imports())
+        return asyncio.shield(self._import_task)
+
+    async def _phase_imports(self) -> None:
+        if not await self._phase("imports", lambda: asyncio.to_thread(_import_heavy)):
+            raise RuntimeError(f"Startup imports failed: {self.phases['imports']['error']}")
+
+    async def warm_up(self, preload: list[Callable[[], int]] | None = None) -> None:
+        """Imports, then Bluesky login, HTTP pools and cache preload. Only failed imports keep /ready at 503;
+        other failed phases are reported and retried lazily by the first request."""
+        try:
+            await self.ensure_imported()
+        except RuntimeError:
+            return
+        from helpers.cassette import cassette
+
+        # Replay mode has no network to warm up.
+        live = cassette.mode != "replay"
+        if config.WARMUP_BLUESKY_LOGIN and live:
+            from tools import awarm_session
+
+            await self._phase("bluesky_login", awarm_session)
+        await self._phase("http_pools", lambda: _warm_http_pools(connect=config.WARMUP_OPENAI_CONNECT and live))
+        if config.WARMUP_PRELOAD_CACHES and preload:
+            await self._phase("cache_preload", lambda: asyncio.to_thread(lambda: sum(fn() for fn in preload)))
+        self.ready = True
+        self.ready_after_seconds = round(time.perf_counter() - self.created, 3)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_after_seconds": self.ready_after_seconds,
+            "uptime_seconds": round(time.perf_counter() - self.created, 3),
+            "phases": self.phases,
+        }
+
+
+async def _warm_http_pools(connect: bool) -> dict:
+    """Build the shared OpenAI HTTP client and one agent; optionally open a connection (TCP + TLS)."""
+    from agent import new_async_agent
+    from helpers.cassette import openai_http_client
+
+    client = openai_http_client(async_client=True)
+    new_async_agent()
+    if not connect:
+        return {"connected": False}
+    base_url = (os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+    response = await client.get(
+        f"{base_url}/models", headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}, timeout=10
+    )
+    return {"connected": True, "status_code": response.status_code}
+
+
+# One per process; created at import, so `created` is close to process start.
+startup = Startup()
@@ -0,0 +1,232 @@
+"""
+Prometheus metrics for the explainer (served at GET /metrics).
+Hot-path recording is a histogram observe / counter inc; cache hit counters are read from the caches'
+own stats at scrape time instead of being counted twice.
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from helpers.cost import estimate_openai_cost
+from helpers.profiling import add_span, traced_thread
+
+_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120)
+_TOKEN_BUCKETS = (100, 250, 500, 1_000, 2_000, 4_000, 8_000, 16_000, 32_000, 64_000)
+
+REQUEST_SECONDS = Histogram(
+    "explainer_request_seconds",
+    "Total /explain request time",
+    ["model", "mode", "cache_hit"],
+    buckets=_LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "explainer_stage_seconds",
+    "Time per upstream call (bluesky_login, bluesky_resolve, bluesky_fetch, bluesky_get_posts, search_web, search_news)",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_TURNS = Histogram(
+    "explainer_llm_turns",
+    "Model turns (completions) per explain run",
+    ["model"],
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+TTFT_SECONDS = Histogram(
+    "explainer_time_to_first_token_seconds",
+    "Time to first model token per run",
+    ["model"],
+    buckets=_LATENCY_BUCKETS,
+)
+TOKENS = Histogram(
+    "explainer_tokens",
+    "Tokens per explain run",
+    ["model", "direction"],
+    buckets=_TOKEN_BUCKETS,
+)
+SEARCH_TOKENS_SAVED = Histogram(
+    "explainer_search_tokens_saved",
+    "Estimated input tokens saved per explain run by search result compaction",
+    ["model"],
+    buckets=_TOKEN_BUCKETS,
+)
+COST_USD = Counter(
+    "explainer_estimated_cost_usd",
+    "Estimated OpenAI cost (helpers/cost.py)",
+    ["model"],
+)
+ERRORS = Counter("explainer_errors", "Errors by stage", ["stage"])
+ADMISSION_WAIT_SECONDS = Histogram(
+    "explainer_admission_wait_seconds",
+    "Time spent queued for a slot (queue: explain, or upstream_<name> for per-upstream limits)",
+    ["queue"],
+    buckets=_LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "explainer_admission_rejected",
+    "Requests/calls rejected by admission control (reason: queue_full, timeout)",
+    ["queue", "reason"],
+)
+TRENDING_EVENTS = Counter(
+    "explainer_trending_events",
+    "Feed events counted by the trending tracker (kind: like, repost, reply, quote)",
+    ["kind"],
+)
+PREWARM_RUNS = Counter(
+    "explainer_prewarm_runs",
+    "Background pre-explanations of trending posts (result: explained, already_cached, rejected, error)",
+    ["result"],
+)
+PREWARM_HITS = Counter("explainer_prewarm_cache_hits", "Explain responses served from a pre-explained cache entry")
+JOBS = Counter(
+    "explainer_jobs",
+    "Explain job runs (result: done, failed, retried, deferred by admission control)",
+    ["result"],
+)
+JOB_WAIT_SECONDS = Histogram(
+    "explainer_job_wait_seconds",
+    "Time from job submission to its first run",
+    buckets=_LATENCY_BUCKETS,
+)
+TOOL_TIMEOUTS = Counter(
+    "explainer_tool_timeouts",
+    "Tool calls that ran out of their deadline budget (tool: bluesky_fetch, search_web, search_news)",
+    ["tool"],
+)
+HEDGED_CALLS = Counter(
+    "explainer_hedged_calls",
+    "Tool calls that sent a hedge (duplicate) request and answered (winner: original, hedge)",
+    ["tool", "winner"],
+)
+SEMANTIC_CACHE_SAVED_SECONDS = Histogram(
+    "explainer_semantic_cache_saved_seconds",
+    "Estimated latency saved per near-duplicate reuse (reuse: explanation, search_context)",
+    ["reuse"],
+    buckets=_LATENCY_BUCKETS,
+)
+PREWARM_LEAD_SECONDS = Histogram(
+    "explainer_prewarm_lead_seconds",
+    "Time from pre-explaining a post to its first request",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 900, 1800, 3600),
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Observe the block's duration in explainer_stage_seconds{stage} and the current trace's timeline (and let its
+    stack sampler see this thread); count an error for the stage if it raises."""
+    start = time.perf_counter()
+    error = False
+    try:
+        with traced_thread():
+            yield
+    except BaseException:
+        error = True
+        ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=stage).observe(duration)
+        add_span(stage, start, duration, error)
+
+
+def record_error(stage: str) -> None:
+    ERRORS.labels(stage=stage).inc()
+
+
+def record_explain(result: dict | None, elapsed: float, cache_hit: bool, model: str, mode: str | None) -> None:
+    """Record one finished /explain request; run-level metrics only when an explainer run actually happened."""
+    REQUEST_SECONDS.labels(model=model, mode=mode or "unknown", cache_hit=str(cache_hit).lower()).observe(elapsed)
+    if cache_hit or not result:
+        return
+    if result.get("llm_turns") is not None:
+        LLM_TURNS.labels(model=model).observe(result["llm_turns"])
+    usage = result.get("usage") or {}
+    if usage.get("time_to_first_token_seconds") is not None:
+        TTFT_SECONDS.labels(model=model).observe(usage["time_to_first_token_seconds"])
+    inp, out = usage.get("input_tokens"), usage.get("output_tokens")
+    if inp is not None:
+        TOKENS.labels(model=model, direction="input").observe(inp)
+    if out is not None:
+        TOKENS.labels(model=model, direction="output").observe(out)
+    compaction = result.get("compaction") or {}
+    if compaction.get("tokens_saved") is not None:
+        SEARCH_TOKENS_SAVED.labels(model=model).observe(compaction["tokens_saved"])
+    # The run's own cost when it reports one (a cascade sums its stages, each priced at its own model);
+    # estimating from the summed tokens would price every stage at the requested model.
+    cost = usage.get("cost")
+    if cost is None and inp is not None and out is not None:
+        cost = estimate_openai_cost(model, inp, out)
+    if cost is not None:
+        COST_USD.labels(model=model).inc(cost)
+
+
+class _CacheCollector:
+    """Exports hit/miss counters and sizes of the process caches at scrape time."""
+
+    def __init__(self):
+        self._sources: dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, stats: Callable[[], dict]) -> None:
+        self._sources[name] = stats
+
+    def collect(self):
+        lookups = CounterMetricFamily("explainer_cache_lookups", "Cache lookups by cache and result", labels=["cache", "result"])
+        size = GaugeMetricFamily("explainer_cache_entries", "Entries per cache", labels=["cache"])
+        for name, stats_fn in self._sources.items():
+            stats = stats_fn()
+            for result in ("hits", "misses", "stale_hits"):
+                if stats.get(result) is not None:
+                    lookups.add_metric([name, result], stats[result])
+            if stats.get("size") is not None:
+                size.add_metric([name], stats["size"])
+        yield lookups
+        yield size
+
+
+cache_collector = _CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def register_cache(name: str, stats: Callable[[], dict]) -> None:
+    """Expose a cache's stats() (hits/misses/stale_hits/size) as explainer_cache_* metrics."""
+    cache_collector.register(name, stats)
+
+
+class _AdmissionCollector:
+    """Exports queue depth and in-flight counts of the admission controllers at scrape time."""
+
+    def __init__(self):
+        self._sources: dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, stats: Callable[[], dict]) -> None:
+        self._sources[name] = stats
+
+    def collect(self):
+        depth = GaugeMetricFamily("explainer_admission_queue_depth", "Requests waiting for a slot", labels=["queue"])
+        in_flight = GaugeMetricFamily("explainer_admission_in_flight", "Slots in use", labels=["queue"])
+        limit = GaugeMetricFamily("explainer_admission_limit", "Concurrency limit", labels=["queue"])
+        for name, stats_fn in self._sources.items():
+            stats = stats_fn()
+            depth.add_metric([name], stats["queue_depth"])
+            in_flight.add_metric([name], stats["in_flight"])
+            limit.add_metric([name], stats["limit"])
+        yield depth
+        yield in_flight
+        yield limit
+
+
+admission_collector = _AdmissionCollector()
+REGISTRY.register(admission_collector)
+
+
+def register_admission(name: str, stats: Callable[[], dict]) -> None:
+    """Expose an admission controller's stats() (queue_depth/in_flight/limit) as explainer_admission_* gauges."""
+    admission_collector.register(name, stats)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """(body, content type) for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
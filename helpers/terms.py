@@ -0,0 +1,29 @@
+"""Candidate entities/terms in a post's text (what searches and snippet trimming focus on)."""
+import re
+
+_HASHTAG = re.compile(r"#\w{2,}")
+_CASHTAG = re.compile(r"\$[A-Za-z][A-Za-z0-9]{1,9}\b")
+_QUOTED = re.compile(r"[\"“”']([^\"“”']{3,60})[\"“”']")
+_PROPER = re.compile(r"\b[A-Z][\w’'-]+(?:\s+(?:of|the|de|[A-Z][\w’'-]+))*\s+[A-Z][\w’'-]+\b")
+_ACRONYM = re.compile(r"\b[A-Z][A-Z0-9]{1,7}\b")
+
+
+def extract_terms(post_text: str, limit: int) -> list[str]:
+    """Candidate entities/terms worth searching, most specific first: hashtags, cashtags,
+    quoted phrases, multi-word proper nouns, then acronyms. Case-insensitive dedupe."""
+    candidates: list[str] = []
+    candidates += _HASHTAG.findall(post_text)
+    candidates += _CASHTAG.findall(post_text)
+    candidates += [q.strip() for q in _QUOTED.findall(post_text)]
+    candidates += _PROPER.findall(post_text)
+    candidates += _ACRONYM.findall(post_text)
+    seen: set[str] = set()
+    terms: list[str] = []
+    for term in candidates:
+        key = term.lower().lstrip("#$")
+        if key and key not in seen:
+            seen.add(key)
+            terms.append(term)
+        if len(terms) >= limit:
+            break
+    return terms
@@ -0,0 +1,91 @@
+"""In-process LRU cache with per-entry TTL and hit/miss counters."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after a TTL (seconds, wall clock).
+
+    Expired entries are not removed on read; they stay until evicted so callers can still
+    serve them with get(..., allow_stale=True) (e.g. when a backend is down).
+    Thread-safe.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None, allow_stale: bool = False) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                if not allow_stale:
+                    self.misses += 1
+                    return default
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None, expires_at: float | None = None) -> None:
+        """Store value; ttl overrides the cache default, expires_at (epoch seconds) overrides both."""
+        if expires_at is None:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> Iterator[tuple[Hashable, Any, float]]:
+        """Snapshot of (key, value, expires_at), oldest first."""
+        with self._lock:
+            snapshot = [(k, v, exp) for k, (v, exp) in self._data.items()]
+        return iter(snapshot)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and entry[1] > time.time()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale_hits
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
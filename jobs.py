@@ -0,0 +1,226 @@
+"""
+Asynchronous explain jobs: POST /explain/jobs returns a job id at once, so clients do not hold a connection open
+through a 20-60s run (and retry it on load balancer idle timeouts). Jobs are stored in a durable SQLite queue
+(helpers/job_queue.py, config.JOBS_PATH) and processed by config.JOBS_CONCURRENCY workers per process; with
+--workers, every process works off the same queue. A job whose run was rejected by admission control (or hit a
+saturated upstream) waits for Retry-After and is retried without using an attempt; a run past its deadline
+(config.JOBS_DEADLINE_SECONDS) fails at once, since a rerun would likely be just as slow; other failures are
+retried with backoff up to config.JOBS_MAX_ATTEMPTS. On completion the job is POSTed to its webhook_url, if any.
+Webhook hosts must be in config.JOBS_WEBHOOK_ALLOWED_HOSTS when that is set; otherwise the host must resolve only to
+public addresses (checked at submit and again before each delivery), so clients cannot make the server POST to
+loopback, private-network or cloud metadata addresses.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import time
+from typing import Awaitable, Callable
+from urllib.parse import urlsplit
+
+import config
+from helpers.admission import Overloaded, busy_cause
+from helpers.deadline import DeadlineExceeded
+from helpers.job_queue import JobQueue
+from helpers.telemetry import JOB_WAIT_SECONDS, JOBS
+
+_PUBLIC_FIELDS = (
+    "id", "status", "at_uri", "post_url", "attempts", "created_at", "started_at", "finished_at", "result", "error",
+    "webhook",
+)
+_RETRY_BACKOFF_SECONDS = 5.0
+_PURGE_INTERVAL_SECONDS = 600.0
+
+
+def job_view(job: dict) -> dict:
+    """The job as the API returns it and webhooks receive it (params and lease bookkeeping left out)."""
+    return {key: job.get(key) for key in _PUBLIC_FIELDS}
+
+
+def sign_webhook(body: bytes, secret: str) -> str:
+    """X-Explainer-Signature value for a webhook body: sha256=<hex HMAC-SHA256 of the body>."""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+async def webhook_url_problem(url: str) -> str | None:
+    """Why url may not receive webhooks, or None if it may (see module docstring)."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        return "webhook_url must be an http(s) URL with a host"
+    if config.JOBS_WEBHOOK_ALLOWED_HOSTS:
+        if host not in config.JOBS_WEBHOOK_ALLOWED_HOSTS:
+            return f"webhook host {host} is not in JOBS_WEBHOOK_ALLOWED_HOSTS"
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError):
+        return f"webhook host {host} does not resolve"
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not address.is_global:
+            return f"webhook host {host} resolves to a non-public address"
+    return None
+
+
+class JobService:
+    """Bounded worker pool over a JobQueue.
+
+    run_job(job) -> the job's result (JSON-serializable dict): one explain for job["post_url"] with job["params"]
+    (the API passes one that goes through the explanation cache and admission control).
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        run_job: Callable[[dict], Awaitable[dict]],
+        concurrency: int = config.JOBS_CONCURRENCY,
+        lease_seconds: float = config.JOBS_LEASE_SECONDS,
+        max_attempts: int = config.JOBS_MAX_ATTEMPTS,
+        poll_seconds: float = config.JOBS_POLL_SECONDS,
+    ):
+        self.queue = queue
+        self.run_job = run_job
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self._submitted = asyncio.Event()
+        self._active = 0
+        self.running = False
+        self.results: dict[str, int] = {}
+        self.webhooks: dict[str, int] = {}
+
+    def submit(
+        self, at_uri: str, post_url: str, params: dict, webhook_url: str | None = None, refresh: bool = False
+    ) -> tuple[dict, bool]:
+        """(job, created): a new queued job, or the AT URI's queued, running or recently finished one."""
+        job, created = self.queue.submit(
+            at_uri, post_url, params, webhook_url, dedupe_seconds=config.JOBS_DEDUPE_SECONDS, refresh=refresh
+        )
+        if created:
+            self._submitted.set()
+        return job, created
+
+    def get(self, job_id: str) -> dict | None:
+        return self.queue.get(job_id)
+
+    async def run(self) -> None:
+        """Process jobs until cancelled (in-flight jobs go back to the queue)."""
+        self.running = True
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            while True:
+                await asyncio.to_thread(self.queue.purge, config.JOBS_RETENTION_SECONDS)
+                await asyncio.sleep(_PURGE_INTERVAL_SECONDS)
+        finally:
+            self.running = False
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _next(self) -> dict:
+        # Other processes submit to the same file, so poll as well as waking on local submits.
+        while True:
+            job = await asyncio.to_thread(self.queue.claim, self.lease_seconds, self.max_attempts)
+            if job is not None:
+                return job
+            self._submitted.clear()
+            try:
+                await asyncio.wait_for(self._submitted.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next()
+            self._active += 1
+            try:
+                await self._process(job)
+            finally:
+                self._active -= 1
+
+    def _count(self, result: str) -> None:
+        self.results[result] = self.results.get(result, 0) + 1
+        JOBS.labels(result=result).inc()
+
+    async def _process(self, job: dict) -> None:
+        if job["attempts"] == 1:
+            JOB_WAIT_SECONDS.observe(max(0.0, job["started_at"] - job["created_at"]))
+        try:
+            result = await self.run_job(job)
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back instead of waiting for its lease to expire.
+            self.queue.retry(job["id"], job["lease_expires_at"], 0, refund_attempt=True)
+            raise
+        except Exception as e:
+            busy = e if isinstance(e, Overloaded) else busy_cause(e)
+            if busy is not None:
+                await asyncio.to_thread(
+                    self.queue.retry, job["id"], job["lease_expires_at"], busy.retry_after, str(e), True
+                )
+                self._count("deferred")
+                return
+            if job["attempts"] < self.max_attempts and not isinstance(e, DeadlineExceeded):
+                delay = _RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+                await asyncio.to_thread(self.queue.retry, job["id"], job["lease_expires_at"], delay, str(e))
+                self._count("retried")
+                return
+            job = await asyncio.to_thread(self.queue.fail, job["id"], job["lease_expires_at"], str(e))
+            self._count("failed" if job is not None else "lease_lost")
+        else:
+            job = await asyncio.to_thread(self.queue.finish, job["id"], job["lease_expires_at"], result)
+            self._count("done" if job is not None else "lease_lost")
+        # None: our lease expired and another worker owns the job (and its webhook) now.
+        if job is not None and job.get("webhook_url"):
+            await self._deliver(job)
+
+    async def _deliver(self, job: dict) -> None:
+        """POST the finished job to its webhook_url, retrying with backoff; the outcome is stored on the job."""
+        import httpx
+
+        body = json.dumps(job_view(job), ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", "X-Explainer-Job": job["id"]}
+        if config.JOBS_WEBHOOK_SECRET:
+            headers["X-Explainer-Signature"] = sign_webhook(body, config.JOBS_WEBHOOK_SECRET)
+        state: dict = {"delivered": False, "attempts": 0}
+        async with httpx.AsyncClient(timeout=config.JOBS_WEBHOOK_TIMEOUT_SECONDS, follow_redirects=False) as client:
+            for attempt in range(config.JOBS_WEBHOOK_ATTEMPTS):
+                if attempt:
+                    await asyncio.sleep(2**attempt)
+                # Checked before every attempt: DNS may have changed since the job was submitted.
+                problem = await webhook_url_problem(job["webhook_url"])
+                if problem is not None:
+                    state["error"] = f"blocked: {problem}"
+                    break
+                state["attempts"] = attempt + 1
+                try:
+                    response = await client.post(job["webhook_url"], content=body, headers=headers)
+                except httpx.HTTPError as e:
+                    state["error"] = str(e) or type(e).__name__
+                    continue
+                state["status_code"] = response.status_code
+                if response.status_code < 400:
+                    state["delivered"] = True
+                    state.pop("error", None)
+                    break
+                state["error"] = f"HTTP {response.status_code}"
+                if response.status_code < 500 and response.status_code != 429:
+                    break
+        state["at"] = time.time()
+        outcome = "delivered" if state["delivered"] else "failed"
+        self.webhooks[outcome] = self.webhooks.get(outcome, 0) + 1
+        await asyncio.to_thread(self.queue.set_webhook, job["id"], state)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "in_flight": self._active,
+            "queue": self.queue.counts(),
+            "results": dict(self.results),
+            "webhooks": dict(self.webhooks),
+        }
@@ -1,16 +1,71 @@
-"""Bluesky Post Explainer API. Run: python main.py [--port 8000]"""
+"""Bluesky Post Explainer API. Run: python main.py [--port 8000] [--workers N]"""
 import argparse
+import asyncio
+import os
+import sqlite3
+import sys
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
 import config  
-from api.routes import router
+from api.routes import explanation_cache, jobs, router, trending
+from helpers.startup import startup
+from trending import open_source
+
+
+async def _run_jobs() -> None:
+    await startup.ensure_imported()
+    await jobs.run()
+
+
+async def _ingest_trending() -> None:
+    await startup.ensure_imported()
+    await trending.run(open_source(config.TRENDING_SOURCE), source=config.TRENDING_SOURCE)
+
+
+def _purge_stores_once() -> int:
+    from tools import purge_search_store, purge_stores
+
+    return purge_stores() + purge_search_store() + explanation_cache.purge_store()
+
+
+async def _purge_stores() -> None:
+    """Keep the SQLite stores (the shared one with --workers) bounded: purge every STORE_PURGE_INTERVAL_SECONDS."""
+    await startup.ensure_imported()
+    while True:
+        try:
+            await asyncio.to_thread(_purge_stores_once)
+        except sqlite3.Error:
+            pass  # e.g. another worker holding the write lock past its timeout; next round
+        await asyncio.sleep(config.STORE_PURGE_INTERVAL_SECONDS)
+
+
+def _load_semantic_cache() -> int:
+    # Runs after the warm-up imports, so semantic (numpy) is already loaded.
+    from semantic import semantic_cache
+
+    return semantic_cache.load()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Warm up in the background so /health answers immediately; /ready reports when it is done.
+    background = [
+        asyncio.create_task(startup.warm_up(preload=[explanation_cache.preload, _load_semantic_cache])),
+        asyncio.create_task(_run_jobs()),
+        asyncio.create_task(_purge_stores()),
+    ]
+    if config.TRENDING_SOURCE:
+        background.append(asyncio.create_task(_ingest_trending()))
     yield
+    for task in background:
+        task.cancel()
+    # Lets job workers hand in-flight jobs back to the queue.
+    await asyncio.gather(*background, return_exceptions=True)
+    semantic = sys.modules.get("semantic")
+    if semantic is not None:
+        await asyncio.to_thread(semantic.semantic_cache.save)
 
 
 app = FastAPI(
@@ -28,11 +83,28 @@ if __name__ == "__main__":
     parser.add_argument("--host", default="0.0.0.0", help="Bind host")
     parser.add_argument("--port", type=int, default=8000, help="Bind port")
     parser.add_argument("--reload", action="store_true", help="Enable reload")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes; with more than one they share Bluesky session and caches via SHARED_STORE_PATH",
+    )
     args = parser.parse_args()
+    if args.workers > 1:
+        if args.reload:
+            parser.error("--reload cannot be combined with --workers")
+        if config.TRENDING_SOURCE:
+            # Every worker would ingest the feed; one separate process fills the shared store for all of them.
+            parser.error("unset TRENDING_SOURCE with --workers and run `python trending.py` alongside")
+        # Workers import config afresh and inherit the environment, so this points them all at one store.
+        default_store = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.SHARED_STORE_DEFAULT_PATH)
+        os.environ.setdefault("SHARED_STORE_PATH", default_store)
+        print(f"Starting {args.workers} workers sharing {os.environ['SHARED_STORE_PATH']}")
     import uvicorn
     uvicorn.run(
         "main:app",
         host=args.host,
         port=args.port,
         reload=args.reload,
+        workers=args.workers,
     )
@@ -0,0 +1,167 @@
+"""
+Deterministic pipeline mode for the explainer: no tool-calling loop.
+Fetches the post in code, extracts candidate entities/terms, runs the searches concurrently,
+then makes a single streamed completion with the post and (compacted, see tools/compaction.py) search results inlined.
+Returns the same dict shape as agent.explain_with_stats / explain_with_stats_async.
+"""
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from agent import BLUESKY_EXPLAINER_INSTRUCTIONS, format_search_results
+from helpers.cost import estimate_openai_cost
+from helpers.openai_client import get_openai_client
+from helpers.profiling import add_span, profiler
+from helpers.terms import extract_terms
+from tools import CachedWebSearchTools, afetch_bluesky_post, fetch_bluesky_post, new_compactor
+
+_WORD = re.compile(r"\S+")
+
+_search_tools = CachedWebSearchTools()
+
+
+def plan_searches(post_text: str) -> list[tuple[str, str]]:
+    """(kind, query) pairs: one news search on the post's opening words, web searches per extracted term."""
+    budget = config.PIPELINE_MAX_SEARCHES
+    searches: list[tuple[str, str]] = []
+    lead = " ".join(_WORD.findall(post_text)[:12])
+    if lead:
+        searches.append(("news", lead))
+    searches += [("web", term) for term in extract_terms(post_text, budget - len(searches))]
+    if not searches and post_text.strip():
+        searches.append(("web", post_text.strip()[:100]))
+    return searches[:budget]
+
+
+def _run_search(kind: str, query: str) -> str:
+    try:
+        if kind == "news":
+            return _search_tools.search_news(query)
+        return _search_tools.web_search(query)
+    except Exception as e:
+        return f"[search failed: {e}]"
+
+
+def _compact(post_text: str, searches: list[tuple[str, str]], found: list[str]) -> tuple[list[tuple[str, str, str]], dict | None]:
+    """(kind, query, result) in search order, compacted unless config.SEARCH_COMPACTION is off; plus its counters."""
+    compactor = new_compactor(post_text)
+    results = [(kind, query, compactor.compact(result, query, kind)) for (kind, query), result in zip(searches, found)]
+    return results, compactor.stats()
+
+
+def _make_messages(post_url: str, post_text: str, results: list[tuple[str, str, str]]) -> list[dict]:
+    blocks = format_search_results(results)
+    prompt = f"""Explain this Bluesky post. Its content and web search results are already below (no tools are available), so write your explanation in bullet points as specified in your instructions.
+
+Post URL: {post_url}
+Post text:
+{post_text}
+
+Search results:
+{blocks}"""
+    return [
+        {"role": "system", "content": BLUESKY_EXPLAINER_INSTRUCTIONS},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _complete(messages: list[dict], model: str) -> dict:
+    """One streamed completion; returns explanation plus usage in the agent's usage-dict shape."""
+    client = get_openai_client()
+    start = time.perf_counter()
+    ttft = None
+    parts: list[str] = []
+    usage = None
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(chunk.choices[0].delta.content)
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+    out: dict = {}
+    if usage is not None:
+        out["input_tokens"] = int(usage.prompt_tokens)
+        out["output_tokens"] = int(usage.completion_tokens)
+        out["total_tokens"] = int(usage.total_tokens)
+        estimated = estimate_openai_cost(model, out["input_tokens"], out["output_tokens"])
+        if estimated is not None:
+            out["cost"] = estimated
+    if ttft is not None:
+        out["time_to_first_token_seconds"] = round(ttft, 2)
+    out["model_run_duration_seconds"] = round(time.perf_counter() - start, 2)
+    return {"explanation": "".join(parts).strip(), "usage": out or None}
+
+
+def _unavailable(post_text: str, start: float) -> dict:
+    """Result for a post that could not be fetched ("[Post not found] ...", "[Post fetch timed out ...]", ...):
+    the marker itself, as the agent reports it, without searching or calling the model."""
+    return {
+        "explanation": post_text,
+        "usage": None,
+        "request_elapsed_seconds": round(time.perf_counter() - start, 2),
+        "mode": "pipeline",
+        "model": config.OPENAI_MODEL,
+        "llm_turns": 0,
+        "compaction": None,
+    }
+
+
+def explain_pipeline(post_url: str, post_text: str | None = None) -> dict:
+    """Pipeline mode (sync): fetch, concurrent searches, single completion. Same result keys as explain_with_stats."""
+    start = time.perf_counter()
+    if post_text is None:
+        post_text = fetch_bluesky_post(post_url)
+    if post_text.startswith("["):
+        return _unavailable(post_text, start)
+    searches = plan_searches(post_text)
+    with ThreadPoolExecutor(max_workers=max(1, len(searches))) as pool:
+        found = list(pool.map(lambda s: _run_search(*s), searches))
+    results, compaction = _compact(post_text, searches, found)
+    out = _complete(_make_messages(post_url, post_text, results), config.OPENAI_MODEL)
+    out["request_elapsed_seconds"] = round(time.perf_counter() - start, 2)
+    out["mode"] = "pipeline"
+    out["model"] = config.OPENAI_MODEL
+    out["llm_turns"] = 1
+    out["compaction"] = compaction
+    return out
+
+
+@profiler.profiled("pipeline")
+async def explain_pipeline_async(
+    post_url: str, post_text: str | None = None, search_context: list | None = None
+) -> dict:
+    """Pipeline mode (async): same steps as explain_pipeline without blocking the event loop.
+
+    search_context: (kind, query, result) searches of a near-duplicate post (semantic.py), used instead of
+    searching. The result's "search_context" holds the searches the completion saw.
+    """
+    start = time.perf_counter()
+    if post_text is None:
+        post_text = await afetch_bluesky_post(post_url)
+    if post_text.startswith("["):
+        return {**_unavailable(post_text, start), "search_context": []}
+    if search_context:
+        results, compaction = [tuple(r) for r in search_context], None
+    else:
+        searches = plan_searches(post_text)
+        found = await asyncio.gather(*(asyncio.to_thread(_run_search, kind, query) for kind, query in searches))
+        results, compaction = _compact(post_text, searches, found)
+    turn_start = time.perf_counter()
+    out = await asyncio.to_thread(_complete, _make_messages(post_url, post_text, results), config.OPENAI_MODEL)
+    add_span("model_turn", turn_start, time.perf_counter() - turn_start)
+    out["request_elapsed_seconds"] = round(time.perf_counter() - start, 2)
+    out["mode"] = "pipeline"
+    out["model"] = config.OPENAI_MODEL
+    out["llm_turns"] = 1
+    out["compaction"] = compaction
+    out["search_context"] = [list(r) for r in results]
+    return out
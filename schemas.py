@@ -1,6 +1,10 @@
 """Request/response models for the Explainer API."""
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+import config
+
 
 class ExplainRequest(BaseModel):
     """Request body for POST /explain."""
@@ -10,6 +14,25 @@ class ExplainRequest(BaseModel):
         description="Bluesky post URL (e.g. https://bsky.app/profile/HANDLE/post/RKEY)",
         examples=["https://bsky.app/profile/trumpstaxes.com/post/3mbrz32dais2i"],
     )
+    refresh: bool = Field(
+        default=False,
+        description="Bypass the explanation cache and recompute (the new result replaces the cached one)",
+    )
+    mode: Literal["agent", "pipeline", "cascade"] | None = Field(
+        default=None,
+        description=(
+            "Execution mode: agent (tool-calling loop), pipeline (one completion) or cascade "
+            "(cheap model first, escalate when low-confidence); default config.EXPLAIN_MODE"
+        ),
+    )
+    max_cost_usd: float | None = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Cascade mode: estimated cost budget for escalating to stronger models, in USD (the first, cheapest run "
+            "always happens); default config.CASCADE_MAX_COST_USD"
+        ),
+    )
 
 
 class TokenUsage(BaseModel):
@@ -38,3 +61,105 @@ class ExplainResponse(BaseModel):
     model_run_duration_seconds: float | None = Field(
         default=None, description="Agent/model run duration from SDK metrics (rounded)"
     )
+    search_tokens_saved: int | None = Field(
+        default=None,
+        description=(
+            "Estimated input tokens saved by compacting search results (deduplicated, trimmed, budgeted), "
+            "counting every model turn that would have received the raw results"
+        ),
+    )
+    mode: str | None = Field(default=None, description="Execution mode that produced the explanation")
+    model: str | None = Field(default=None, description="Model that produced the explanation")
+    escalation_reason: str | None = Field(
+        default=None,
+        description="Cascade mode: why the cheap model's answer was judged low-confidence (None if it was kept)",
+    )
+    semantic_reuse: Literal["explanation", "search_context"] | None = Field(
+        default=None,
+        description=(
+            "Set when a near-duplicate post's work was reused: its explanation (no model run) or its "
+            "search results (no searches)"
+        ),
+    )
+    semantic_similarity: float | None = Field(
+        default=None, description="Embedding cosine similarity to that near-duplicate post"
+    )
+    timed_out_tools: list[str] | None = Field(
+        default=None,
+        description=(
+            "Tool calls that ran out of their deadline (e.g. search_web, bluesky_fetch); the explanation was "
+            "written without their results"
+        ),
+    )
+    cache_hit: bool = Field(
+        default=False,
+        description="True when served from the explanation cache (no agent run; token usage and model timings are omitted)",
+    )
+
+
+class ExplainJobRequest(ExplainRequest):
+    """Request body for POST /explain/jobs."""
+
+    webhook_url: str | None = Field(
+        default=None,
+        pattern=r"^https?://\S+$",
+        description=(
+            "URL to POST the finished job (same body as GET /explain/jobs/{id}) to; signed with "
+            "X-Explainer-Signature when JOBS_WEBHOOK_SECRET is set. The host must resolve to public addresses "
+            "(or be listed in JOBS_WEBHOOK_ALLOWED_HOSTS)"
+        ),
+    )
+
+
+class WebhookDelivery(BaseModel):
+    """Outcome of a job's webhook delivery."""
+
+    delivered: bool
+    attempts: int
+    status_code: int | None = None
+    error: str | None = None
+    at: float | None = Field(default=None, description="Unix time of the last attempt")
+
+
+class ExplainJob(BaseModel):
+    """An explain job (POST /explain/jobs, GET /explain/jobs/{id})."""
+
+    id: str
+    status: Literal["queued", "running", "done", "failed"]
+    at_uri: str
+    post_url: str
+    attempts: int = Field(description="Runs started so far (retries after failures included)")
+    created_at: float = Field(description="Unix time the job was submitted")
+    started_at: float | None = Field(default=None, description="Unix time the latest run started")
+    finished_at: float | None = None
+    result: ExplainResponse | None = Field(default=None, description="Set when status is done")
+    error: str | None = Field(default=None, description="Set when status is failed (or the last run failed and it is queued again)")
+    webhook: WebhookDelivery | None = None
+
+
+class BatchExplainRequest(BaseModel):
+    """Request body for POST /explain/batch."""
+
+    post_urls: list[str] = Field(
+        ...,
+        min_length=1,
+        max_length=config.BATCH_MAX_URLS,
+        description="Bluesky post URLs; duplicates (same post by handle or DID) are explained once",
+    )
+    refresh: bool = Field(default=False, description="Bypass the explanation cache for every item")
+    mode: Literal["agent", "pipeline", "cascade"] | None = Field(
+        default=None, description="Execution mode for every item; default config.EXPLAIN_MODE"
+    )
+    max_cost_usd: float | None = Field(
+        default=None, gt=0, description="Cascade mode: cost budget per item in USD; default config.CASCADE_MAX_COST_USD"
+    )
+
+
+class BatchExplainItem(BaseModel):
+    """One NDJSON line of the /explain/batch response, emitted as soon as the item finishes."""
+
+    index: int = Field(description="Position of post_url in the request")
+    post_url: str
+    at_uri: str | None = None
+    result: ExplainResponse | None = None
+    error: str | None = Field(default=None, description="Set when this item failed; other items are unaffected")
@@ -0,0 +1,169 @@
+"""
+Semantic near-duplicate cache in front of the explain modes.
+The explanation cache is keyed by AT URI, so the same headline, copypasta or announcement posted by many
+accounts pays for a full run every time. Here the fetched post text is embedded
+(config.SEMANTIC_CACHE_EMBEDDING_MODEL) and matched against recently explained posts (helpers/semantic_cache.py):
+  similarity >= SEMANTIC_CACHE_EXPLANATION_THRESHOLD, with SEMANTIC_CACHE_REUSE_EXPLANATIONS: the cached explanation
+  is returned, no model run;
+  similarity >= SEMANTIC_CACHE_THRESHOLD: the run gets the cached search results inlined and skips its searches;
+  otherwise the post is explained as usual and added to the index with its explanation and search results.
+Off unless config.SEMANTIC_CACHE; the index is per process. Embedding failures fall back to a plain run. Hit rates and the estimated latency saved are in semantic_cache_stats().
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import config
+from helpers.deadline import timed_out_tools
+from helpers.openai_client import aembed
+from helpers.semantic_cache import SemanticCache
+from helpers.telemetry import SEMANTIC_CACHE_SAVED_SECONDS, register_cache
+from tools import afetch_bluesky_post
+
+# Explain run for one post: run(post_text, search_context) -> result dict with "search_context".
+ExplainRun = Callable[[str | None, list | None], Awaitable[dict]]
+
+semantic_cache = SemanticCache(
+    capacity=config.SEMANTIC_CACHE_CAPACITY,
+    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    ttl=config.SEMANTIC_CACHE_TTL_SECONDS,
+    path=config.SEMANTIC_CACHE_PATH,
+)
+
+_counters = {
+    "reused_explanation": 0,
+    "reused_search_context": 0,
+    "added": 0,
+    "skipped": 0,
+    "errors": 0,
+    "embeds": 0,
+    "embed_seconds_total": 0.0,
+    "latency_saved_seconds_total": 0.0,
+}
+_save_task: asyncio.Task | None = None
+
+
+def _maybe_save() -> None:
+    """Save the index in the background every config.SEMANTIC_CACHE_SAVE_EVERY new entries (one save at a time)."""
+    global _save_task
+    if semantic_cache.path is None or semantic_cache.unsaved < config.SEMANTIC_CACHE_SAVE_EVERY:
+        return
+    if _save_task is None or _save_task.done():
+        _save_task = asyncio.create_task(asyncio.to_thread(semantic_cache.save))
+
+
+def _record_saved(reuse: str, seconds: float) -> float:
+    """Count one reuse; seconds is the estimated time saved (clamped at 0)."""
+    seconds = max(0.0, seconds)
+    _counters[f"reused_{reuse}"] += 1
+    _counters["latency_saved_seconds_total"] += seconds
+    SEMANTIC_CACHE_SAVED_SECONDS.labels(reuse=reuse).observe(seconds)
+    return round(seconds, 2)
+
+
+async def _embed(text: str) -> list[float] | None:
+    start = time.perf_counter()
+    _counters["embeds"] += 1
+    try:
+        [vector] = await aembed([text], config.SEMANTIC_CACHE_EMBEDDING_MODEL)
+    except Exception:
+        _counters["errors"] += 1
+        return None
+    finally:
+        _counters["embed_seconds_total"] += time.perf_counter() - start
+    return vector
+
+
+async def explain_with_semantic_cache(
+    post_url: str, run: ExplainRun, post_text: str | None = None, refresh: bool = False
+) -> dict:
+    """Result of run() for the post, or a near-duplicate's cached explanation (see module docstring).
+
+    post_text: already-fetched post content (fetched here otherwise, and handed to run so it is not fetched
+    twice). refresh: do not reuse cached work, but still index the new result. The result dict gets
+    "semantic_cache" ({"reuse", "similarity", "source_post_url", "latency_saved_seconds"}) on a hit.
+    """
+    if not config.SEMANTIC_CACHE:
+        return await _run(run, post_text, None)
+    start = time.perf_counter()
+    if post_text is None:
+        try:
+            post_text = await afetch_bluesky_post(post_url)
+        except Exception:
+            post_text = None
+    if not post_text or post_text.startswith("[") or len(post_text.strip()) < config.SEMANTIC_CACHE_MIN_CHARS:
+        _counters["skipped"] += 1
+        return await _run(run, None if post_text is None or post_text.startswith("[") else post_text, None)
+
+    vector = await _embed(post_text)
+    if vector is None:
+        return await _run(run, post_text, None)
+    hit = None if refresh else semantic_cache.lookup(vector)
+    if hit is not None:
+        payload, similarity = hit
+        info = {"similarity": round(similarity, 4), "source_post_url": payload.get("post_url")}
+        if (
+            config.SEMANTIC_CACHE_REUSE_EXPLANATIONS
+            and similarity >= config.SEMANTIC_CACHE_EXPLANATION_THRESHOLD
+            and payload.get("explanation")
+        ):
+            elapsed = time.perf_counter() - start
+            info["reuse"] = "explanation"
+            info["latency_saved_seconds"] = _record_saved("explanation", payload["run_seconds"] - elapsed)
+            return {
+                "explanation": payload["explanation"],
+                "usage": None,
+                "request_elapsed_seconds": round(elapsed, 2),
+                "mode": payload.get("mode"),
+                "model": payload.get("model"),
+                "llm_turns": 0,
+                "compaction": None,
+                "semantic_cache": info,
+            }
+        if payload.get("search_context"):
+            result = await _run(run, post_text, payload["search_context"])
+            info["reuse"] = "search_context"
+            info["latency_saved_seconds"] = _record_saved(
+                "search_context", payload["run_seconds"] - result["request_elapsed_seconds"]
+            )
+            result["semantic_cache"] = info
+            return result
+
+    run_start = time.perf_counter()
+    result = await run(post_text, None)
+    search_context = result.pop("search_context", None)
+    # Partial runs (a tool timed out) are not worth reusing for other posts.
+    if result.get("explanation") and not timed_out_tools():
+        semantic_cache.add(vector, {
+            "post_url": post_url,
+            "explanation": result["explanation"],
+            "mode": result.get("mode"),
+            "model": result.get("model"),
+            "search_context": search_context or [],
+            "run_seconds": round(time.perf_counter() - run_start, 3),
+        })
+        _counters["added"] += 1
+        _maybe_save()
+    return result
+
+
+async def _run(run: ExplainRun, post_text: str | None, search_context: list | None) -> dict:
+    result = await run(post_text, search_context)
+    result.pop("search_context", None)
+    return result
+
+
+def semantic_cache_stats() -> dict:
+    """Index size and lookups/hits (helpers/semantic_cache.py) plus reuse counts, embedding time and latency saved."""
+    reused = _counters["reused_explanation"] + _counters["reused_search_context"]
+    return {
+        **semantic_cache.stats(),
+        **{k: round(v, 3) if isinstance(v, float) else v for k, v in _counters.items()},
+        "latency_saved_seconds_mean": round(_counters["latency_saved_seconds_total"] / reused, 3) if reused else None,
+        "embed_seconds_mean": (
+            round(_counters["embed_seconds_total"] / _counters["embeds"], 3) if _counters["embeds"] else None
+        ),
+    }
+
+
+register_cache("semantic", semantic_cache_stats)
@@ -1,4 +1,33 @@
 """Tools for the Bluesky Explainer agent."""
-from tools.bluesky_fetch import fetch_bluesky_post
+from tools.bluesky_fetch import (
+    afetch_bluesky_post,
+    ahydrate_posts,
+    aresolve_post_uri,
+    awarm_session,
+    fetch_bluesky_post,
+    handle_cache_stats,
+    purge_stores,
+    resolve_post_uri,
+    session_stats,
+)
+from tools.cached_search import CachedWebSearchTools, purge_search_store, search_cache_stats
+from tools.compaction import SearchCompactor, new_compactor
+from tools.handle_cache import HandleNotFoundError
 
-__all__ = ["fetch_bluesky_post"]
+__all__ = [
+    "CachedWebSearchTools",
+    "HandleNotFoundError",
+    "SearchCompactor",
+    "afetch_bluesky_post",
+    "ahydrate_posts",
+    "aresolve_post_uri",
+    "awarm_session",
+    "fetch_bluesky_post",
+    "handle_cache_stats",
+    "new_compactor",
+    "purge_search_store",
+    "purge_stores",
+    "resolve_post_uri",
+    "search_cache_stats",
+    "session_stats",
+]
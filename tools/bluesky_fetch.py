@@ -1,13 +1,28 @@
 """
 Bluesky fetch tool for the explainer agent.
 Fetches post content from a bsky.app URL and returns a plain-text summary.
+fetch_bluesky_post is sync (agent.run, eval harness); afetch_bluesky_post is the async-native
+version for agent.arun so Bluesky I/O does not block the event loop. getPostThread runs under a deadline
+(config.BLUESKY_FETCH_TIMEOUT_SECONDS, capped by the request's) and is hedged after
+config.BLUESKY_FETCH_HEDGE_AFTER_SECONDS (helpers/deadline.py); a fetch that times out returns a
+"[Post fetch timed out]" note instead of raising.
 """
+import asyncio
 import os
 import re
 from pathlib import Path
 
 from dotenv import load_dotenv
-from atproto import Client
+from atproto import AsyncClient, Client
+from atproto_client.exceptions import BadRequestError
+
+import config
+from helpers.cassette import cassette
+from helpers.deadline import ToolTimeout, acall_with_deadline, call_with_deadline
+from helpers.kv_store import SQLiteKV
+from helpers.telemetry import register_cache, stage_timer
+from tools.bluesky_session import AsyncBlueskySession, BlueskySession, _is_auth_error
+from tools.handle_cache import HandleCache, HandleNotFoundError
 
 _env_path = Path(__file__).resolve().parent.parent / ".env"
 if _env_path.exists():
@@ -27,29 +42,114 @@ def _load_credentials():
     return email, password
 
 
-def _bsky_url_to_at_uri(client: Client, url: str) -> str:
-    """Convert bsky.app profile/post URL to AT URI."""
+# One logged-in session per process (sync and async), shared across workers when BLUESKY_SESSION_PATH is set;
+# see tools/bluesky_session.py.
+_session_store = SQLiteKV(config.BLUESKY_SESSION_PATH, table="bluesky_sessions") if config.BLUESKY_SESSION_PATH else None
+_session = BlueskySession(_load_credentials, _session_store)
+_async_session = AsyncBlueskySession(_load_credentials, _session_store)
+
+
+# app.bsky.feed.getPosts accepts at most 25 URIs per call.
+GET_POSTS_BATCH_SIZE = 25
+
+# handle -> DID, shared by all fetches in the process.
+_handle_cache = HandleCache(
+    maxsize=config.HANDLE_CACHE_MAXSIZE,
+    ttl=config.HANDLE_CACHE_TTL_SECONDS,
+    negative_ttl=config.HANDLE_CACHE_NEGATIVE_TTL_SECONDS,
+    path=config.HANDLE_CACHE_PATH,
+)
+
+
+async def awarm_session() -> None:
+    """Log in (or import the shared session) ahead of the first request."""
+    await _async_session.get_client()
+
+
+def session_stats() -> dict:
+    """Login/refresh/reuse counters for the shared Bluesky sessions."""
+    return {"sync": _session.stats(), "async": _async_session.stats()}
+
+
+def handle_cache_stats() -> dict:
+    """Hit/miss counters for the handle -> DID cache."""
+    return _handle_cache.stats()
+
+
+def purge_stores() -> int:
+    """Delete expired handle -> DID and Bluesky session rows from their SQLite stores; returns how many."""
+    purged = _handle_cache.purge_store()
+    if _session_store is not None:
+        purged += _session_store.purge_expired()
+    return purged
+
+
+register_cache("handle", handle_cache_stats)
+
+
+def _parse_post_url(url: str) -> tuple[str, str]:
+    """Split a bsky.app post URL into (handle or DID, rkey)."""
     m = re.match(
         r"https?://(?:www\.)?bsky\.app/profile/([^/]+)/post/([^/?#]+)",
         url.strip(),
     )
     if not m:
         raise ValueError(f"Not a bsky.app post URL: {url}")
-    handle, rkey = m.group(1), m.group(2)
-    resolved = client.resolve_handle(handle)
-    return f"at://{resolved.did}/app.bsky.feed.post/{rkey}"
+    return m.group(1), m.group(2)
 
 
-def fetch_bluesky_post(post_url: str) -> str:
-    """Fetch a Bluesky post by its bsky.app URL."""
-    email, password = _load_credentials()
-    client = Client()
-    client.login(email, password)
+def _resolve_handle(client: Client, handle: str) -> str:
+    try:
+        with stage_timer("bluesky_resolve"):
+            return client.resolve_handle(handle).did
+    except BadRequestError as e:
+        # Expired/invalid tokens are BadRequestErrors too: let the session relogin and retry, cache nothing.
+        if _is_auth_error(e):
+            raise
+        raise HandleNotFoundError(f"Handle does not resolve: {handle}") from e
+
+
+def _bsky_url_to_at_uri(url: str) -> str:
+    """Convert bsky.app profile/post URL to AT URI. Handles go through the handle cache; DIDs need no lookup."""
+    actor, rkey = _parse_post_url(url)
+    did = _handle_cache.resolve(
+        actor, lambda handle: _session.call(lambda client: _resolve_handle(client, handle))
+    )
+    return f"at://{did}/app.bsky.feed.post/{rkey}"
+
+
+async def _aresolve_handle(client: AsyncClient, handle: str) -> str:
+    try:
+        with stage_timer("bluesky_resolve"):
+            return (await client.resolve_handle(handle)).did
+    except BadRequestError as e:
+        if _is_auth_error(e):
+            raise
+        raise HandleNotFoundError(f"Handle does not resolve: {handle}") from e
+
+
+async def _absky_url_to_at_uri(url: str) -> str:
+    """Async variant of _bsky_url_to_at_uri (shares the handle cache)."""
+    actor, rkey = _parse_post_url(url)
+    did = await _handle_cache.aresolve(
+        actor, lambda handle: _async_session.call(lambda client: _aresolve_handle(client, handle))
+    )
+    return f"at://{did}/app.bsky.feed.post/{rkey}"
+
+
+def resolve_post_uri(post_url: str) -> str:
+    """Canonical AT URI (DID form) for a bsky.app post URL; handle and DID URLs of one post map to the same URI."""
+    return cassette.call("bluesky", {"op": "resolve", "post_url": post_url}, lambda: _bsky_url_to_at_uri(post_url))
+
+
+async def aresolve_post_uri(post_url: str) -> str:
+    """Async variant of resolve_post_uri."""
+    return await cassette.acall(
+        "bluesky", {"op": "resolve", "post_url": post_url}, lambda: _absky_url_to_at_uri(post_url)
+    )
 
-    post_uri = _bsky_url_to_at_uri(client, post_url)
-    res = client.get_post_thread(uri=post_uri, depth=0, parent_height=0)
-    thread = res.thread
 
+def _thread_to_text(thread, post_uri: str) -> str:
     thread_type = getattr(thread, "py_type", "")
     if "notFoundPost" in thread_type:
         return f"[Post not found] URI: {getattr(thread, 'uri', post_uri)}"
@@ -62,3 +162,114 @@ def fetch_bluesky_post(post_url: str) -> str:
     record = getattr(post, "record", None)
     text = getattr(record, "text", "") if record else ""
     return text
+
+
+def _fetch(post_url: str) -> str:
+    post_uri = _bsky_url_to_at_uri(post_url)
+    with stage_timer("bluesky_fetch"):
+        res = call_with_deadline(
+            "bluesky_fetch",
+            lambda: _session.call(lambda client: client.get_post_thread(uri=post_uri, depth=0, parent_height=0)),
+            config.BLUESKY_FETCH_TIMEOUT_SECONDS,
+            config.BLUESKY_FETCH_HEDGE_AFTER_SECONDS,
+        )
+    return _thread_to_text(res.thread, post_uri)
+
+
+async def _afetch(post_url: str) -> str:
+    post_uri = await _absky_url_to_at_uri(post_url)
+    with stage_timer("bluesky_fetch"):
+        res = await acall_with_deadline(
+            "bluesky_fetch",
+            lambda: _async_session.call(lambda client: client.get_post_thread(uri=post_uri, depth=0, parent_height=0)),
+            config.BLUESKY_FETCH_TIMEOUT_SECONDS,
+            config.BLUESKY_FETCH_HEDGE_AFTER_SECONDS,
+        )
+    return _thread_to_text(res.thread, post_uri)
+
+
+def _timed_out_text(post_url: str, e: ToolTimeout) -> str:
+    return f"[Post fetch timed out after {e.seconds:g}s] URL: {post_url}"
+
+
+def fetch_bluesky_post(post_url: str) -> str:
+    """Fetch a Bluesky post by its bsky.app URL."""
+    try:
+        return cassette.call("bluesky", {"op": "fetch", "post_url": post_url}, lambda: _fetch(post_url))
+    except ToolTimeout as e:
+        return _timed_out_text(post_url, e)
+
+
+async def afetch_bluesky_post(post_url: str) -> str:
+    """Fetch a Bluesky post by its bsky.app URL."""
+    try:
+        return await cassette.acall("bluesky", {"op": "fetch", "post_url": post_url}, lambda: _afetch(post_url))
+    except ToolTimeout as e:
+        return _timed_out_text(post_url, e)
+
+
+async def ahydrate_posts(post_urls: list[str]) -> dict[str, dict]:
+    """Resolve and fetch many posts at once: {post_url: {"at_uri", "text"} or {"error"}}.
+
+    Each distinct author is resolved once (through the handle cache) and post text is fetched in bulk
+    with app.bsky.feed.getPosts, GET_POSTS_BATCH_SIZE URIs per call. Per-URL failures are reported
+    in the result instead of raised.
+    """
+    return await cassette.acall(
+        "bluesky", {"op": "hydrate", "post_urls": sorted(post_urls)}, lambda: _ahydrate(post_urls)
+    )
+
+
+async def _ahydrate(post_urls: list[str]) -> dict[str, dict]:
+    out: dict[str, dict] = {}
+    parsed: dict[str, tuple[str, str]] = {}
+    for url in post_urls:
+        try:
+            parsed[url] = _parse_post_url(url)
+        except ValueError as e:
+            out[url] = {"error": str(e)}
+
+    actors = sorted({actor for actor, _ in parsed.values()})
+
+    async def resolve(actor: str) -> str:
+        return await _handle_cache.aresolve(
+            actor, lambda handle: _async_session.call(lambda client: _aresolve_handle(client, handle))
+        )
+
+    resolved = await asyncio.gather(*(resolve(a) for a in actors), return_exceptions=True)
+    dids = dict(zip(actors, resolved))
+
+    uri_by_url: dict[str, str] = {}
+    for url, (actor, rkey) in parsed.items():
+        did = dids[actor]
+        if isinstance(did, Exception):
+            out[url] = {"error": str(did)}
+        else:
+            uri_by_url[url] = f"at://{did}/app.bsky.feed.post/{rkey}"
+
+    uris = sorted(set(uri_by_url.values()))
+    chunks = [uris[i : i + GET_POSTS_BATCH_SIZE] for i in range(0, len(uris), GET_POSTS_BATCH_SIZE)]
+
+    async def get_posts(chunk: list[str]):
+        with stage_timer("bluesky_get_posts"):
+            return await _async_session.call(lambda client: client.get_posts(uris=chunk))
+
+    responses = await asyncio.gather(*(get_posts(chunk) for chunk in chunks), return_exceptions=True)
+    texts: dict[str, str] = {}
+    chunk_errors: dict[str, str] = {}
+    for chunk, res in zip(chunks, responses):
+        if isinstance(res, Exception):
+            chunk_errors.update({uri: str(res) for uri in chunk})
+            continue
+        for post in res.posts:
+            record = getattr(post, "record", None)
+            texts[post.uri] = getattr(record, "text", "") if record else ""
+
+    for url, uri in uri_by_url.items():
+        if uri in texts:
+            out[url] = {"at_uri": uri, "text": texts[uri]}
+        elif uri in chunk_errors:
+            out[url] = {"at_uri": uri, "error": chunk_errors[uri]}
+        else:
+            out[url] = {"at_uri": uri, "error": f"[Post not found] URI: {uri}"}
+    return out
\ No newline at end of file
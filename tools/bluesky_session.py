@@ -0,0 +1,223 @@
+"""
+Process-wide Bluesky sessions for the fetch tools.
+Logs in once and reuses the same atproto client (and its access JWT and HTTP connection pool) for every call.
+atproto refreshes the access token itself shortly before it expires; we relogin when the PDS rejects the session.
+BlueskySession wraps the sync Client; AsyncBlueskySession wraps AsyncClient for use on the event loop.
+With a shared store (SQLiteKV, e.g. config.BLUESKY_SESSION_PATH in multi-worker mode) the session tokens are
+exported after login/refresh and imported by other workers instead of creating another session.
+"""
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from atproto import AsyncClient, Client, SessionEvent
+from atproto_client.exceptions import BadRequestError, UnauthorizedError
+
+import config
+from helpers.admission import upstreams
+from helpers.kv_store import SQLiteKV
+from helpers.telemetry import stage_timer
+
+T = TypeVar("T")
+
+# XRPC error names that mean "this session is no longer usable".
+_AUTH_ERROR_NAMES = {"ExpiredToken", "InvalidToken", "AuthenticationRequired", "AuthMissing"}
+
+
+def _is_auth_error(exc: Exception) -> bool:
+    if isinstance(exc, UnauthorizedError):
+        return True
+    if isinstance(exc, BadRequestError):
+        content = getattr(getattr(exc, "response", None), "content", None)
+        return getattr(content, "error", None) in _AUTH_ERROR_NAMES
+    return False
+
+
+class _SessionCounters:
+    """Counters shared by the sync and async sessions.
+
+    logins (createSession calls), refreshes (token refreshes done by atproto),
+    reuses (calls served by an existing session), relogins (sessions dropped after an auth error),
+    imports (sessions taken from the shared store instead of logging in).
+    """
+
+    def __init__(self, credentials: Callable[[], tuple[str, str]], store: SQLiteKV | None = None):
+        self._credentials = credentials
+        self._store = store
+        self._login_name: str | None = None
+        self._client = None
+        self._session_string: str | None = None  # session of self._client, as last shared or imported
+        self._stats_lock = threading.Lock()
+        self.logins = 0
+        self.refreshes = 0
+        self.reuses = 0
+        self.relogins = 0
+        self.imports = 0
+
+    def _shared_session(self, login: str) -> str | None:
+        row = self._store.get(login) if self._store is not None else None
+        return row[0] if row is not None else None
+
+    def _share_session(self, session_string: str) -> None:
+        self._session_string = session_string
+        if self._store is not None and self._login_name is not None:
+            self._store.set(self._login_name, session_string, time.time() + config.BLUESKY_SESSION_SHARE_TTL_SECONDS)
+
+    def _drop_shared_session(self, session_string: str | None) -> None:
+        """Remove session_string from the store, unless another worker has already replaced it with a new one."""
+        if self._store is not None and self._login_name is not None and session_string is not None:
+            self._store.delete(self._login_name, session_string)
+
+    def _session_changed(self, event: SessionEvent, session) -> None:
+        if event == SessionEvent.REFRESH:
+            with self._stats_lock:
+                self.refreshes += 1
+        if event in (SessionEvent.CREATE, SessionEvent.REFRESH):
+            self._share_session(session.export())
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "logged_in": self._client is not None,
+                "logins": self.logins,
+                "refreshes": self.refreshes,
+                "reuses": self.reuses,
+                "relogins": self.relogins,
+                "imports": self.imports,
+                "shared": self._store is not None,
+            }
+
+
+class BlueskySession(_SessionCounters):
+    """Thread-safe, lazily logged-in sync Bluesky client shared by all requests in the process.
+
+    credentials: callable returning (login, password); called only when a (re)login is needed.
+    store: optional shared store for session tokens (see module docstring).
+    """
+
+    def __init__(self, credentials: Callable[[], tuple[str, str]], store: SQLiteKV | None = None):
+        super().__init__(credentials, store)
+        self._lock = threading.Lock()
+
+    def _on_session_change(self, event: SessionEvent, session) -> None:
+        self._session_changed(event, session)
+
+    def _login(self) -> Client:
+        login, password = self._credentials()
+        self._login_name = login
+        client = Client(base_url=config.BLUESKY_BASE_URL)
+        client.on_session_change(self._on_session_change)
+        shared = self._shared_session(login)
+        if shared is not None:
+            self._session_string = shared  # before login: a refresh during the import replaces it
+            try:
+                with stage_timer("bluesky_session_import"):
+                    client.login(session_string=shared)
+                self.imports += 1
+                return client
+            except Exception:
+                self._drop_shared_session(shared)
+        with stage_timer("bluesky_login"):
+            client.login(login, password)
+        self.logins += 1
+        return client
+
+    def get_client(self) -> Client:
+        """Return the shared logged-in client, logging in on first use."""
+        with self._lock:
+            if self._client is None:
+                self._client = self._login()
+            else:
+                self.reuses += 1
+            return self._client
+
+    def invalidate(self, client: Client) -> None:
+        """Drop the shared client (and the stored session) if it is still `client`, so the next call logs in again."""
+        with self._lock:
+            if self._client is client:
+                self._client = None
+                self.relogins += 1
+                self._drop_shared_session(self._session_string)
+                self._session_string = None
+
+    def call(self, fn: Callable[[Client], T]) -> T:
+        """Run fn(client) with the shared client; on an auth error relogin once and retry.
+        Each attempt holds a slot of the "bluesky" upstream limit."""
+        client = self.get_client()
+        try:
+            with upstreams["bluesky"].limit_sync():
+                return fn(client)
+        except Exception as e:
+            if not _is_auth_error(e):
+                raise
+            self.invalidate(client)
+        client = self.get_client()
+        with upstreams["bluesky"].limit_sync():
+            return fn(client)
+
+
+class AsyncBlueskySession(_SessionCounters):
+    """Async counterpart of BlueskySession: one AsyncClient (one httpx connection pool) per process.
+
+    Concurrent first calls wait on the same login instead of each creating a session.
+    """
+
+    def __init__(self, credentials: Callable[[], tuple[str, str]], store: SQLiteKV | None = None):
+        super().__init__(credentials, store)
+        self._lock = asyncio.Lock()
+
+    async def _on_session_change(self, event: SessionEvent, session) -> None:
+        self._session_changed(event, session)
+
+    async def _login(self) -> AsyncClient:
+        login, password = self._credentials()
+        self._login_name = login
+        client = AsyncClient(base_url=config.BLUESKY_BASE_URL)
+        client.on_session_change(self._on_session_change)
+        shared = self._shared_session(login)
+        if shared is not None:
+            self._session_string = shared  # before login: a refresh during the import replaces it
+            try:
+                with stage_timer("bluesky_session_import"):
+                    await client.login(session_string=shared)
+                self.imports += 1
+                return client
+            except Exception:
+                self._drop_shared_session(shared)
+        with stage_timer("bluesky_login"):
+            await client.login(login, password)
+        self.logins += 1
+        return client
+
+    async def get_client(self) -> AsyncClient:
+        """Return the shared logged-in client, logging in on first use."""
+        async with self._lock:
+            if self._client is None:
+                self._client = await self._login()
+            else:
+                self.reuses += 1
+            return self._client
+
+    async def invalidate(self, client: AsyncClient) -> None:
+        async with self._lock:
+            if self._client is client:
+                self._client = None
+                self.relogins += 1
+                self._drop_shared_session(self._session_string)
+                self._session_string = None
+
+    async def call(self, fn: Callable[[AsyncClient], Awaitable[T]]) -> T:
+        """Await fn(client) with the shared client; on an auth error relogin once and retry.
+        Each attempt holds a slot of the "bluesky" upstream limit."""
+        client = await self.get_client()
+        try:
+            async with upstreams["bluesky"].limit_async():
+                return await fn(client)
+        except Exception as e:
+            if not _is_auth_error(e):
+                raise
+            await self.invalidate(client)
+        client = await self.get_client()
+        async with upstreams["bluesky"].limit_async():
+            return await fn(client)
@@ -0,0 +1,247 @@
+"""
+Cache-wrapped web search toolkit for the explainer agent.
+Drop-in replacement for agno's WebSearchTools: web_search / search_news results are cached by normalized
+query (case, whitespace, punctuation), with separate TTLs for web and news, LRU size bound, optional SQLite
+persistence (capped at the same number of rows, latest-expiring kept), and stale results served when the search
+backend errors. Uncached searches run under a deadline
+(config.SEARCH_TIMEOUT_SECONDS, capped by the request's; helpers/deadline.py) and are hedged with a duplicate
+request after config.SEARCH_HEDGE_AFTER_SECONDS; a search that times out returns a short note (or a stale copy)
+so the model answers without it. The cache holds raw results; a per-run SearchCompactor (tools/compaction.py)
+compacts them on the way to the model.
+"""
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable
+
+from agno.tools.websearch import WebSearchTools
+
+import config
+from helpers.admission import upstreams
+from helpers.cassette import cassette
+from helpers.deadline import ToolTimeout, call_with_deadline
+from helpers.kv_store import SQLiteKV
+from helpers.profiling import add_span
+from helpers.telemetry import STAGE_SECONDS, record_error, register_cache
+from helpers.ttl_cache import TTLCache
+from tools.compaction import SearchCompactor
+
+# Keep $ and # so cashtags / hashtags ($DOGE vs doge) stay distinct queries.
+_PUNCT = re.compile(r"[^\w\s$#]+", re.UNICODE)
+_SPACE = re.compile(r"\s+")
+
+
+# Optional replacement for the real search backend: fn(kind, query, max_results) -> str. Benchmarks
+# plug stub backends in here; None means agno's WebSearchTools (DuckDuckGo via ddgs).
+_backend_override: Callable[[str, str, int], str] | None = None
+
+
+def set_search_backend(fn: Callable[[str, str, int], str] | None) -> None:
+    """Route uncached searches to fn(kind, query, max_results) instead of WebSearchTools (None restores it)."""
+    global _backend_override
+    _backend_override = fn
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation (except $ and #) and collapse whitespace."""
+    return _SPACE.sub(" ", _PUNCT.sub(" ", (query or "").lower())).strip()
+
+
+class SearchCache:
+    """Search results by (kind, max_results, normalized query), plus hit/latency stats.
+
+    ttls: seconds per kind, e.g. {"web": ..., "news": ...}.
+    """
+
+    # The SQLite store is pruned to maxsize rows every this many writes.
+    _PRUNE_EVERY_WRITES = 100
+
+    def __init__(self, maxsize: int, ttls: dict[str, float], path: str | Path | None = None):
+        self.ttls = ttls
+        self._cache = TTLCache(maxsize, max(ttls.values()))
+        self._store = SQLiteKV(path, table="search_results") if path else None
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self.backend_calls = 0
+        self.backend_errors = 0
+        self.stale_served = 0
+        self._store_writes = 0
+        if self._store is not None:
+            # Expired rows too: they are still useful as stale fallbacks.
+            self.purge_store()
+            for key, value, expires_at in self._store.items(include_expired=True, limit=maxsize):
+                self._cache.set(key, value, expires_at=expires_at)
+
+    @staticmethod
+    def key(kind: str, query: str, max_results: int) -> str:
+        return f"{kind}:{max_results}:{normalize_query(query)}"
+
+    def purge_store(self) -> int:
+        """Cut the SQLite store down to maxsize rows (expired ones are kept as stale fallbacks); returns how many
+        were deleted."""
+        return self._store.prune(self._cache.maxsize) if self._store is not None else 0
+
+    def _record_latency(self, kind: str, start: float, error: bool) -> None:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=f"search_{kind}").observe(seconds)
+        add_span(f"search_{kind}", start, seconds, error)
+        if error:
+            record_error(f"search_{kind}")
+        with self._lock:
+            self._latencies.append(seconds)
+            self.backend_calls += 1
+            if error:
+                self.backend_errors += 1
+
+    def _get(self, key: str, allow_stale: bool = False) -> str | None:
+        """Memory first, then the SQLite store (filled by other workers sharing the file)."""
+        cached = self._cache.get(key, allow_stale=allow_stale)
+        if cached is None and self._store is not None:
+            row = self._store.get(key, allow_stale=allow_stale)
+            if row is not None:
+                cached, expires_at = row
+                self._cache.set(key, cached, expires_at=expires_at)
+        return cached
+
+    def get_or_search(self, kind: str, query: str, max_results: int, search: Callable[[], str]) -> str:
+        """Cached result, else search() (stored with the kind's TTL); on backend error serve a stale copy if any."""
+        key = self.key(kind, query, max_results)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        try:
+            result = search()
+        except Exception:
+            self._record_latency(kind, start, error=True)
+            stale = self._get(key, allow_stale=True)
+            if stale is None:
+                raise
+            with self._lock:
+                self.stale_served += 1
+            return stale
+        self._record_latency(kind, start, error=False)
+        expires_at = time.time() + self.ttls[kind]
+        self._cache.set(key, result, expires_at=expires_at)
+        if self._store is not None:
+            self._store.set(key, result, expires_at)
+            with self._lock:
+                self._store_writes += 1
+                prune = self._store_writes % self._PRUNE_EVERY_WRITES == 0
+            if prune:
+                self.purge_store()
+        return result
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats.update(
+                backend_calls=self.backend_calls,
+                backend_errors=self.backend_errors,
+                stale_served=self.stale_served,
+                persistent=self._store is not None,
+            )
+        if latencies:
+            stats["search_latency_seconds"] = {
+                "mean": round(sum(latencies) / len(latencies), 3),
+                "p50": round(latencies[len(latencies) // 2], 3),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                "max": round(latencies[-1], 3),
+            }
+        return stats
+
+
+# Shared by every CachedWebSearchTools instance in the process.
+search_cache = SearchCache(
+    maxsize=config.SEARCH_CACHE_MAXSIZE,
+    ttls={"web": config.SEARCH_CACHE_WEB_TTL_SECONDS, "news": config.SEARCH_CACHE_NEWS_TTL_SECONDS},
+    path=config.SEARCH_CACHE_PATH,
+)
+
+
+class CachedWebSearchTools(WebSearchTools):
+    """WebSearchTools with results served from search_cache.
+
+    compactor: one run's SearchCompactor; when set, results are deduplicated against the run, trimmed and
+    budgeted before the model sees them (build one toolkit per run).
+    """
+
+    def __init__(self, cache: SearchCache | None = None, compactor: SearchCompactor | None = None, **kwargs):
+        self._search_cache = cache or search_cache
+        self._compactor = compactor
+        super().__init__(**kwargs)
+
+    def _compacted(self, raw: str, query: str, kind: str) -> str:
+        return raw if self._compactor is None else self._compactor.compact(raw, query, kind)
+
+    def _search(self, kind: str, query: str, max_results: int) -> str:
+        """Compacted result for the model: cached, else a hedged backend call; a note if it timed out."""
+        try:
+            raw = self._search_cache.get_or_search(
+                kind,
+                query,
+                max_results,
+                lambda: call_with_deadline(
+                    f"search_{kind}",
+                    lambda: self._backend(kind, query, max_results),
+                    config.SEARCH_TIMEOUT_SECONDS,
+                    config.SEARCH_HEDGE_AFTER_SECONDS,
+                ),
+            )
+        except ToolTimeout as e:
+            if not e.seconds:
+                return "[Search skipped: the time budget for this request is used up. Answer with what you have.]"
+            return (
+                f"[Search timed out after {e.seconds:g}s, no results for {query!r}. "
+                "Answer from the post and any other results.]"
+            )
+        return self._compacted(raw, query, kind)
+
+    def _backend(self, kind: str, query: str, max_results: int) -> str:
+        """Uncached search under the "search" upstream limit (recorded/replayed when CASSETTE_MODE is set)."""
+        with upstreams["search"].limit_sync():
+            if _backend_override is not None:
+                return _backend_override(kind, query, max_results)
+            search = super().search_news if kind == "news" else super().web_search
+            request = {"kind": kind, "query": normalize_query(query), "max_results": max_results}
+            return cassette.call("search", request, lambda: search(query, max_results))
+
+    def web_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search the web for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The search results from the web.
+        """
+        return self._search("web", query, max_results)
+
+    def search_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from the web.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from the web.
+        """
+        return self._search("news", query, max_results)
+
+
+def search_cache_stats() -> dict:
+    """Hit rate and per-call search latency for the shared search cache."""
+    return search_cache.stats()
+
+
+def purge_search_store() -> int:
+    """Cap the shared search cache's SQLite store (see SearchCache.purge_store)."""
+    return search_cache.purge_store()
+
+
+register_cache("search", search_cache_stats)
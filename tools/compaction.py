@@ -0,0 +1,208 @@
+"""
+Compaction of search results before they reach the model.
+Raw web_search / search_news output (JSON lists with titles, URLs and long snippets, often the same story
+from web and news) is resent to the model on every later turn of an agent run. SearchCompactor keeps one
+run's state: it drops results whose URL or text was already sent in the run, trims each snippet to the
+sentences that mention the post's key terms or the query, writes compact JSON, and stops adding results
+once the run's search output reaches config.COMPACTION_TOKEN_BUDGET. tokens_saved() reports the input
+tokens this avoided, counting each model turn that would have received the raw output. It also keeps what each
+search call returned (context()), which the semantic cache (semantic.py) reuses for near-duplicate posts.
+"""
+import json
+import re
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import config
+from helpers.cost import estimate_tokens
+from helpers.terms import extract_terms
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORDS = re.compile(r"[\w$#']+", re.UNICODE)
+_TRACKING_PARAMS = re.compile(r"^(?:utm_\w+|fbclid|gclid|ref|ref_src|cmpid|ocid)$", re.IGNORECASE)
+_STOPWORDS = frozenset(
+    "the and for with that this from what who why how when where are was were has have had not but you your "
+    "about into over after before than then them they their its it's our out all any can will just more most "
+    "news latest".split()
+)
+
+
+def normalize_url(url: str) -> str:
+    """Host (without www) + path (without trailing slash) + non-tracking query params, lowercased host."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAMS.match(k)])
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else "")
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = [w.lower() for w in _WORDS.findall(text)]
+    if len(words) < 3:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _query_terms(query: str) -> list[str]:
+    return [w for w in _WORDS.findall(query.lower()) if len(w) > 2 and w.lstrip("#$") not in _STOPWORDS]
+
+
+def trim_snippet(text: str, terms: list[str], max_chars: int) -> str:
+    """The sentences of text that mention any term (else the first sentence), cut to max_chars at a word."""
+    text = " ".join((text or "").split())
+    sentences = [s for s in _SENTENCE_END.split(text) if s]
+    lowered_terms = [t.lower().lstrip("#$") for t in terms if t.strip("#$")]
+    kept = [s for s in sentences if any(t in s.lower() for t in lowered_terms)] or sentences[:1]
+    snippet = " ".join(dict.fromkeys(kept))
+    if len(snippet) > max_chars:
+        snippet = snippet[:max_chars].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+    return snippet
+
+
+class SearchCompactor:
+    """Compaction state for one explain run (URLs and texts already sent, remaining token budget, counters).
+
+    Thread-safe: an agent may run several search tool calls at once. enabled=False passes results through
+    unchanged (config.SEARCH_COMPACTION off) but still records them for context().
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        token_budget: int = config.COMPACTION_TOKEN_BUDGET,
+        max_snippet_chars: int = config.COMPACTION_MAX_SNIPPET_CHARS,
+        near_duplicate: float = config.COMPACTION_NEAR_DUPLICATE,
+    ):
+        self.token_budget = token_budget
+        self.max_snippet_chars = max_snippet_chars
+        self.near_duplicate = near_duplicate
+        self.enabled = enabled
+        self.post_terms: list[str] = []
+        self._urls: set[str] = set()
+        self._texts: list[set] = []
+        # Compacted output -> tokens saved, per call (identical outputs, e.g. all duplicates, can repeat).
+        self._saved_by_output: dict[str, list[int]] = {}
+        self._calls: list[list[str]] = []
+        self._lock = threading.Lock()
+        self.counts = {
+            "results_in": 0, "results_out": 0, "duplicate_urls": 0, "near_duplicates": 0, "omitted_by_budget": 0,
+        }
+        self.tokens_raw = 0
+        self.tokens_sent = 0
+
+    def set_post(self, post_text: str | None) -> None:
+        """Key terms from the post text; snippets keep the sentences that mention them."""
+        if post_text:
+            self.post_terms = extract_terms(post_text, limit=2 * config.PIPELINE_MAX_SEARCHES)
+
+    def compact(self, raw: str, query: str, kind: str = "web") -> str:
+        """Compacted tool output for one search call (non-JSON output, e.g. an error, passes through)."""
+        if not self.enabled:
+            with self._lock:
+                self._calls.append([kind, query, raw])
+            return raw
+        try:
+            results = json.loads(raw)
+        except (TypeError, ValueError):
+            results = None
+        with self._lock:
+            raw_tokens = estimate_tokens([raw or ""])
+            self.tokens_raw += raw_tokens
+            if not isinstance(results, list):
+                self.tokens_sent += raw_tokens
+                self._calls.append([kind, query, raw])
+                return raw
+            out, omitted = self._compact_results(results, self.post_terms + _query_terms(query))
+            if out or not results:
+                compacted = json.dumps(out, ensure_ascii=False, separators=(",", ":"))
+            elif not omitted:
+                compacted = f"[No new results: all {len(results)} repeat results already returned for this post]"
+            else:
+                compacted = ""
+            if omitted:
+                compacted += f"\n[{omitted} more results omitted: search output budget for this post reached]"
+            compacted = compacted.strip()
+            sent = estimate_tokens([compacted])
+            self.tokens_sent += sent
+            self._saved_by_output.setdefault(compacted, []).append(max(0, raw_tokens - sent))
+            self._calls.append([kind, query, compacted])
+            return compacted
+
+    def _compact_results(self, results: list, terms: list[str]) -> tuple[list[dict], int]:
+        out: list[dict] = []
+        omitted = 0
+        pending_tokens = 0
+        for item in results:
+            if not isinstance(item, dict):
+                continue
+            self.counts["results_in"] += 1
+            url = item.get("href") or item.get("url") or ""
+            key = normalize_url(url) if url else None
+            if key and key in self._urls:
+                self.counts["duplicate_urls"] += 1
+                continue
+            body = item.get("body") or item.get("snippet") or ""
+            shingles = _shingles(f"{item.get('title', '')} {body}")
+            if any(_jaccard(shingles, seen) >= self.near_duplicate for seen in self._texts):
+                self.counts["near_duplicates"] += 1
+                continue
+            compact = {"title": item.get("title", ""), "url": url, "snippet": trim_snippet(body, terms, self.max_snippet_chars)}
+            for extra in ("date", "source"):
+                if item.get(extra):
+                    compact[extra] = item[extra]
+            cost = estimate_tokens([json.dumps(compact, ensure_ascii=False)])
+            if self.tokens_sent + pending_tokens + cost > self.token_budget:
+                self.counts["omitted_by_budget"] += 1
+                omitted += 1
+                continue
+            if key:
+                self._urls.add(key)
+            self._texts.append(shingles)
+            out.append(compact)
+            pending_tokens += cost
+            self.counts["results_out"] += 1
+        return out, omitted
+
+    def tokens_saved(self, messages: list | None = None) -> int:
+        """Estimated input tokens saved. With the run's messages, each compacted tool result counts once per
+        later model turn (every turn resends it); without them, once per result (a lower bound)."""
+        with self._lock:
+            saved_by_output = {output: list(saved) for output, saved in self._saved_by_output.items()}
+        if not messages:
+            return sum(sum(saved) for saved in saved_by_output.values())
+        total = 0
+        for i, message in enumerate(messages):
+            if getattr(message, "role", None) != "tool":
+                continue
+            pending = saved_by_output.get(str(getattr(message, "content", "") or ""))
+            saved = pending.pop(0) if pending else 0
+            if saved:
+                later_turns = sum(1 for m in messages[i + 1:] if getattr(m, "role", None) == "assistant")
+                total += saved * max(1, later_turns)
+        return total
+
+    def context(self) -> list[list[str]]:
+        """[kind, query, output] per search call so far, as sent to the model (JSON-serializable)."""
+        with self._lock:
+            return [list(call) for call in self._calls]
+
+    def stats(self, messages: list | None = None) -> dict | None:
+        """Counters for the run's result dict ("compaction"); None when compaction is disabled."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            stats = {**self.counts, "tool_tokens_raw": self.tokens_raw, "tool_tokens_sent": self.tokens_sent}
+        stats["tokens_saved"] = self.tokens_saved(messages)
+        return stats
+
+
+def new_compactor(post_text: str | None = None) -> SearchCompactor:
+    """Compactor for one run; with config.SEARCH_COMPACTION off it passes raw results through (and only records them)."""
+    compactor = SearchCompactor(enabled=config.SEARCH_COMPACTION)
+    compactor.set_post(post_text)
+    return compactor
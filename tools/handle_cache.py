@@ -0,0 +1,121 @@
+"""
+Handle -> DID cache for Bluesky post URLs.
+LRU + TTL in memory, short-lived negative entries for handles that do not resolve,
+and optional write-through persistence (SQLite file) so a restarted worker starts warm; in-memory misses
+read through to the file, so workers sharing it see each other's lookups.
+"""
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from helpers.kv_store import SQLiteKV
+from helpers.ttl_cache import TTLCache
+
+# Stored for handles the PDS could not resolve (negative cache entry).
+_NOT_FOUND = ""
+_MISSING = object()
+
+
+def normalize_handle(handle: str) -> str:
+    """Handles are case-insensitive; URLs sometimes carry a leading @."""
+    return handle.strip().lstrip("@").lower()
+
+
+class HandleNotFoundError(ValueError):
+    """The handle does not resolve to a DID (possibly served from the negative cache)."""
+
+
+class HandleCache:
+    """handle -> DID with positive TTL `ttl` and negative TTL `negative_ttl` (seconds)."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float,
+        path: str | Path | None = None,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(maxsize, ttl)
+        self._store = SQLiteKV(path, table="handle_dids") if path else None
+        self.negative_hits = 0
+        self.passthrough = 0
+        if self._store is not None:
+            for handle, did, expires_at in self._store.items():
+                self._cache.set(handle, did, expires_at=expires_at)
+
+    def lookup(self, handle: str) -> str | None:
+        """Return the cached DID, or None on a miss. Raises HandleNotFoundError on a cached negative."""
+        key = normalize_handle(handle)
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING and self._store is not None:
+            row = self._store.get(key)
+            if row is not None:
+                value, expires_at = row
+                self._cache.set(key, value, expires_at=expires_at)
+        if value is _MISSING:
+            return None
+        if value == _NOT_FOUND:
+            self.negative_hits += 1
+            raise HandleNotFoundError(f"Handle does not resolve: {handle}")
+        return value
+
+    def purge_store(self) -> int:
+        """Delete expired rows from the SQLite store; returns how many."""
+        return self._store.purge_expired() if self._store is not None else 0
+
+    def _put(self, handle: str, did: str, ttl: float) -> None:
+        key = normalize_handle(handle)
+        self._cache.set(key, did, ttl=ttl)
+        if self._store is not None:
+            self._store.set(key, did, time.time() + ttl)
+
+    def set(self, handle: str, did: str) -> None:
+        self._put(handle, did, self.ttl)
+
+    def set_not_found(self, handle: str) -> None:
+        self._put(handle, _NOT_FOUND, self.negative_ttl)
+
+    def resolve(self, actor: str, resolve_fn: Callable[[str], str]) -> str:
+        """DID for `actor` (handle or DID). DIDs pass through; handles hit the cache before resolve_fn.
+
+        resolve_fn(handle) -> DID should raise HandleNotFoundError for handles that do not exist;
+        that result is cached for negative_ttl seconds. Other errors are not cached.
+        """
+        if actor.startswith("did:"):
+            self.passthrough += 1
+            return actor
+        did = self.lookup(actor)
+        if did is not None:
+            return did
+        try:
+            did = resolve_fn(normalize_handle(actor))
+        except HandleNotFoundError:
+            self.set_not_found(actor)
+            raise
+        self.set(actor, did)
+        return did
+
+    async def aresolve(self, actor: str, resolve_fn: Callable[[str], Awaitable[str]]) -> str:
+        """Async variant of resolve(); resolve_fn is awaited on a miss."""
+        if actor.startswith("did:"):
+            self.passthrough += 1
+            return actor
+        did = self.lookup(actor)
+        if did is not None:
+            return did
+        try:
+            did = await resolve_fn(normalize_handle(actor))
+        except HandleNotFoundError:
+            self.set_not_found(actor)
+            raise
+        self.set(actor, did)
+        return did
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats["negative_hits"] = self.negative_hits
+        stats["did_passthrough"] = self.passthrough
+        stats["persistent"] = self._store is not None
+        return stats
@@ -0,0 +1,384 @@
+"""
+Pre-explanation of trending posts from the Bluesky Jetstream feed.
+Likes, reposts, replies and quotes are counted per subject post in a count-min sketch whose counters decay
+with config.TRENDING_HALF_LIFE_SECONDS of event time, so a post's score tracks its engagement velocity in
+constant memory. Posts whose score reaches config.TRENDING_MIN_SCORE go into a bounded priority queue (highest
+score first) and are explained in the background, within a rate and hourly cost budget, straight into the
+explanation cache. Cached results carry a "prewarmed" marker so the API can count the requests they served.
+
+The API runs it in-process when config.TRENDING_SOURCE is set. With several workers, run it as its own
+process against the shared store instead:
+  python trending.py --source jetstream            (live Jetstream)
+  python trending.py --source events.jsonl         (replay file of Jetstream JSON events, one per line)
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+import config
+from helpers.admission import Overloaded, busy_cause
+from helpers.rate_limit import RateLimiter
+from helpers.sketch import CountMinSketch, TopK
+from helpers.telemetry import PREWARM_HITS, PREWARM_LEAD_SECONDS, PREWARM_RUNS, TRENDING_EVENTS
+from helpers.ttl_cache import TTLCache
+
+_COLLECTION_KINDS = {"app.bsky.feed.like": "like", "app.bsky.feed.repost": "repost"}
+_POST_COLLECTION = "app.bsky.feed.post"
+
+
+def engagement(event: dict) -> tuple[str, str] | None:
+    """(kind, subject post AT URI) for a Jetstream commit that engages with a post, else None.
+
+    kind: like, repost, reply (to the parent post) or quote.
+    """
+    commit = event.get("commit") or {}
+    if event.get("kind") != "commit" or commit.get("operation") != "create":
+        return None
+    record = commit.get("record") or {}
+    collection = commit.get("collection")
+    if collection in _COLLECTION_KINDS:
+        kind, uri = _COLLECTION_KINDS[collection], (record.get("subject") or {}).get("uri")
+    elif collection == _POST_COLLECTION:
+        embed = record.get("embed") or {}
+        quoted = embed.get("record") or {}
+        if "record" in quoted:  # app.bsky.embed.recordWithMedia
+            quoted = quoted["record"]
+        parent = (record.get("reply") or {}).get("parent") or {}
+        if parent.get("uri"):
+            kind, uri = "reply", parent["uri"]
+        elif quoted.get("uri"):
+            kind, uri = "quote", quoted["uri"]
+        else:
+            return None
+    else:
+        return None
+    if not uri or f"/{_POST_COLLECTION}/" not in uri:
+        return None
+    return kind, uri
+
+
+def at_uri_to_post_url(at_uri: str) -> str:
+    """bsky.app URL (DID form) for a post AT URI; resolves back to the same cache key without a handle lookup."""
+    did, _, rkey = at_uri.removeprefix("at://").partition(f"/{_POST_COLLECTION}/")
+    return f"https://bsky.app/profile/{did}/post/{rkey}"
+
+
+async def replay_events(path: str | Path, speed: float = 1.0) -> AsyncIterator[dict]:
+    """Events from a JSONL file of Jetstream messages, paced by their time_us scaled by 1/speed (0 = no pacing)."""
+    first_event_us = None
+    started = time.monotonic()
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if speed > 0 and event.get("time_us"):
+                first_event_us = first_event_us or event["time_us"]
+                due = (event["time_us"] - first_event_us) / 1e6 / speed
+                delay = due - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % 1000 == 0:
+                await asyncio.sleep(0)
+            yield event
+
+
+async def jetstream_events(url: str) -> AsyncIterator[dict]:
+    """Live Jetstream events (likes, reposts, posts). Reconnects with backoff, resuming from the last cursor."""
+    try:
+        import websockets
+    except ImportError as e:
+        raise RuntimeError("TRENDING_SOURCE=jetstream needs the websockets package") from e
+    wanted = "&".join(f"wantedCollections={c}" for c in (*_COLLECTION_KINDS, _POST_COLLECTION))
+    cursor = None
+    backoff = 1.0
+    while True:
+        full_url = f"{url}?{wanted}" + (f"&cursor={cursor}" if cursor else "")
+        try:
+            async with websockets.connect(full_url, max_size=2**20) as ws:
+                backoff = 1.0
+                async for message in ws:
+                    event = json.loads(message)
+                    cursor = event.get("time_us") or cursor
+                    yield event
+        except (OSError, websockets.WebSocketException):
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def open_source(spec: str) -> AsyncIterator[dict]:
+    """"jetstream" (config.JETSTREAM_URL) or a path to a replay file."""
+    if spec == "jetstream":
+        return jetstream_events(config.JETSTREAM_URL)
+    return replay_events(spec, speed=config.TRENDING_REPLAY_SPEED)
+
+
+class TrendingService:
+    """Tracks engagement velocity per post and pre-explains the posts that cross the threshold.
+
+    cache: the ExplanationCache the API serves from. explain(post_url) -> result dict: one explainer run
+    (the API passes one that goes through admission control, so user traffic keeps priority).
+    """
+
+    _DECAY_INTERVAL_SECONDS = 10.0
+
+    def __init__(
+        self,
+        cache,
+        explain: Callable[[str], Awaitable[dict]],
+        min_score: float = config.TRENDING_MIN_SCORE,
+        half_life_seconds: float = config.TRENDING_HALF_LIFE_SECONDS,
+        weights: dict[str, float] = config.TRENDING_WEIGHTS,
+        max_queue: int = config.TRENDING_QUEUE_MAX,
+        concurrency: int = config.TRENDING_CONCURRENCY,
+        explains_per_minute: float | None = config.TRENDING_EXPLAINS_PER_MINUTE,
+        max_cost_usd_per_hour: float | None = config.TRENDING_MAX_COST_USD_PER_HOUR,
+    ):
+        self.cache = cache
+        self.explain = explain
+        self.min_score = min_score
+        self.half_life_seconds = half_life_seconds
+        self.weights = weights
+        self.max_queue = max_queue
+        self.concurrency = concurrency
+        self.max_cost_usd_per_hour = max_cost_usd_per_hour
+        self.sketch = CountMinSketch(config.TRENDING_SKETCH_WIDTH, config.TRENDING_SKETCH_DEPTH)
+        self.top = TopK(config.TRENDING_TOP_K)
+        self._rate = RateLimiter(explains_per_minute / 60 if explains_per_minute else None, burst=max(1, concurrency))
+        self._queue: list[tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._queued = asyncio.Event()
+        # Posts queued or explained recently, so one viral post is not queued again on every like.
+        self._handled = TTLCache(maxsize=50_000, ttl=config.EXPLANATION_CACHE_TTL_SECONDS)
+        self._hit_posts = TTLCache(maxsize=50_000, ttl=config.EXPLANATION_CACHE_TTL_SECONDS)
+        self._spend: deque[tuple[float, float]] = deque()
+        self._event_clock: float | None = None
+        self._active = 0
+        self.source: str | None = None
+        self.running = False
+        self.events: dict[str, int] = {}
+        self.ignored_events = 0
+        self.dropped = 0
+        self.runs: dict[str, int] = {}
+        self.budget_waits = 0
+        self.hits = 0
+        self.posts_hit = 0
+
+    # --- ingestion ---
+
+    def _decay_to(self, event_seconds: float) -> None:
+        if self._event_clock is None:
+            self._event_clock = event_seconds
+            return
+        elapsed = event_seconds - self._event_clock
+        if elapsed >= self._DECAY_INTERVAL_SECONDS:
+            factor = 0.5 ** (elapsed / self.half_life_seconds)
+            self.sketch.decay(factor)
+            self.top.decay(factor)
+            self._event_clock = event_seconds
+
+    def observe(self, event: dict) -> None:
+        """Count one feed event; queue its post if the post's score crosses the threshold."""
+        self._decay_to(event["time_us"] / 1e6 if event.get("time_us") else time.time())
+        found = engagement(event)
+        if found is None:
+            self.ignored_events += 1
+            return
+        kind, uri = found
+        self.events[kind] = self.events.get(kind, 0) + 1
+        TRENDING_EVENTS.labels(kind=kind).inc()
+        score = self.sketch.add(uri, self.weights.get(kind, 1.0))
+        self.top.update(uri, score)
+        if score >= self.min_score and uri not in self._handled:
+            self._enqueue(uri, score)
+
+    def _enqueue(self, uri: str, score: float) -> None:
+        if len(self._queue) >= self.max_queue:
+            lowest = max(self._queue)
+            self.dropped += 1
+            if -lowest[0] >= score:
+                return
+            self._queue.remove(lowest)
+            heapq.heapify(self._queue)
+            self._handled.pop(lowest[2])
+        heapq.heappush(self._queue, (-score, next(self._seq), uri))
+        self._handled.set(uri, True)
+        self._queued.set()
+
+    async def run(self, events: AsyncIterator[dict], source: str | None = None) -> None:
+        """Consume events until the source ends (replay) or the task is cancelled; then finish queued posts."""
+        self.source = source
+        self.running = True
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            async for event in events:
+                self.observe(event)
+            while self._queue or self._active:
+                await asyncio.sleep(0.05)
+        finally:
+            self.running = False
+            for worker in workers:
+                worker.cancel()
+
+    # --- pre-explanation ---
+
+    async def _next(self) -> tuple[str, float]:
+        while not self._queue:
+            self._queued.clear()
+            await self._queued.wait()
+        neg_score, _, uri = heapq.heappop(self._queue)
+        return uri, -neg_score
+
+    def spent_last_hour(self) -> float:
+        cutoff = time.time() - 3600
+        while self._spend and self._spend[0][0] < cutoff:
+            self._spend.popleft()
+        return sum(cost for _, cost in self._spend)
+
+    async def _within_budget(self) -> None:
+        """Wait until the last hour's estimated spend is under the budget."""
+        if self.max_cost_usd_per_hour is None:
+            return
+        while self.spent_last_hour() >= self.max_cost_usd_per_hour:
+            self.budget_waits += 1
+            await asyncio.sleep(max(1.0, self._spend[0][0] + 3600 - time.time()))
+
+    def _count(self, result: str) -> None:
+        self.runs[result] = self.runs.get(result, 0) + 1
+        PREWARM_RUNS.labels(result=result).inc()
+
+    async def _explain_marked(self, uri: str, score: float) -> dict:
+        result = await self.explain(at_uri_to_post_url(uri))
+        cost = (result.get("usage") or {}).get("cost")
+        if cost:
+            self._spend.append((time.time(), cost))
+        return {**result, "prewarmed": {"at_uri": uri, "score": round(score, 1), "at": time.time()}}
+
+    async def _worker(self) -> None:
+        while True:
+            uri, score = await self._next()
+            self._active += 1
+            try:
+                await self._prewarm(uri, score)
+            finally:
+                self._active -= 1
+
+    async def _prewarm(self, uri: str, score: float) -> None:
+        if self.cache.get(uri) is not None:
+            self._count("already_cached")
+            return
+        await self._within_budget()
+        await self._rate.acquire_async()
+        try:
+            result, _ = await self.cache.get_or_compute(uri, lambda: self._explain_marked(uri, score))
+        except Exception as e:
+            if isinstance(e, Overloaded) or busy_cause(e) is not None:
+                # User traffic has the capacity; the post may be queued again by later engagement.
+                self._handled.pop(uri)
+                self._count("rejected")
+            else:
+                self._count("error")
+            return
+        # Without the marker the run was a user request for the same post that this one joined.
+        self._count("explained" if result.get("prewarmed") else "already_cached")
+
+    # --- serving side ---
+
+    def record_served(self, result: dict, cache_hit: bool) -> None:
+        """Count an API response served from a pre-explained cache entry (called for every response)."""
+        prewarmed = result.get("prewarmed") if cache_hit else None
+        if not prewarmed:
+            return
+        self.hits += 1
+        PREWARM_HITS.inc()
+        if prewarmed["at_uri"] not in self._hit_posts:
+            self._hit_posts.set(prewarmed["at_uri"], True)
+            self.posts_hit += 1
+            PREWARM_LEAD_SECONDS.observe(max(0.0, time.time() - prewarmed["at"]))
+
+    def trending(self, n: int = 20) -> list[dict]:
+        """The n highest-scoring posts currently tracked."""
+        return [
+            {"at_uri": uri, "post_url": at_uri_to_post_url(uri), "score": round(score, 1), "prewarm_queued": uri in self._handled}
+            for uri, score in self.top.items()[:n]
+        ]
+
+    def stats(self) -> dict:
+        explained = self.runs.get("explained", 0)
+        return {
+            "running": self.running,
+            "source": self.source,
+            "events": dict(self.events),
+            "ignored_events": self.ignored_events,
+            "sketch": {
+                "width": self.sketch.width,
+                "depth": self.sketch.depth,
+                "memory_bytes": self.sketch.memory_bytes(),
+                "decayed_total": round(self.sketch.total, 1),
+            },
+            "min_score": self.min_score,
+            "queue_depth": len(self._queue),
+            "dropped": self.dropped,
+            "runs": dict(self.runs),
+            "spent_last_hour_usd": round(self.spent_last_hour(), 4),
+            "max_cost_usd_per_hour": self.max_cost_usd_per_hour,
+            "budget_waits": self.budget_waits,
+            "cache_hits": self.hits,
+            "posts_hit": self.posts_hit,
+            "posts_hit_rate": round(self.posts_hit / explained, 4) if explained else None,
+        }
+
+
+def _explain_for_mode(mode: str) -> Callable[[str], Awaitable[dict]]:
+    if mode == "pipeline":
+        from pipeline import explain_pipeline_async
+
+        return explain_pipeline_async
+    if mode == "cascade":
+        from cascade import explain_cascade_async
+
+        return explain_cascade_async
+    from agent import explain_with_stats_async
+
+    return explain_with_stats_async
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-explain trending Bluesky posts into the shared explanation cache")
+    parser.add_argument("--source", default=config.TRENDING_SOURCE, help='"jetstream" or a JSONL replay file')
+    parser.add_argument("--stats-every", type=float, default=30.0, help="Seconds between stats lines")
+    args = parser.parse_args()
+    if not args.source:
+        parser.error("--source (or TRENDING_SOURCE) is required")
+    if not config.EXPLANATION_CACHE_PATH:
+        parser.error("set SHARED_STORE_PATH (or EXPLANATION_CACHE_PATH) to the API's store so it can serve the results")
+
+    from helpers.explanation_cache import ExplanationCache
+
+    cache = ExplanationCache(
+        maxsize=config.EXPLANATION_CACHE_MAXSIZE,
+        ttl=config.EXPLANATION_CACHE_TTL_SECONDS,
+        path=config.EXPLANATION_CACHE_PATH,
+        partial_ttl=config.EXPLANATION_CACHE_PARTIAL_TTL_SECONDS,
+    )
+    service = TrendingService(cache, _explain_for_mode(config.TRENDING_MODE))
+
+    async def run():
+        task = asyncio.create_task(service.run(open_source(args.source), source=args.source))
+        while not task.done():
+            await asyncio.wait([task], timeout=args.stats_every)
+            print(json.dumps(service.stats()), flush=True)
+        await task
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()